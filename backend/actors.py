@@ -0,0 +1,418 @@
+"""
+Actor Correlation
+=================
+Pairwise correlation of actors' net flows over 7d, 30d and 90d, kept as
+NumPy matrices and updated incrementally as transfers arrive.
+
+An actor is a labeled wallet group (a label such as "Binance: Hot
+Wallet"). Each window holds a ring of fixed-width time buckets with every
+actor's net USD flow per bucket (received minus sent), one row per actor:
+the actor's position changes over the window.
+
+Correlation rows are standardized (centered, unit norm, float32), so the
+whole matrix is ``Z @ Z.T``, computed in row blocks off the event loop.
+Between full computations only the rows of actors that traded are
+recomputed: ``C[rows] = Z[rows] @ Z.T`` and its transpose. A full pass is
+needed only when the ring rotates to a new bucket, which changes every
+row. Actors with fewer than ``MIN_ACTIVE_BUCKETS`` non-zero buckets
+correlate with nothing.
+
+Clusters are the connected components of the graph of pairs whose
+correlation reaches a threshold, cached per matrix version.
+"""
+
+import asyncio
+import re
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+HOUR_MS = 3_600_000
+
+# Window name -> (bucket width in ms, buckets per window)
+WINDOWS = {
+    "7d": (HOUR_MS, 168),
+    "30d": (4 * HOUR_MS, 180),
+    "90d": (12 * HOUR_MS, 180),
+}
+
+BLOCK_ROWS = 512
+MIN_ACTIVE_BUCKETS = 3
+DEFAULT_THRESHOLD = 0.7
+
+_SLUG = re.compile(r"[^a-z0-9]+")
+
+
+def actor_id(name: str) -> str:
+    """URL-safe actor id for a label ("Binance: Hot Wallet" -> "binance-hot-wallet")."""
+    return _SLUG.sub("-", name.lower()).strip("-")
+
+
+def standardize(values: np.ndarray) -> np.ndarray:
+    """Centered, unit-norm float32 rows; rows with too little activity become zero."""
+    centered = values - values.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(centered, axis=1, keepdims=True)
+    active = (np.count_nonzero(values, axis=1) >= MIN_ACTIVE_BUCKETS)[:, None] & (norms > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(active, centered / norms, 0.0).astype(np.float32)
+
+
+def correlate(z: np.ndarray, rows: Optional[np.ndarray] = None, block: int = BLOCK_ROWS) -> np.ndarray:
+    """Correlations of ``z[rows]`` (all rows by default) with every row of ``z``, in row blocks."""
+    left = z if rows is None else z[rows]
+    out = np.empty((len(left), len(z)), dtype=np.float32)
+    for start in range(0, len(left), block):
+        np.matmul(left[start:start + block], z.T, out=out[start:start + block])
+    np.clip(out, -1.0, 1.0, out=out)
+    return out
+
+
+def threshold_edges(matrix: np.ndarray, threshold: float, block: int = BLOCK_ROWS) -> Tuple[np.ndarray, np.ndarray]:
+    """Pairs ``i < j`` with ``matrix[i, j] >= threshold``, scanning the upper triangle in row blocks."""
+    found_i, found_j = [], []
+    for start in range(0, len(matrix), block):
+        rows, cols = np.nonzero(matrix[start:start + block, start:] >= threshold)
+        rows += start
+        cols += start
+        upper = rows < cols
+        found_i.append(rows[upper])
+        found_j.append(cols[upper])
+    if not found_i:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(found_i), np.concatenate(found_j)
+
+
+def cluster_roots(matrix: np.ndarray, threshold: float) -> np.ndarray:
+    """Component root per row of a correlation matrix thresholded at ``threshold``."""
+    i, j = threshold_edges(matrix, threshold)
+    return components(len(matrix), i, j)
+
+
+def components(n: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Connected-component root of each of ``n`` nodes given edges ``i[k] -- j[k]``."""
+    parent = np.arange(n)
+    while True:
+        low = np.minimum(parent[i], parent[j])
+        hooked = parent.copy()
+        np.minimum.at(hooked, parent[i], low)
+        np.minimum.at(hooked, parent[j], low)
+        while True:  # pointer jumping until every node points at its root
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, parent):
+            return parent
+        parent = hooked
+
+
+class ActorLegs(NamedTuple):
+    """Actor sides of a transfer batch: row, index of the transfer, time and signed USD."""
+
+    rows: np.ndarray
+    docs: np.ndarray
+    ts: np.ndarray
+    usd: np.ndarray
+
+
+NO_LEGS = ActorLegs(*(np.empty(0, dtype=np.int64) for _ in range(3)), np.empty(0))
+
+
+class FlowRing:
+    """Ring of time buckets holding every actor's net flow per bucket."""
+
+    def __init__(self, capacity: int, bucket_ms: int, buckets: int):
+        self.bucket_ms = bucket_ms
+        self.buckets = buckets
+        self.values = np.zeros((capacity, buckets))
+        self.head: Optional[int] = None  # absolute index of the newest bucket
+
+    def advance(self, bucket: int):
+        """Rotate so ``bucket`` is the newest, clearing the buckets that leave the window."""
+        if self.head is None:
+            self.head = bucket
+            return
+        steps = bucket - self.head
+        if steps <= 0:
+            return
+        if steps >= self.buckets:
+            self.values[:] = 0
+        else:
+            slots = np.arange(self.head + 1, bucket + 1) % self.buckets
+            self.values[:, slots] = 0
+        self.head = bucket
+
+    def add(self, ts: np.ndarray, rows: np.ndarray, amounts: np.ndarray):
+        """Add ``amounts`` to ``rows`` at times ``ts``; older than the window is dropped."""
+        buckets = ts // self.bucket_ms
+        newest = int(buckets.max())
+        if self.head is None or newest > self.head:
+            self.advance(newest)
+        keep = self.head - buckets < self.buckets
+        np.add.at(self.values, (rows[keep], buckets[keep] % self.buckets), amounts[keep])
+
+
+class WindowCorrelation:
+    """Correlation matrix of one window and the bookkeeping to keep it current."""
+
+    def __init__(self):
+        self.z = np.zeros((0, 0), dtype=np.float32)
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.n = 0  # actors covered by ``matrix``
+        self.head: Optional[int] = None  # ring head at the last full computation
+        self.dirty: Set[int] = set()
+        self.version = 0
+        self.computed_ms = 0
+        self.computing = False
+        self.clusters: Dict[float, Tuple[int, np.ndarray]] = {}
+
+        self.full_runs = 0
+        self.row_updates = 0
+        self.last_full_ms = 0.0
+
+
+class ActorCorrelationEngine:
+    """Per-actor net-flow rings and cached correlation matrices for each window."""
+
+    def __init__(
+        self,
+        resolve: Callable[[Sequence[str]], List[Optional[str]]],
+        capacity: int = 5_000,
+        windows: Dict[str, tuple] = WINDOWS,
+    ):
+        """
+        ``resolve`` maps addresses to labels in one call (unlabeled: None);
+        a label carried on the transfer itself takes precedence. At most
+        ``capacity`` actors are tracked, in order of first appearance.
+        """
+        self.resolve = resolve
+        self.capacity = capacity
+        self.names: List[str] = []
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.rings = {name: FlowRing(capacity, bucket_ms, buckets) for name, (bucket_ms, buckets) in windows.items()}
+        self.correlations = {name: WindowCorrelation() for name in windows}
+        self.dropped = 0
+
+    def _row(self, name: str) -> int:
+        """Row of the actor labeled ``name``, admitting it if there is room (-1 if not)."""
+        key = actor_id(name)
+        row = self.index.get(key)
+        if row is None:
+            if len(self.ids) >= self.capacity or not key:
+                self.dropped += 1
+                return -1
+            row = self.index[key] = len(self.ids)
+            self.ids.append(key)
+            self.names.append(name)
+        return row
+
+    def add_batch(self, docs: Sequence[Dict[str, Any]]) -> ActorLegs:
+        """
+        Fold stored transfers into every window: the receiver gains, the
+        sender loses. Returns the legs applied, one per tracked actor side.
+        """
+        if not docs:
+            return NO_LEGS
+        found = self.resolve([d["from_address"] for d in docs] + [d["to_address"] for d in docs])
+        rows, at, ts, amounts = [], [], [], []
+        for i, (doc, from_found, to_found) in enumerate(zip(docs, found, found[len(docs):])):
+            sender = doc.get("from_label") or from_found
+            receiver = doc.get("to_label") or to_found
+            if sender == receiver:
+                continue  # unlabeled on both sides, or internal to one actor
+            usd = doc["usd_raw"]
+            for name, amount in ((sender, -usd), (receiver, usd)):
+                if name:
+                    row = self._row(name)
+                    if row >= 0:
+                        rows.append(row)
+                        at.append(i)
+                        ts.append(doc["ts"])
+                        amounts.append(amount)
+        if not rows:
+            return NO_LEGS
+        rows_arr = np.array(rows, dtype=np.int64)
+        ts_arr = np.array(ts, dtype=np.int64)
+        amounts_arr = np.array(amounts)
+        for ring in self.rings.values():
+            ring.add(ts_arr, rows_arr, amounts_arr)
+        touched = set(rows)
+        for state in self.correlations.values():
+            state.dirty |= touched
+        return ActorLegs(rows_arr, np.array(at, dtype=np.int64), ts_arr, amounts_arr)
+
+    # ---- correlation upkeep ----
+
+    def warm(self) -> List[str]:
+        """Windows whose matrix has been requested and is being maintained."""
+        return [name for name, state in self.correlations.items() if state.version]
+
+    async def refresh(self, window: str, now_ms: Optional[int] = None):
+        """
+        Bring a window's matrix up to date.
+
+        Recomputes everything (in a worker thread) if the ring rotated or
+        most rows changed, otherwise only the rows of actors that traded.
+        """
+        state = self.correlations[window]
+        ring = self.rings[window]
+        if now_ms is not None:
+            ring.advance(now_ms // ring.bucket_ms)
+        if state.computing:
+            return
+        n = len(self.ids)
+        if state.version and ring.head == state.head and len(state.dirty) <= max(n // 4, BLOCK_ROWS):
+            if state.dirty:
+                self._update_rows(window, state, n)
+            return
+
+        state.computing = True
+        try:
+            started = time.perf_counter()
+            head = ring.head
+            state.dirty.clear()
+            z = standardize(ring.values[:n])
+            matrix = await asyncio.to_thread(correlate, z)
+        finally:
+            state.computing = False
+        state.z, state.matrix, state.n, state.head = z, matrix, n, head
+        state.full_runs += 1
+        state.last_full_ms = (time.perf_counter() - started) * 1000
+        self._published(state)
+        if state.dirty:  # rows that traded while the matrix was computed
+            self._update_rows(window, state, len(self.ids))
+
+    def _update_rows(self, window: str, state: WindowCorrelation, n: int):
+        """Recompute the rows (and columns) of actors that traded, growing the matrix for new ones."""
+        if n > state.n:
+            matrix = np.zeros((n, n), dtype=np.float32)
+            matrix[:state.n, :state.n] = state.matrix
+            z = np.zeros((n, self.rings[window].buckets), dtype=np.float32)
+            z[:state.n] = state.z
+            state.matrix, state.z = matrix, z
+            state.dirty |= set(range(state.n, n))
+            state.n = n
+        rows = np.fromiter(state.dirty, dtype=np.int64, count=len(state.dirty))
+        rows.sort()
+        state.dirty.clear()
+        state.z[rows] = standardize(self.rings[window].values[rows])
+        updated = correlate(state.z, rows)
+        state.matrix[rows] = updated
+        state.matrix[:, rows] = updated.T
+        state.row_updates += len(rows)
+        self._published(state)
+
+    @staticmethod
+    def _published(state: WindowCorrelation):
+        state.version += 1
+        state.computed_ms = int(time.time() * 1000)
+        state.clusters.clear()
+
+    async def ensure(self, window: str) -> WindowCorrelation:
+        """A window's matrix, computing it on first use."""
+        state = self.correlations[window]
+        if not state.version:
+            await self.refresh(window, int(time.time() * 1000))
+        return state
+
+    # ---- queries ----
+
+    def activity(self, window: str) -> np.ndarray:
+        """Gross flow per actor over a window."""
+        return np.abs(self.rings[window].values[:len(self.ids)]).sum(axis=1)
+
+    def actor(self, row: int) -> Dict[str, Any]:
+        """Id and name of the actor in ``row``."""
+        return {"id": self.ids[row], "name": self.names[row]}
+
+    def partners(self, window: str, row: int, limit: int) -> List[Dict[str, Any]]:
+        """The ``limit`` actors most correlated with ``row``, strongest first."""
+        state = self.correlations[window]
+        if row >= state.n:
+            return []
+        corr = state.matrix[row].copy()
+        corr[row] = -np.inf
+        limit = min(limit, state.n - 1)
+        if limit <= 0:
+            return []
+        top = np.argpartition(-corr, limit - 1)[:limit]
+        top = top[np.argsort(-corr[top], kind="stable")]
+        return [
+            {**self.actor(i), "correlation": round(float(corr[i]), 4)}
+            for i in top.tolist() if corr[i] > 0
+        ]
+
+    def submatrix(self, window: str, rows: np.ndarray) -> np.ndarray:
+        """Correlations among ``rows`` (rows not yet covered read as 0)."""
+        state = self.correlations[window]
+        covered = rows[rows < state.n]
+        out = np.zeros((len(rows), len(rows)), dtype=np.float32)
+        at = np.flatnonzero(rows < state.n)
+        out[np.ix_(at, at)] = state.matrix[np.ix_(covered, covered)]
+        return out
+
+    async def cluster_roots(self, window: str, threshold: float) -> np.ndarray:
+        """Component root per actor on the graph of pairs correlated at least ``threshold``."""
+        state = self.correlations[window]
+        cached = state.clusters.get(threshold)
+        if cached and cached[0] == state.version:
+            return cached[1]
+        version = state.version
+        roots = await asyncio.to_thread(cluster_roots, state.matrix, threshold)
+        if state.version == version:
+            state.clusters[threshold] = (version, roots)
+        return roots
+
+    async def clusters(self, window: str, threshold: float, limit: int = 50) -> List[Dict[str, Any]]:
+        """Groups of two or more actors linked by correlations of at least ``threshold``, largest first."""
+        roots = await self.cluster_roots(window, threshold)
+        labels, sizes = np.unique(roots, return_counts=True)
+        groups = labels[sizes > 1]
+        groups = groups[np.argsort(-sizes[sizes > 1], kind="stable")][:limit]
+        return [
+            {"cluster": int(root), "size": len(members), "actors": [self.ids[m] for m in members]}
+            for root in groups.tolist()
+            for members in [np.flatnonzero(roots == root).tolist()]
+        ]
+
+    # ---- checkpoints ----
+
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Actor names and each window's buckets, for a checkpoint."""
+        n = len(self.ids)
+        arrays = {name: ring.values[:n].copy() for name, ring in self.rings.items()}
+        arrays["names"] = np.array(self.names, dtype=str)
+        heads = {name: ring.head for name, ring in self.rings.items()}
+        return arrays, {"heads": heads}
+
+    def import_state(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        """Restore actors and buckets saved by ``export_state`` with the same windows."""
+        names = arrays["names"].tolist()[:self.capacity]
+        self.names, self.ids = list(names), [actor_id(name) for name in names]
+        self.index = {key: row for row, key in enumerate(self.ids)}
+        for name, ring in self.rings.items():
+            ring.values[:] = 0
+            ring.values[:len(names)] = arrays[name][:len(names)]
+            ring.head = meta["heads"][name]
+
+    def stats(self) -> Dict[str, Any]:
+        """Tracked actors and per-window computation counters."""
+        return {
+            "actors": len(self.ids),
+            "capacity": self.capacity,
+            "dropped": self.dropped,
+            "windows": {
+                name: {
+                    "actors": state.n,
+                    "version": state.version,
+                    "dirty": len(state.dirty),
+                    "full_runs": state.full_runs,
+                    "last_full_ms": round(state.last_full_ms, 2),
+                    "row_updates": state.row_updates,
+                    "computed_ms": state.computed_ms,
+                }
+                for name, state in self.correlations.items()
+            },
+        }
@@ -0,0 +1,260 @@
+"""
+Admission Control
+=================
+Per-client rate limits and per-route-class concurrency with early load
+shedding, so cheap requests stay fast while expensive ones are throttled.
+
+Every route has a policy: a class (``cheap``, ``standard``, ``heavy``) and
+a cost in tokens, fixed or computed from the query (a bigger ``limit``
+costs more). A request is admitted in two steps:
+
+1. The client's token bucket must hold the request's cost; if it does not,
+   the answer is 429 with ``Retry-After`` set to when it will.
+2. The route class must have a free concurrency slot. Requests queue for
+   one, but only while the expected wait (queue length over the class
+   limit, times its recent service time) stays under the class's target;
+   beyond that, or once a queued request has waited the full target, the
+   answer is 503 with ``Retry-After``.
+
+Classes queue independently, so a backlog of heavy requests never delays
+cheap ones. Routes without a policy use the default; WebSocket and other
+non-HTTP traffic and routes whose policy is None pass straight through.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from starlette.datastructures import QueryParams
+from starlette.responses import JSONResponse
+
+from routing import route_template
+
+Cost = Union[float, Callable[[QueryParams], float]]
+
+
+class RoutePolicy(NamedTuple):
+    """Route class and token cost of a route."""
+
+    route_class: str
+    cost: Cost = 1.0
+
+    def cost_of(self, query: QueryParams) -> float:
+        """Tokens a request with ``query`` costs."""
+        return self.cost(query) if callable(self.cost) else self.cost
+
+
+class TokenBuckets:
+    """One token bucket per client, refilled at ``rate`` up to ``burst``."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: Dict[str, List[float]] = {}
+
+    def take(self, client: str, cost: float, now: float) -> float:
+        """Spend ``cost`` tokens; returns 0, or the seconds until the client can afford it."""
+        cost = min(cost, self.burst)
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                self._prune(now)
+            bucket = self._buckets[client] = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < cost:
+            bucket[0] = tokens
+            return (cost - tokens) / self.rate
+        bucket[0] = tokens - cost
+        return 0.0
+
+    def _prune(self, now: float):
+        """Forget clients whose bucket has refilled completely."""
+        self._buckets = {
+            client: bucket for client, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * self.rate < self.burst
+        }
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ClassLimiter:
+    """Concurrency slots for one route class with a bounded-delay FIFO queue."""
+
+    def __init__(self, name: str, limit: int, target_ms: float):
+        self.name = name
+        self.limit = limit
+        self.target_s = target_ms / 1000
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.service_s = 0.01  # moving average of time a slot is held
+
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.throttled = 0
+        self.max_wait_s = 0.0
+
+    def expected_wait(self) -> float:
+        """Estimated queueing delay for a request arriving now."""
+        return (len(self._waiters) + 1) / self.limit * self.service_s
+
+    async def acquire(self) -> float:
+        """Hold a slot and return 0, or return a retry delay if the request is shed."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return 0.0
+        expected = self.expected_wait()
+        if expected > self.target_s:
+            self.shed += 1
+            return expected
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.target_s)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._waiters.remove(waiter)
+                waiter.cancel()
+                self.shed += 1
+                return max(expected, self.target_s)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(0.0)  # the slot was handed over as we were cancelled
+            else:
+                self._waiters.remove(waiter)
+                waiter.cancel()
+            raise
+        self.max_wait_s = max(self.max_wait_s, time.perf_counter() - started)
+        self.admitted += 1
+        return 0.0
+
+    def release(self, held_s: float):
+        """Hand the slot to the next queued request, or free it."""
+        if held_s:
+            self.service_s += 0.1 * (held_s - self.service_s)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Slots, queue and outcome counters."""
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue": len(self._waiters),
+            "target_ms": self.target_s * 1000,
+            "service_ms": round(self.service_s * 1000, 3),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "throttled": self.throttled,
+            "shed": self.shed,
+            "max_wait_ms": round(self.max_wait_s * 1000, 3),
+        }
+
+
+def _retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+class AdmissionControl:
+    """Route policies, client buckets and class limiters shared by the middleware."""
+
+    def __init__(
+        self,
+        policies: Dict[str, Optional[RoutePolicy]],
+        classes: Dict[str, Tuple[int, float]],
+        default: RoutePolicy,
+        rate: float,
+        burst: float,
+        client_header: str = "x-forwarded-for",
+    ):
+        """
+        ``policies`` maps route templates to a policy (None exempts the
+        route); ``classes`` maps class names to (concurrency, queue target
+        in ms); ``rate`` and ``burst`` size every client's bucket in cost
+        units. ``client_header`` names a header identifying the client,
+        set by the proxy in front of the app; requests without it, or with
+        an empty ``client_header``, are keyed by the peer address.
+        """
+        self.policies = policies
+        self.default = default
+        self.limiters = {name: ClassLimiter(name, limit, target_ms) for name, (limit, target_ms) in classes.items()}
+        self.buckets = TokenBuckets(rate, burst)
+        self.client_header = client_header.lower().encode()
+
+    def client_id(self, scope) -> str:
+        """Client key for rate limiting."""
+        if self.client_header:
+            for name, value in scope.get("headers", ()):
+                if name == self.client_header:
+                    # the nearest proxy appends last; earlier hops are client-supplied
+                    client = value.decode("latin-1").split(",")[-1].strip()
+                    if client:
+                        return client
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def policy(self, route: Optional[str]) -> Optional[RoutePolicy]:
+        """Policy for a route template (None: not admission-controlled)."""
+        return self.policies.get(route, self.default) if route else self.default
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-class slots, queue and outcome counters."""
+        return {
+            "clients": len(self.buckets),
+            "rate": self.buckets.rate,
+            "burst": self.buckets.burst,
+            "classes": {name: limiter.stats() for name, limiter in self.limiters.items()},
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an ``AdmissionControl`` to HTTP requests."""
+
+    def __init__(self, app, control: AdmissionControl, routes: List):
+        self.app = app
+        self.control = control
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        policy = self.control.policy(route_template(self.routes, scope))
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.control.limiters[policy.route_class]
+        cost = policy.cost_of(QueryParams(scope.get("query_string", b"")))
+        wait = self.control.buckets.take(self.control.client_id(scope), cost, time.monotonic())
+        if wait:
+            limiter.throttled += 1
+            await self._reject(scope, receive, send, 429, "Rate limit exceeded", wait)
+            return
+        wait = await limiter.acquire()
+        if wait:
+            await self._reject(scope, receive, send, 503, "Server busy, retry later", wait)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
+
+    @staticmethod
+    async def _reject(scope, receive, send, status: int, detail: str, retry_after: float):
+        headers = {"Retry-After": _retry_after(retry_after)}
+        await JSONResponse({"detail": detail}, status_code=status, headers=headers)(scope, receive, send)
@@ -0,0 +1,562 @@
+"""
+Alert Rules
+===========
+User alert rules checked against every ingested transfer.
+
+Two kinds of rule:
+
+- ``transfer``: a transfer of ``token`` on ``chain`` to or from ``entity``
+  (each optional) worth at least ``threshold`` USD.
+- ``netflow``: ``entity``'s net flow (received minus sent, in USD) over a
+  rolling ``window`` moves past ``threshold``. A negative threshold
+  watches outflows.
+
+Transfer rules are indexed like live-stream subscribers, by
+``(token, chain, entity)`` with None as a wildcard, and within each key by
+threshold in a sorted NumPy array. A transfer visits only the keys that
+can match it, at most twelve, and the rules it triggers in a key are the
+prefix whose threshold is at or below its USD value. For a batch, one
+binary search for the largest value finds every triggered rule of a key,
+and a ``searchsorted`` of those thresholds over the running maximum of the
+values finds the transfer that first triggered each. Net flow rules are
+keyed by ``(entity, window, direction)``; when a batch moves an entity's
+flow from ``a`` to ``b``, the triggered rules are those with a threshold
+in ``(a, b]``. Evaluation cost follows the number of triggered rules, not
+the number of rules.
+
+Notifications are deduplicated and rate-limited per rule: a transfer
+already evaluated is skipped, each rule fires at most once per batch, and
+after firing it stays quiet for its cooldown. Triggers during the cooldown
+are counted and reported with the rule's next notification.
+"""
+
+import bisect
+import itertools
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from actors import FlowRing
+
+MINUTE_MS = 60_000
+
+TRANSFER = "transfer"
+NETFLOW = "netflow"
+KINDS = (TRANSFER, NETFLOW)
+
+# Net flow window name -> (bucket width in ms, buckets per window)
+NETFLOW_WINDOWS = {
+    "1h": (MINUTE_MS, 60),
+    "24h": (15 * MINUTE_MS, 96),
+}
+
+DEFAULT_COOLDOWN_S = 60.0
+
+_NONE = (np.empty(0, dtype=np.int64),) * 3
+
+
+class ThresholdIndex:
+    """Rule slots sorted by threshold; inserts are buffered and merged in batches."""
+
+    def __init__(self, merge_at: int = 1024):
+        self.merge_at = merge_at
+        self.thresholds = np.empty(0)
+        self.slots = np.empty(0, dtype=np.int64)
+        self._pending: List[Tuple[float, int]] = []
+
+    def add(self, threshold: float, slot: int):
+        """Insert a rule slot at its threshold."""
+        bisect.insort(self._pending, (threshold, slot))
+        if len(self._pending) >= self.merge_at:
+            self.merge()
+
+    def merge(self):
+        """Fold buffered inserts into the sorted arrays."""
+        if not self._pending:
+            return
+        thresholds = np.array([t for t, _ in self._pending])
+        slots = np.array([s for _, s in self._pending], dtype=np.int64)
+        self._pending = []
+        at = np.searchsorted(self.thresholds, thresholds, side="right")
+        self.thresholds = np.insert(self.thresholds, at, thresholds)
+        self.slots = np.insert(self.slots, at, slots)
+
+    def compact(self, active: np.ndarray):
+        """Drop slots of removed rules."""
+        self.merge()
+        keep = active[self.slots]
+        self.thresholds, self.slots = self.thresholds[keep], self.slots[keep]
+
+    def reached(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Rules whose threshold some of ``values`` (in arrival order) reaches:
+        their slots, the index of the first value reaching each, and how
+        many values do. The rules are the prefix up to the largest value.
+        """
+        self.merge()
+        running = np.maximum.accumulate(values)
+        end = int(np.searchsorted(self.thresholds, running[-1], side="right"))
+        thresholds = self.thresholds[:end]
+        first = np.searchsorted(running, thresholds, side="left")
+        counts = len(values) - np.searchsorted(np.sort(values), thresholds, side="left")
+        return self.slots[:end], first, counts
+
+    def between(self, low: float, high: float) -> np.ndarray:
+        """Slots of rules whose threshold is in ``(low, high]``."""
+        self.merge()
+        start, end = np.searchsorted(self.thresholds, [low, high], side="right")
+        return self.slots[start:end]
+
+    def __len__(self):
+        return len(self.slots) + len(self._pending)
+
+
+def _normalized(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """Rule fields in the case the index uses: tokens upper, chains and entities lower."""
+    return {
+        **rule,
+        "token": rule["token"].upper() if rule.get("token") else None,
+        "chain": rule["chain"].lower() if rule.get("chain") else None,
+        "entity": rule["entity"].lower() if rule.get("entity") else None,
+    }
+
+
+class AlertEngine:
+    """Indexed alert rules, net flow windows for watched entities, and recent notifications."""
+
+    def __init__(
+        self,
+        resolve: Callable[[Sequence[str]], List[Optional[str]]],
+        entity_of: Callable[[Optional[str]], Optional[str]],
+        windows: Dict[str, tuple] = NETFLOW_WINDOWS,
+        max_entities: int = 10_000,
+        max_notifications: int = 10_000,
+        remember_transfers: int = 100_000,
+    ):
+        """
+        ``resolve`` maps addresses to labels in one call; a label carried on
+        the transfer takes precedence. ``entity_of`` maps a label to its
+        entity name. Net flow is tracked only for entities some rule
+        watches, at most ``max_entities`` of them.
+        """
+        self.resolve = resolve
+        self.entity_of = entity_of
+        self.windows = windows
+        self.max_entities = max_entities
+        self.rules: Dict[str, Dict[str, Any]] = {}
+        self._slot_of: Dict[str, int] = {}
+        self._rule_at: List[Optional[str]] = []
+        self._transfer: Dict[Tuple, ThresholdIndex] = {}
+        self._netflow: Dict[Tuple, ThresholdIndex] = {}
+        self._entity_keys = 0  # transfer keys with an entity; none means entities need not be resolved
+
+        # per-slot rule state, grown by doubling
+        self.active = np.zeros(0, dtype=bool)
+        self.cooldown_ms = np.zeros(0, dtype=np.int64)
+        self.next_ms = np.zeros(0, dtype=np.int64)
+        self.suppressed = np.zeros(0, dtype=np.int64)
+        self.fired = np.zeros(0, dtype=np.int64)
+        self._removed = 0
+
+        self.entities: Dict[str, int] = {}
+        self.rings = {name: FlowRing(max_entities, bucket_ms, buckets) for name, (bucket_ms, buckets) in windows.items()}
+
+        self.notifications: Deque[Dict[str, Any]] = deque(maxlen=max_notifications)
+        self._seq = itertools.count(1)
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self.remember_transfers = remember_transfers
+
+        self.evaluated = 0
+        self.duplicates = 0
+        self.triggered = 0
+        self.throttled = 0
+        self.notified = 0
+        self.eval_ms = 0.0
+
+    # ---- rules ----
+
+    def _grow(self, size: int):
+        if size <= len(self.active):
+            return
+        capacity = max(size, 2 * len(self.active), 1024)
+        for name in ("active", "cooldown_ms", "next_ms", "suppressed", "fired"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add_rule(self, rule: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Index a rule. ``rule`` has ``kind``, ``threshold`` and optional
+        ``token``, ``chain``, ``entity``, ``window`` (netflow), ``cooldown_s``,
+        ``owner`` and ``id`` (generated if missing). Returns the stored rule.
+        """
+        rule = _normalized(rule)
+        if not rule.get("id"):
+            rule["id"] = uuid.uuid4().hex
+        rule.setdefault("cooldown_s", DEFAULT_COOLDOWN_S)
+        if rule["kind"] == NETFLOW:
+            if not rule["entity"]:
+                raise ValueError("netflow rules need an entity")
+            if rule.get("window") not in self.windows:
+                raise ValueError(f"Unknown netflow window: {rule.get('window')}")
+            if rule["entity"] not in self.entities:
+                if len(self.entities) >= self.max_entities:
+                    raise ValueError("Too many watched entities")
+                self.entities[rule["entity"]] = len(self.entities)
+        elif rule["kind"] != TRANSFER:
+            raise ValueError(f"Unknown rule kind: {rule['kind']}")
+        if rule["id"] in self.rules:
+            self.remove_rule(rule["id"])
+
+        slot = len(self._rule_at)
+        self._grow(slot + 1)
+        self._rule_at.append(rule["id"])
+        self._slot_of[rule["id"]] = slot
+        self.rules[rule["id"]] = rule
+        self.active[slot] = True
+        self.cooldown_ms[slot] = int(rule["cooldown_s"] * 1000)
+
+        threshold = float(rule["threshold"])
+        if rule["kind"] == TRANSFER:
+            key = (rule["token"], rule["chain"], rule["entity"])
+            index = self._transfer.get(key)
+            if index is None:
+                index = self._transfer[key] = ThresholdIndex()
+                self._entity_keys += key[2] is not None
+            index.add(threshold, slot)
+        else:
+            direction = 1 if threshold >= 0 else -1
+            key = (rule["entity"], rule["window"], direction)
+            index = self._netflow.get(key)
+            if index is None:
+                index = self._netflow[key] = ThresholdIndex()
+            index.add(abs(threshold), slot)
+        return rule
+
+    def remove_rule(self, rule_id: str) -> bool:
+        """Stop evaluating a rule; its index entry is dropped at the next compaction."""
+        rule = self.rules.pop(rule_id, None)
+        if rule is None:
+            return False
+        slot = self._slot_of.pop(rule_id)
+        self._rule_at[slot] = None
+        self.active[slot] = False
+        self._removed += 1
+        if self._removed > 1024 and self._removed * 2 > len(self.rules):
+            self._compact()
+        return True
+
+    def _compact(self):
+        """Drop removed rules from every index, and keys left empty."""
+        for indexes in (self._transfer, self._netflow):
+            for key in list(indexes):
+                indexes[key].compact(self.active)
+                if not len(indexes[key]):
+                    del indexes[key]
+        self._entity_keys = sum(key[2] is not None for key in self._transfer)
+        self._removed = 0
+
+    def list_rules(self, owner: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Rules, oldest first, optionally of one owner."""
+        rules = (r for r in self.rules.values() if owner is None or r.get("owner") == owner)
+        return [self.describe(r) for r in itertools.islice(rules, limit)]
+
+    def describe(self, rule: Dict[str, Any]) -> Dict[str, Any]:
+        """A rule with its firing counters."""
+        slot = self._slot_of[rule["id"]]
+        return {**rule, "fired": int(self.fired[slot]), "suppressed": int(self.suppressed[slot])}
+
+    def sync_rules(self, stored: Sequence[Dict[str, Any]], settled_ms: int) -> Tuple[int, int]:
+        """
+        Match the indexed rules to ``stored``, e.g. after another worker
+        changed them. Rules created at or after ``settled_ms`` are kept even
+        if missing, as their insert may still be in flight. Returns how many
+        rules were added and removed.
+        """
+        ids = {rule["id"] for rule in stored}
+        removed = [
+            rule_id for rule_id, rule in self.rules.items()
+            if rule_id not in ids and rule.get("created_at", 0) < settled_ms
+        ]
+        for rule_id in removed:
+            self.remove_rule(rule_id)
+        added = 0
+        for rule in stored:
+            if rule["id"] in self.rules:
+                continue
+            try:
+                self.add_rule(rule)
+            except ValueError:
+                continue  # skipped, as at startup
+            added += 1
+        return added, len(removed)
+
+    # ---- state ----
+
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Watched entity names and each window's net flow buckets, for a checkpoint."""
+        n = len(self.entities)
+        arrays = {name: ring.values[:n].copy() for name, ring in self.rings.items()}
+        arrays["entities"] = np.array(list(self.entities), dtype=str)
+        heads = {name: ring.head for name, ring in self.rings.items()}
+        return arrays, {"heads": heads}
+
+    def import_state(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        """
+        Restore buckets saved by ``export_state`` with the same windows.
+        Flows are kept for the entities the current rules watch; load the
+        rules first.
+        """
+        saved = arrays["entities"].tolist()
+        found = [(old, self.entities[entity]) for old, entity in enumerate(saved) if entity in self.entities]
+        old_rows = np.array([old for old, _ in found], dtype=np.int64)
+        new_rows = np.array([new for _, new in found], dtype=np.int64)
+        for name, ring in self.rings.items():
+            ring.values[:] = 0
+            ring.values[new_rows] = arrays[name][old_rows]
+            ring.head = meta["heads"][name]
+
+    # ---- evaluation ----
+
+    def _fresh(self, docs: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Transfers not evaluated before, remembering them."""
+        fresh = []
+        for doc in docs:
+            if doc["_id"] in self._seen:
+                self.duplicates += 1
+                continue
+            self._seen[doc["_id"]] = None
+            fresh.append(doc)
+        while len(self._seen) > self.remember_transfers:
+            self._seen.popitem(last=False)
+        return fresh
+
+    def _entities_of(self, docs: Sequence[Dict[str, Any]]) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+        """Lowercase sender and receiver entity of each transfer (all None if no rule needs them)."""
+        if not self._entity_keys and not self._netflow:
+            return [None] * len(docs), [None] * len(docs)
+        found = self.resolve([d["from_address"] for d in docs] + [d["to_address"] for d in docs])
+        n = len(docs)
+        senders, receivers = [], []
+        for i, doc in enumerate(docs):
+            sender = self.entity_of(doc.get("from_label") or found[i])
+            receiver = self.entity_of(doc.get("to_label") or found[n + i])
+            senders.append(sender.lower() if sender else None)
+            receivers.append(receiver.lower() if receiver else None)
+        return senders, receivers
+
+    def _match_transfers(self, docs, senders, receivers) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Triggered transfer rules: slots, the first transfer triggering each, and trigger counts."""
+        groups: Dict[Tuple, List[int]] = {}
+        indexes = self._transfer
+        for i, doc in enumerate(docs):
+            token, chain, sender, receiver = doc["token"], doc["chain"], senders[i], receivers[i]
+            if not self._entity_keys or sender is receiver is None:
+                entities = (None,)
+            elif sender is None or receiver is None or sender == receiver:
+                entities = (None, sender or receiver)
+            else:
+                entities = (None, sender, receiver)
+            for key in itertools.product((token, None), (chain, None), entities):
+                if key in indexes:
+                    members = groups.get(key)
+                    if members is None:
+                        groups[key] = [i]
+                    else:
+                        members.append(i)
+        if not groups:
+            return _NONE
+        usd = np.array([d["usd_raw"] for d in docs])
+        found = []
+        for key, members in groups.items():
+            at = np.array(members, dtype=np.int64)
+            slots, first, counts = indexes[key].reached(usd[at])
+            found.append((slots, at[first], counts))
+        return tuple(np.concatenate(column) for column in zip(*found))
+
+    def _match_netflows(self, docs, senders, receivers) -> Tuple[List[Tuple[str, str, float]], Tuple[np.ndarray, ...]]:
+        """
+        Fold transfers into watched entities' flows. Returns the
+        ``(entity, window, flow)`` changes that crossed thresholds, and the
+        triggered slots with the change each belongs to.
+        """
+        rows, ts, amounts = [], [], []
+        for doc, sender, receiver in zip(docs, senders, receivers):
+            if sender == receiver:
+                continue
+            for entity, sign in ((sender, -1.0), (receiver, 1.0)):
+                row = self.entities.get(entity) if entity else None
+                if row is not None:
+                    rows.append(row)
+                    ts.append(doc["ts"])
+                    amounts.append(sign * doc["usd_raw"])
+        if not rows:
+            return [], _NONE
+        rows_arr = np.array(rows, dtype=np.int64)
+        ts_arr = np.array(ts, dtype=np.int64)
+        amounts_arr = np.array(amounts)
+        touched = np.unique(rows_arr)
+        names = list(self.entities)
+        events, found_slots, found_events = [], [], []
+        for window, ring in self.rings.items():
+            ring.advance(int(ts_arr.max()) // ring.bucket_ms)
+            before = ring.values[touched].sum(axis=1)
+            ring.add(ts_arr, rows_arr, amounts_arr)
+            after = ring.values[touched].sum(axis=1)
+            for row, low, high in zip(touched.tolist(), before.tolist(), after.tolist()):
+                for direction in (1, -1):
+                    index = self._netflow.get((names[row], window, direction))
+                    if index is None or direction * high <= direction * low:
+                        continue
+                    slots = index.between(direction * low, direction * high)
+                    if len(slots):
+                        found_slots.append(slots)
+                        found_events.append(np.full(len(slots), len(events)))
+                        events.append((names[row], window, high))
+        if not events:
+            return [], _NONE
+        slots = np.concatenate(found_slots)
+        return events, (slots, np.concatenate(found_events), np.ones(len(slots), dtype=np.int64))
+
+    def _throttle(self, slots: np.ndarray, first: np.ndarray, counts: np.ndarray,
+                  now_ms: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Rules allowed to fire among triggered ``slots`` (each rule once, with
+        its first trigger and trigger count): their slots and first triggers
+        in trigger order, and the triggers suppressed since they last fired.
+        """
+        live = self.active[slots]
+        slots, first, counts = slots[live], first[live], counts[live]
+        ready = self.next_ms[slots] <= now_ms
+        waiting = slots[~ready]
+        self.suppressed[waiting] += counts[~ready]
+        fire = slots[ready]
+        suppressed = self.suppressed[fire] + counts[ready] - 1
+        self.suppressed[fire] = 0
+        self.next_ms[fire] = now_ms + self.cooldown_ms[fire]
+        self.fired[fire] += 1
+        self.triggered += int(counts.sum())
+        self.throttled += int(counts.sum()) - len(fire)
+        order = np.argsort(first[ready], kind="stable")
+        return fire[order], first[ready][order], suppressed[order]
+
+    def evaluate(self, docs: Sequence[Dict[str, Any]], now_ms: Optional[int] = None,
+                 notify: bool = True) -> List[Dict[str, Any]]:
+        """
+        Check stored transfers against every rule and return the new
+        notifications. With ``notify`` False only net flow windows are
+        updated, e.g. while replaying history at startup.
+        """
+        started = time.perf_counter()
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+        if notify:
+            docs = self._fresh(docs)
+        if not docs or (not self._transfer and not self._netflow):
+            return []
+        senders, receivers = self._entities_of(docs)
+        events, netflow_found = self._match_netflows(docs, senders, receivers)
+        if not notify:
+            return []
+        transfer_found = self._match_transfers(docs, senders, receivers)
+        self.evaluated += len(docs)
+
+        created = []
+        for source, (slots, first, counts) in (("transfer", transfer_found), ("netflow", netflow_found)):
+            if not len(slots):
+                continue
+            fire, first, suppressed = self._throttle(slots, first, counts, now_ms)
+            shared = {}  # one summary per transfer, however many rules it fires
+            for slot, position, skipped in zip(fire.tolist(), first.tolist(), suppressed.tolist()):
+                rule = self.rules[self._rule_at[slot]]
+                note = {
+                    "seq": next(self._seq),
+                    "ts": now_ms,
+                    "rule_id": rule["id"],
+                    "owner": rule.get("owner"),
+                    "kind": rule["kind"],
+                    "suppressed": skipped,
+                }
+                if source == "transfer":
+                    summary = shared.get(position)
+                    if summary is None:
+                        doc = docs[position]
+                        summary = shared[position] = {
+                            "id": doc["_id"], "ts": doc["ts"], "token": doc["token"], "chain": doc["chain"],
+                            "usd": doc["usd_raw"], "from": senders[position], "to": receivers[position],
+                        }
+                    note["transfer"] = summary
+                else:
+                    entity, window, flow = events[position]
+                    note["netflow"] = {"entity": entity, "window": window, "usd": flow}
+                created.append(note)
+        self.notifications.extend(created)
+        self.notified += len(created)
+        self.eval_ms += (time.perf_counter() - started) * 1000
+        return created
+
+    def recent(self, after: int = 0, owner: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Notifications with ``seq`` above ``after``, oldest first."""
+        found = []
+        for note in reversed(self.notifications):
+            if note["seq"] <= after:
+                break
+            if owner is None or note["owner"] == owner:
+                found.append(note)
+        return found[::-1][:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        """Rule and index sizes, evaluation and notification counters."""
+        kinds = {kind: 0 for kind in KINDS}
+        for rule in self.rules.values():
+            kinds[rule["kind"]] += 1
+        return {
+            "rules": kinds,
+            "transfer_keys": len(self._transfer),
+            "netflow_keys": len(self._netflow),
+            "watched_entities": len(self.entities),
+            "evaluated": self.evaluated,
+            "duplicates": self.duplicates,
+            "triggered": self.triggered,
+            "throttled": self.throttled,
+            "notified": self.notified,
+            "eval_ms": round(self.eval_ms, 2),
+            "events_per_s": round(self.evaluated / (self.eval_ms / 1000)) if self.eval_ms else None,
+        }
+
+
+class AlertRuleStore:
+    """Alert rules persisted in a MongoDB collection."""
+
+    def __init__(self, collection=None):
+        self.collection = collection
+
+    def bind(self, collection):
+        """Use ``collection``, e.g. once the app has opened its Mongo client."""
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        """Index rules by owner for listing."""
+        await self.collection.create_index("owner")
+
+    async def insert(self, rule: Dict[str, Any]):
+        """Store a rule under its id."""
+        doc = {k: v for k, v in rule.items() if k != "id"}
+        await self.collection.insert_one({"_id": rule["id"], **doc})
+
+    async def delete(self, rule_id: str) -> bool:
+        """Delete a rule; False if there was none."""
+        result = await self.collection.delete_one({"_id": rule_id})
+        return result.deleted_count > 0
+
+    async def load(self) -> List[Dict[str, Any]]:
+        """Every stored rule, with ``_id`` as ``id``."""
+        rules = []
+        async for doc in self.collection.find({}):
+            doc["id"] = doc.pop("_id")
+            rules.append(doc)
+        return rules
@@ -0,0 +1,181 @@
+"""
+Warm-Start Checkpoints
+======================
+Periodic on-disk snapshots of in-memory analytics state.
+
+A checkpoint is a directory of ``.npy`` arrays plus a ``manifest.json``
+describing them: the format version, a schema fingerprint of the
+configuration the state was built with, each component's metadata and the
+replay watermark. It is written to a temporary directory and renamed into
+place, so a checkpoint that exists is complete. Arrays are loaded
+memory-mapped and copied into live state only where it is mutable.
+
+On startup the newest compatible checkpoint is restored and only the
+transfers newer than its watermark are replayed. Transfers are written
+out of order by up to the ingest pipeline's in-flight window, so the
+watermark keeps the ids applied during the last ``lateness_ms``; replay
+starts that much earlier and skips those ids instead of applying them twice.
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+MANIFEST = "manifest.json"
+PREFIX = "ckpt-"
+
+Arrays = Dict[str, np.ndarray]
+State = Tuple[Arrays, Dict[str, Any]]
+
+
+class ReplayWatermark:
+    """Newest applied transfer time plus the ids applied shortly before it."""
+
+    def __init__(self, lateness_ms: int = 60_000):
+        self.lateness_ms = lateness_ms
+        self.ts = 0
+        self._recent: deque = deque()
+        self.skip: set = set()
+
+    def observe(self, docs: Iterable[Dict[str, Any]]):
+        """Record transfers that were folded into state."""
+        for doc in docs:
+            ts = doc["ts"]
+            if ts > self.ts:
+                self.ts = ts
+            self._recent.append((ts, doc["_id"]))
+        horizon = self.ts - self.lateness_ms
+        while self._recent and self._recent[0][0] <= horizon:
+            self._recent.popleft()
+
+    def replay_since(self) -> int:
+        """Exclusive lower bound on ``ts`` for the replay after a restore."""
+        return max(0, self.ts - self.lateness_ms) if self.ts else 0
+
+    def fresh(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Replayed transfers that the restored state does not already contain."""
+        if not self.skip:
+            return docs
+        return [doc for doc in docs if doc["_id"] not in self.skip]
+
+    def export_state(self) -> State:
+        """Watermark and recent ids, for a checkpoint."""
+        return {"recent_ids": np.array([i for _, i in self._recent], dtype=str)}, {"ts": self.ts}
+
+    def import_state(self, arrays: Arrays, meta: Dict[str, Any]):
+        """Restore a saved watermark; its recent ids are skipped by ``fresh``."""
+        self.ts = meta["ts"]
+        self.skip = set(arrays["recent_ids"].tolist())
+        self._recent.clear()
+
+
+class Checkpoint(NamedTuple):
+    """One checkpoint directory and its manifest."""
+
+    path: str
+    manifest: Dict[str, Any]
+
+    @property
+    def age_s(self) -> float:
+        """Seconds since the checkpoint was written."""
+        return time.time() - self.manifest["created_ms"] / 1000
+
+    def component(self, name: str) -> State:
+        """Arrays (memory-mapped, read-only) and metadata of one component."""
+        entry = self.manifest["components"][name]
+        arrays = {
+            key: np.load(os.path.join(self.path, f"{name}.{key}.npy"), mmap_mode="r", allow_pickle=False)
+            for key in entry["arrays"]
+        }
+        return arrays, entry["meta"]
+
+
+class CheckpointStore:
+    """Versioned checkpoints in one directory, newest ``keep`` retained."""
+
+    def __init__(self, directory: str, keep: int = 2):
+        self.directory = directory
+        self.keep = keep
+        self.saved = 0
+        self.last_save_ms = 0.0
+        self.last_path: Optional[str] = None
+        # filled in by the startup restore
+        self.restored_from: Optional[str] = None
+        self.replayed = 0
+        self.warm_start_ms = 0.0
+
+    def _checkpoints(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(n for n in names if n.startswith(PREFIX) and not n.endswith(".tmp"))
+
+    def save(self, components: Dict[str, State], schema: Dict[str, Any]) -> str:
+        """
+        Write one checkpoint and prune old ones; returns its path.
+
+        ``components`` must already be copies: this runs off the event loop
+        while live state keeps changing.
+        """
+        started = time.perf_counter()
+        created_ms = int(time.time() * 1000)
+        name = f"{PREFIX}{created_ms:015d}-{os.getpid()}"
+        tmp = os.path.join(self.directory, name + ".tmp")
+        os.makedirs(tmp, exist_ok=True)
+        manifest: Dict[str, Any] = {
+            "version": VERSION, "created_ms": created_ms, "schema": schema, "components": {},
+        }
+        for component, (arrays, meta) in components.items():
+            for key, array in arrays.items():
+                np.save(os.path.join(tmp, f"{component}.{key}.npy"), array, allow_pickle=False)
+            manifest["components"][component] = {"arrays": sorted(arrays), "meta": meta}
+        with open(os.path.join(tmp, MANIFEST), "w") as fh:
+            json.dump(manifest, fh)
+        path = os.path.join(self.directory, name)
+        os.rename(tmp, path)
+
+        for old in self._checkpoints()[:-self.keep]:
+            shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+        self.saved += 1
+        self.last_save_ms = (time.perf_counter() - started) * 1000
+        self.last_path = path
+        return path
+
+    def latest(self, schema: Dict[str, Any]) -> Optional[Checkpoint]:
+        """Newest readable checkpoint written with the same version and ``schema``."""
+        schema = json.loads(json.dumps(schema))  # tuples compare as the lists they load as
+        for name in reversed(self._checkpoints()):
+            path = os.path.join(self.directory, name)
+            try:
+                with open(os.path.join(path, MANIFEST)) as fh:
+                    manifest = json.load(fh)
+            except (OSError, ValueError):
+                logger.warning("Skipping unreadable checkpoint %s", path)
+                continue
+            if manifest.get("version") != VERSION or manifest.get("schema") != schema:
+                logger.info("Skipping checkpoint %s written with a different schema", path)
+                continue
+            return Checkpoint(path, manifest)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Save counters and how the last startup was restored."""
+        return {
+            "directory": self.directory,
+            "saved": self.saved,
+            "last_path": self.last_path,
+            "last_save_ms": round(self.last_save_ms, 2),
+            "restored_from": self.restored_from,
+            "replayed": self.replayed,
+            "warm_start_ms": round(self.warm_start_ms, 2),
+        }
@@ -0,0 +1,152 @@
+"""
+Request Coalescing
+==================
+Single-flight execution for expensive ``api_router`` handlers.
+
+Requests are keyed by handler plus its validated parameters (path and
+query values after defaults and type conversion, so ``?limit=15`` and no
+``limit`` are the same request). The first request for a key runs the
+handler; identical requests arriving while it runs await the same
+computation, and for ``grace`` seconds after it finishes the result also
+serves late arrivals. JSON results are encoded once and shared as bytes.
+
+Failures are shared with the requests that were waiting but never kept
+for the grace window. If the request running a computation is cancelled,
+one of its waiters starts it again. Streaming handlers must not be
+coalesced.
+"""
+
+import asyncio
+import functools
+import inspect
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from fastapi import Request, Response
+
+from response_cache import encode_json
+
+
+def call_key(func: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any], signature=None) -> Hashable:
+    """Handler name plus its arguments, positional or not, by name in a canonical order."""
+    bound = (signature or inspect.signature(func)).bind(*args, **kwargs)
+    bound.apply_defaults()
+    params = tuple(sorted(
+        (name, value if isinstance(value, Hashable) else repr(value))
+        for name, value in bound.arguments.items()
+        if not isinstance(value, Request)
+    ))
+    return (func.__module__, func.__qualname__, params)
+
+
+class SingleFlight:
+    """In-flight and recently finished handler results, shared by key."""
+
+    def __init__(self, grace: float = 0.25, max_recent: int = 1024):
+        self.grace = grace
+        self.max_recent = max_recent
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._recent: Dict[Hashable, Tuple[float, Any]] = {}
+
+        self.computed = 0
+        self.coalesced = 0
+        self.grace_hits = 0
+        self.failures = 0
+
+    def _recent_result(self, key: Hashable, now: float):
+        entry = self._recent.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._recent[key]
+            return None
+        return entry
+
+    def _remember(self, key: Hashable, result: Any, now: float):
+        if self.grace <= 0:
+            return
+        if len(self._recent) >= self.max_recent:
+            self._recent = {k: v for k, v in self._recent.items() if v[0] > now}
+            if len(self._recent) >= self.max_recent:
+                return
+        self._recent[key] = (now + self.grace, result)
+
+    async def run(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """Result of ``func(*args, **kwargs)``, shared with identical concurrent calls."""
+        while True:
+            entry = self._recent_result(key, time.monotonic())
+            if entry is not None:
+                self.grace_hits += 1
+                return entry[1]
+            shared = self._in_flight.get(key)
+            if shared is None:
+                break
+            try:
+                result = await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                if not shared.cancelled():
+                    raise  # this request itself was cancelled
+                continue  # the computing request went away: take over
+            self.coalesced += 1
+            return result
+
+        # Computed inline rather than in a task: a handler that never awaits
+        # finishes without yielding to the loop, exactly as if uncoalesced
+        shared = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        shared.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.computed += 1
+        try:
+            result = await func(*args, **kwargs)
+            if not isinstance(result, Response):
+                result = encode_json(result)
+        except asyncio.CancelledError:
+            shared.cancel()
+            raise
+        except BaseException as exc:
+            self.failures += 1
+            shared.set_exception(exc)
+            raise
+        finally:
+            if self._in_flight.get(key) is shared:
+                del self._in_flight[key]
+        shared.set_result(result)
+        self._remember(key, result, time.monotonic())
+        return result
+
+    def coalesce(self) -> Callable:
+        """
+        Coalesce a handler's identical concurrent requests.
+
+        Apply directly below the ``@api_router`` decorator. Not for handlers
+        under ``ResponseCache.cached``, which already shares encoded bodies
+        and passes the ``Response`` this returns through uncached.
+        """
+
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                result = await self.run(call_key(func, args, kwargs, signature), func, *args, **kwargs)
+                if isinstance(result, bytes):
+                    return Response(content=result, media_type="application/json")
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> Dict[str, Any]:
+        """Computations run and requests that shared one instead."""
+        requests = self.computed + self.coalesced + self.grace_hits
+        saved = self.coalesced + self.grace_hits
+        return {
+            "in_flight": len(self._in_flight),
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "grace_hits": self.grace_hits,
+            "saved": saved,
+            "saved_ratio": round(saved / requests, 4) if requests else 0.0,
+            "failures": self.failures,
+            "grace_s": self.grace,
+        }
@@ -0,0 +1,90 @@
+"""
+Batch Dashboard
+===============
+Runs the per-token lookups behind a dashboard for many tokens at once.
+
+Each section maps a token id to a key and loads that key. Tokens whose
+keys coincide (aliases, fallbacks, or sections that do not depend on the
+token at all) share one load; sections with a ``load_many`` resolve every
+key in the batch with a single call. At most ``concurrency`` tokens are in
+flight at once, and each is yielded as soon as all of its sections are
+done, so the first tokens are not held back by the slowest one.
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+
+class Section(NamedTuple):
+    """How one dashboard section is keyed and loaded."""
+
+    key: Callable[[str], Hashable]
+    load: Optional[Callable[[Hashable], Awaitable[Any]]] = None
+    load_many: Optional[Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]] = None
+
+
+def error_detail(exc: BaseException) -> str:
+    """Client-facing message for a failed section."""
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    return "internal error"
+
+
+class DashboardBatch:
+    """Concurrent, de-duplicated section loads for a list of tokens."""
+
+    def __init__(self, sections: Dict[str, Section], concurrency: int = 8):
+        self.sections = sections
+        self.concurrency = concurrency
+
+    async def stream(self, token_ids: Iterable[str], names: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield ``{"token_id", "sections", "errors"}`` per distinct token, in
+        completion order.
+        """
+        token_ids = list(dict.fromkeys(token_ids))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        shared: Dict[tuple, asyncio.Task] = {}
+
+        def shared_task(name: str, key: Hashable) -> asyncio.Task:
+            section = self.sections[name]
+            if section.load_many is not None:
+                batch = shared.get((name, None))
+                if batch is None:
+                    keys = list(dict.fromkeys(section.key(t) for t in token_ids))
+                    batch = shared[(name, None)] = asyncio.ensure_future(section.load_many(keys))
+                return batch
+            task = shared.get((name, key))
+            if task is None:
+                task = shared[(name, key)] = asyncio.ensure_future(section.load(key))
+            return task
+
+        async def one(token_id: str) -> Dict[str, Any]:
+            keys = [self.sections[name].key(token_id) for name in names]
+            async with semaphore:
+                tasks = [shared_task(name, key) for name, key in zip(names, keys)]
+                outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+            result: Dict[str, Any] = {"token_id": token_id, "sections": {}, "errors": {}}
+            for name, key, outcome in zip(names, keys, outcomes):
+                if isinstance(outcome, BaseException):
+                    if not isinstance(outcome, HTTPException):
+                        logger.error("Dashboard section %s failed for %s", name, token_id, exc_info=outcome)
+                    result["errors"][name] = error_detail(outcome)
+                elif self.sections[name].load_many is not None:
+                    result["sections"][name] = outcome.get(key)
+                else:
+                    result["sections"][name] = outcome
+            return result
+
+        pending = [asyncio.ensure_future(one(token_id)) for token_id in token_ids]
+        try:
+            for finished in asyncio.as_completed(pending):
+                yield await finished
+        finally:
+            for task in [*pending, *shared.values()]:
+                task.cancel()
@@ -0,0 +1,83 @@
+"""
+Response Encodings
+==================
+Column-oriented responses for chart and table endpoints.
+
+Endpoints keep their formatted JSON as the default; ``?format=`` selects
+one of the typed encodings instead:
+
+- ``raw``: JSON with typed numbers, ``{"columns": {name: [...]}, ...meta}``
+- ``msgpack``: the same document as MessagePack
+- ``arrow``: an Arrow IPC stream of the columns, meta in schema metadata
+
+MessagePack and Arrow are optional dependencies; asking for one that is
+not installed is answered with 406.
+"""
+
+import json
+from typing import Any, Dict, Mapping, Sequence, Union
+
+import numpy as np
+from fastapi import HTTPException, Response
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+DEFAULT_FORMAT = "json"
+FORMATS = ("json", "raw", "msgpack", "arrow")
+FORMAT_DESCRIPTION = "Response encoding: json (formatted, default), raw (typed columns), msgpack, arrow"
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+Column = Union[np.ndarray, Sequence[Any]]
+
+
+def check_format(fmt: str) -> str:
+    """Normalized format name; 400 for unknown names, 406 if its encoder is missing."""
+    fmt = (fmt or DEFAULT_FORMAT).lower()
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {fmt}")
+    if fmt == "msgpack" and msgpack is None:
+        raise HTTPException(status_code=406, detail="MessagePack encoding is not available")
+    if fmt == "arrow" and pa is None:
+        raise HTTPException(status_code=406, detail="Arrow encoding is not available")
+    return fmt
+
+
+def _as_list(column: Column) -> list:
+    return column.tolist() if isinstance(column, np.ndarray) else list(column)
+
+
+def columnar(fmt: str, columns: Mapping[str, Column], **meta) -> Union[Dict[str, Any], Response]:
+    """
+    Encode ``columns`` in a non-default format.
+
+    Numeric columns are NumPy arrays; plain lists are string columns (None
+    allowed). ``raw`` returns a plain dict so it passes through FastAPI (and the
+    response cache) like any JSON result; binary formats return a Response.
+    """
+    if fmt == "arrow":
+        table = pa.table(
+            {
+                name: col if isinstance(col, np.ndarray) else pa.array(list(col), type=pa.string())
+                for name, col in columns.items()
+            },
+            metadata={key: json.dumps(value) for key, value in meta.items()},
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_MEDIA_TYPE)
+
+    document = {"columns": {name: _as_list(col) for name, col in columns.items()}, **meta}
+    if fmt == "msgpack":
+        return Response(content=msgpack.packb(document, use_bin_type=True), media_type=MSGPACK_MEDIA_TYPE)
+    return document
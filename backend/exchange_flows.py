@@ -0,0 +1,179 @@
+"""
+Exchange Flow Aggregator
+========================
+Rolling per-asset exchange inflow/outflow/volume over 1h, 24h and 7d.
+
+Each window is a ring of ``2 * buckets`` fixed-width time buckets: the newest
+``buckets`` make up the current window and the ones before them the previous
+window, which ``*_change`` percentages are measured against. Running totals
+for both halves are maintained as buckets rotate, so adding a transfer is a
+constant-time update and reading a window costs O(assets).
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+MINUTE_MS = 60_000
+
+# Window name -> (bucket width in ms, buckets per window)
+WINDOWS = {
+    "1h": (MINUTE_MS, 60),
+    "24h": (15 * MINUTE_MS, 96),
+    "7d": (120 * MINUTE_MS, 84),
+}
+
+INFLOW, OUTFLOW, VOLUME = 0, 1, 2
+METRICS = 3
+
+
+class RollingWindow:
+    """Ring of time buckets holding [inflow, outflow, volume] per asset."""
+
+    def __init__(self, n_assets: int, bucket_ms: int, buckets: int):
+        self.bucket_ms = bucket_ms
+        self.buckets = buckets
+        self.ring = np.zeros((2 * buckets, n_assets, METRICS))
+        self.current = np.zeros((n_assets, METRICS))
+        self.previous = np.zeros((n_assets, METRICS))
+        self.head: Optional[int] = None  # absolute index of the newest bucket
+
+    def _slot(self, bucket: int) -> int:
+        return bucket % (2 * self.buckets)
+
+    def advance(self, bucket: int):
+        """Rotate the ring forward so ``bucket`` is the newest bucket."""
+        if self.head is None:
+            self.head = bucket
+            return
+        steps = bucket - self.head
+        if steps <= 0:
+            return
+        if steps >= 2 * self.buckets:
+            self.ring[:] = 0
+            self.current[:] = 0
+            self.previous[:] = 0
+        else:
+            for b in range(self.head + 1, bucket + 1):
+                leaving_previous = self.ring[self._slot(b)]
+                self.previous -= leaving_previous
+                leaving_previous[:] = 0
+                leaving_current = self.ring[self._slot(b - self.buckets)]
+                self.current -= leaving_current
+                self.previous += leaving_current
+            if self._slot(bucket) < steps:
+                # Re-derive totals once per lap so float error cannot build up
+                self._resync(bucket)
+        self.head = bucket
+
+    def _resync(self, head: int):
+        slots = [self._slot(head - i) for i in range(2 * self.buckets)]
+        self.current[:] = self.ring[slots[:self.buckets]].sum(axis=0)
+        self.previous[:] = self.ring[slots[self.buckets:]].sum(axis=0)
+
+    def add(self, ts_ms: int, asset: int, inflow: float, outflow: float):
+        """Record one exchange transfer; O(1) unless the ring has to rotate."""
+        bucket = ts_ms // self.bucket_ms
+        if self.head is None or bucket > self.head:
+            self.advance(bucket)
+        age = self.head - bucket
+        if age >= 2 * self.buckets:
+            return
+        row = (inflow, outflow, inflow + outflow)
+        self.ring[self._slot(bucket), asset] += row
+        if age < self.buckets:
+            self.current[asset] += row
+        else:
+            self.previous[asset] += row
+
+
+def _pct_change(current: np.ndarray, previous: np.ndarray) -> np.ndarray:
+    """Percent change vs. the previous window; 0 where there is no baseline."""
+    base = np.abs(previous)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(base > 0, (current - previous) / base * 100, 0.0)
+    return np.round(change, 2)
+
+
+class ExchangeFlowAggregator:
+    """Streaming exchange-flow state for a fixed list of assets."""
+
+    def __init__(self, assets: List[Dict[str, Any]], windows: Dict[str, tuple] = WINDOWS,
+                 on_rotate: Optional[Callable[[], None]] = None):
+        """``on_rotate`` is called after a batch moves any window to a new bucket."""
+        self.assets = assets
+        self.on_rotate = on_rotate
+        self.index = {asset["asset"]: i for i, asset in enumerate(assets)}
+        self.windows = {
+            name: RollingWindow(len(assets), bucket_ms, buckets)
+            for name, (bucket_ms, buckets) in windows.items()
+        }
+        self.last_ts = 0
+
+    def set_assets(self, assets: List[Dict[str, Any]]):
+        """Swap in new asset records (logos, prices); the symbols and their order must not change."""
+        if [asset["asset"] for asset in assets] != [asset["asset"] for asset in self.assets]:
+            raise ValueError("Exchange flow assets can only be replaced with the same symbols in the same order")
+        self.assets = assets
+
+    def add(self, doc: Dict[str, Any]):
+        """Fold a stored transfer into every window."""
+        asset = self.index.get(doc["token"])
+        if asset is None:
+            return
+        from_exchange = bool(doc.get("from_label"))
+        to_exchange = bool(doc.get("to_label"))
+        if from_exchange == to_exchange:
+            return  # wallet-to-wallet or exchange-internal
+        usd = doc["usd_raw"]
+        inflow, outflow = (usd, 0.0) if to_exchange else (0.0, usd)
+        ts = doc["ts"]
+        for window in self.windows.values():
+            window.add(ts, asset, inflow, outflow)
+        if ts > self.last_ts:
+            self.last_ts = ts
+
+    def add_batch(self, docs: Iterable[Dict[str, Any]]):
+        """Fold a batch of stored transfers into every window."""
+        heads = [window.head for window in self.windows.values()]
+        for doc in docs:
+            self.add(doc)
+        if self.on_rotate is not None and heads != [window.head for window in self.windows.values()]:
+            self.on_rotate()
+
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Copies of every window's buckets, for a checkpoint."""
+        arrays = {name: window.ring.copy() for name, window in self.windows.items()}
+        heads = {name: window.head for name, window in self.windows.items()}
+        return arrays, {"heads": heads, "last_ts": self.last_ts}
+
+    def import_state(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        """Restore buckets saved by ``export_state`` with the same assets and windows."""
+        for name, window in self.windows.items():
+            window.ring[:] = arrays[name]
+            window.head = meta["heads"][name]
+            if window.head is not None:
+                window._resync(window.head)
+        self.last_ts = meta["last_ts"]
+
+    def snapshot(self, window: str, now_ms: int) -> List[Dict[str, Any]]:
+        """Per-asset totals and changes for a window, in asset order."""
+        state = self.windows[window]
+        state.advance(now_ms // state.bucket_ms)
+        cur, prev = state.current, state.previous
+        netflow = cur[:, INFLOW] - cur[:, OUTFLOW]
+        netflow_change = _pct_change(netflow, prev[:, INFLOW] - prev[:, OUTFLOW])
+        volume_change = _pct_change(cur[:, VOLUME], prev[:, VOLUME])
+
+        rows = []
+        for i, asset in enumerate(self.assets):
+            rows.append({
+                **asset,
+                "inflow": float(cur[i, INFLOW]),
+                "outflow": float(cur[i, OUTFLOW]),
+                "netflow": float(netflow[i]),
+                "netflow_change": float(netflow_change[i]),
+                "volume": float(cur[i, VOLUME]),
+                "volume_change": float(volume_change[i]),
+            })
+        return rows
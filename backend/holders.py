@@ -0,0 +1,219 @@
+"""
+Holder Ledger
+=============
+Per-token balances built from transfers, with ranked top-N lookups.
+
+Balances live in a dict; ranking uses a max-heap with lazy deletion. Every
+balance change pushes a new heap entry and leaves the old one behind;
+``top(n)`` pops entries, discards the ones that no longer match the current
+balance, and pushes the ``n`` live ones back, so a query costs
+O((n + stale) log M) and each stale entry is paid for once. The heap is
+rebuilt when stale entries outnumber live ones.
+
+Each token keeps two rankings: by address, and by entity (all addresses
+carrying the same entity label summed together). The ledger remembers which
+entity each address's balance counts towards; when an address turns up
+with a different label its whole balance moves to the new entity, and
+``relabel`` rebuilds every entity total after the label file is replaced.
+"""
+
+import heapq
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def label_entity(label: Optional[str]) -> Optional[str]:
+    """Entity name from a wallet label, e.g. 'Binance: Hot Wallet' -> 'Binance'."""
+    if not label:
+        return None
+    name = label.split(":")[0].strip()
+    if name.endswith(" Deposit"):
+        name = name[: -len(" Deposit")]
+    return name or None
+
+
+class RankedBalances:
+    """Positive balances keyed by string, with a lazily maintained max-heap."""
+
+    def __init__(self):
+        self.balances: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self.total = 0.0
+
+    def __len__(self):
+        return len(self.balances)
+
+    def get(self, key: str) -> float:
+        """Current balance of ``key`` (0 if none)."""
+        return self.balances.get(key, 0.0)
+
+    def add(self, key: str, delta: float) -> float:
+        """Apply ``delta`` (floored at zero) and return the change actually applied."""
+        old = self.balances.get(key, 0.0)
+        new = max(0.0, old + delta)
+        if new == old:
+            return 0.0
+        if new > 0:
+            self.balances[key] = new
+            heapq.heappush(self._heap, (-new, key))
+        else:
+            del self.balances[key]
+        self.total += new - old
+        if len(self._heap) > 2 * len(self.balances) + 1024:
+            self._rebuild()
+        return new - old
+
+    def load(self, keys: List[str], balances: List[float], total: float):
+        """Replace contents with saved balances."""
+        self.balances = dict(zip(keys, balances))
+        self.total = total
+        self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(-balance, key) for key, balance in self.balances.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, n: int) -> List[Tuple[str, float]]:
+        """The ``n`` largest balances, largest first."""
+        result: List[Tuple[str, float]] = []
+        seen = set()
+        while self._heap and len(result) < n:
+            neg, key = heapq.heappop(self._heap)
+            if key in seen or self.balances.get(key) != -neg:
+                continue  # superseded entry
+            seen.add(key)
+            result.append((key, -neg))
+        for key, balance in result:
+            heapq.heappush(self._heap, (-balance, key))
+        return result
+
+
+class TokenLedger:
+    """Address and entity rankings for one token."""
+
+    def __init__(self, supply: Optional[float] = None):
+        self.supply = supply
+        self.addresses = RankedBalances()
+        self.entities = RankedBalances()
+        self.entity_of: Dict[str, str] = {}  # address -> entity its balance counts towards
+
+    def circulating(self) -> float:
+        """Denominator for ``pct``: declared supply, else the tracked total."""
+        return self.supply or self.addresses.total
+
+
+class HolderLedger:
+    """Balances for every token, updated from stored transfers."""
+
+    def __init__(self, supplies: Dict[str, float], labels_of: Callable[[Sequence[str]], List[Optional[str]]]):
+        """``labels_of`` maps addresses to their current labels in one call."""
+        self.supplies = supplies
+        self.labels_of = labels_of
+        self.tokens: Dict[str, TokenLedger] = {}
+
+    def ledger(self, token: str) -> TokenLedger:
+        """Ledger for ``token``, created on first use."""
+        ledger = self.tokens.get(token)
+        if ledger is None:
+            ledger = self.tokens[token] = TokenLedger(self.supplies.get(token))
+        return ledger
+
+    def set_supplies(self, supplies: Dict[str, float]):
+        """Use new declared supplies for existing and future ledgers."""
+        self.supplies = supplies
+        for token, ledger in self.tokens.items():
+            ledger.supply = supplies.get(token)
+
+    def credit(self, token: str, address: str, amount: float):
+        """Adjust one address (and its entity) by ``amount``."""
+        self._credit(self.ledger(token), address, amount, label_entity(self.labels_of([address])[0]))
+
+    def _credit(self, ledger: TokenLedger, address: str, amount: float, entity: Optional[str]):
+        held = ledger.entity_of.get(address)
+        if held != entity:
+            # the address's label changed: its balance so far moves along
+            balance = ledger.addresses.get(address)
+            if held:
+                ledger.entities.add(held, -balance)
+            if entity and balance:
+                ledger.entities.add(entity, balance)
+        applied = ledger.addresses.add(address, amount)
+        if entity and applied:
+            ledger.entities.add(entity, applied)
+        if entity and address in ledger.addresses.balances:
+            ledger.entity_of[address] = entity
+        else:
+            ledger.entity_of.pop(address, None)
+
+    def apply(self, doc: Dict):
+        """Move ``value`` from the sender to the receiver of a transfer."""
+        self.apply_batch([doc])
+
+    def apply_batch(self, docs: List[Dict]):
+        """Apply a batch of stored transfers, resolving every label in one call."""
+        found = self.labels_of([d["from_address"] for d in docs] + [d["to_address"] for d in docs])
+        n = len(docs)
+        for i, doc in enumerate(docs):
+            ledger, value = self.ledger(doc["token"]), float(doc["value"])
+            self._credit(ledger, doc["from_address"], -value, label_entity(found[i]))
+            self._credit(ledger, doc["to_address"], value, label_entity(found[n + i]))
+
+    def relabel(self):
+        """Rebuild every entity total from address balances under the current labels."""
+        for ledger in self.tokens.values():
+            balances = ledger.addresses.balances
+            totals: Dict[str, float] = {}
+            ledger.entity_of = {}
+            for address, label in zip(balances, self.labels_of(list(balances))):
+                entity = label_entity(label)
+                if entity:
+                    ledger.entity_of[address] = entity
+                    totals[entity] = totals.get(entity, 0.0) + balances[address]
+            ledger.entities.load(list(totals), list(totals.values()), sum(totals.values()))
+
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Every token's balances as flat arrays with per-token offsets, for a checkpoint."""
+        tokens = list(self.tokens)
+        arrays, totals = {}, {}
+        for kind in ("addresses", "entities"):
+            rankings = [getattr(self.tokens[t], kind) for t in tokens]
+            arrays[f"{kind}_keys"] = np.array([k for r in rankings for k in r.balances], dtype=str)
+            arrays[f"{kind}_balances"] = np.array([b for r in rankings for b in r.balances.values()], dtype=np.float64)
+            arrays[f"{kind}_offsets"] = np.cumsum([0] + [len(r) for r in rankings]).astype(np.int64)
+            totals[kind] = [r.total for r in rankings]
+        return arrays, {"tokens": tokens, "totals": totals}
+
+    def import_state(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        """
+        Replace all ledgers with balances saved by ``export_state``. Entity
+        totals are rebuilt under the current labels; restore those first.
+        """
+        self.tokens = {}
+        for kind in ("addresses", "entities"):
+            keys = arrays[f"{kind}_keys"].tolist()
+            balances = arrays[f"{kind}_balances"].tolist()
+            offsets = arrays[f"{kind}_offsets"].tolist()
+            for i, token in enumerate(meta["tokens"]):
+                lo, hi = offsets[i], offsets[i + 1]
+                getattr(self.ledger(token), kind).load(keys[lo:hi], balances[lo:hi], meta["totals"][kind][i])
+        self.relabel()
+
+    def top_addresses(self, token: str, n: int) -> List[Tuple[str, float, float]]:
+        """``(address, balance, pct of supply)`` for the largest holders."""
+        return self._ranked(token, n, entities=False)
+
+    def top_entities(self, token: str, n: int) -> List[Tuple[str, float, float]]:
+        """``(entity, balance, pct of supply)`` summed across each entity's addresses."""
+        return self._ranked(token, n, entities=True)
+
+    def _ranked(self, token: str, n: int, entities: bool):
+        ledger = self.tokens.get(token)
+        if ledger is None:
+            return []
+        ranking = ledger.entities if entities else ledger.addresses
+        supply = ledger.circulating()
+        return [
+            (key, balance, balance / supply * 100 if supply else 0.0)
+            for key, balance in ranking.top(n)
+        ]
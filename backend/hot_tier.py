@@ -0,0 +1,484 @@
+"""
+Transfer Hot Tier
+=================
+The most recent transfers held in memory, so the newest pages of
+``/api/transfers`` are served without a MongoDB round trip.
+
+Transfers are kept in a columnar ring (``TransferHotTier``). Time, value
+and USD live in numeric arrays; chain, token and stored labels are
+interned integer codes; ids and addresses are fixed-width byte strings.
+Rows are only turned back into transfer documents for the page being
+returned.
+
+A page is found without touching every row. The ring is split into
+blocks, and each block keeps the maximum of every sort key. Blocks are
+visited in order of their maximum for the leading key, and the filter is
+applied to the rows they contain. The scan stops once the candidates fill
+the page and the next block cannot beat the weakest of them. The few rows
+left are put in full ``(field, ts, _id)`` order.
+
+The tier answers only when its answer is provably the one MongoDB would
+give. Transfers that are not in the ring are called "missing": they were
+evicted, were older than the warm-up load, or have ids or addresses too
+wide for the columns. Missing transfers are summarized by bounds: each
+has ``ts < floor`` and ``usd_raw``/``value`` at most the largest seen.
+If the row after the page still sorts ahead of anything the bounds allow,
+the page is exact. Otherwise the listing falls through to MongoDB.
+
+The ring sees its own process's writes as they happen. While other
+processes write to the same collection (``shared``), it only knows it
+is complete up to ``settled``, the time its last sync with MongoDB was
+known to have caught up to. A transfer not synced yet may sort ahead of
+anything in the ring. So in that state the ring only answers time-ordered
+pages whose cursor is at or below ``settled``.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from transfer_store import COUNT_LIMIT, SORT_FIELDS, decode_cursor, encode_cursor, sort_keys
+
+BLOCK = 4096  # rows per block of sort-key maxima
+
+NUMERIC_FIELDS = ("usd_raw", "value")
+
+MAX_EXACT_INT = 2 ** 53  # larger integer values would not survive the float column
+
+
+class Codes:
+    """Interned strings and their integer codes; ``None`` is -1."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> Optional[int]:
+        """Code for ``value``, interning it; None once the table is full."""
+        if value is None:
+            return -1
+        code = self.index.get(value)
+        if code is None:
+            if len(self.values) >= self.limit:
+                return None
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def decode(self, codes: np.ndarray) -> List[Optional[str]]:
+        return [self.values[c] if c >= 0 else None for c in codes.tolist()]
+
+
+def _number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _largest(values: Sequence) -> float:
+    """
+    Maximum of ``values`` in MongoDB's descending order: missing values
+    sort after every number, other types (strings, dates) ahead of them.
+    """
+    if isinstance(values, np.ndarray):
+        return float(values.max())
+    return max(float(v) if _number(v) else -np.inf if v is None else np.inf for v in values)
+
+
+def _min_usd(query: Dict[str, Any]) -> Optional[float]:
+    cond = query.get("usd_raw")
+    return cond.get("$gte") if isinstance(cond, dict) else None
+
+
+def _fits(text: Any, width: int) -> bool:
+    return isinstance(text, str) and len(text) <= width and text.isascii()
+
+
+class TransferHotTier:
+    """Ring of the most recent ``capacity`` transfers as parallel arrays."""
+
+    def __init__(self, capacity: int = 1_000_000, id_width: int = 32, address_width: int = 42):
+        self.capacity = capacity
+        self.id_width = id_width
+        self.address_width = address_width
+        self.id = np.zeros(capacity, dtype=f"S{id_width}")
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.chain = np.zeros(capacity, dtype=np.int16)
+        self.token = np.zeros(capacity, dtype=np.int16)
+        self.from_address = np.zeros(capacity, dtype=f"S{address_width}")
+        self.to_address = np.zeros(capacity, dtype=f"S{address_width}")
+        self.from_label = np.full(capacity, -1, dtype=np.int32)
+        self.to_label = np.full(capacity, -1, dtype=np.int32)
+        self.value = np.zeros(capacity)
+        self.integral = np.zeros(capacity, dtype=bool)  # value was stored as an int
+        self.usd = np.zeros(capacity)
+        self.written = 0  # transfers ever appended; the next slot is ``written % capacity``
+        self.chains = Codes(np.iinfo(np.int16).max)
+        self.tokens = Codes(np.iinfo(np.int16).max)
+        self.labels = Codes(np.iinfo(np.int32).max)
+
+        blocks = -(-capacity // BLOCK)
+        self.block_max = {
+            "ts": np.zeros(blocks, dtype=np.int64),
+            "usd_raw": np.zeros(blocks),
+            "value": np.zeros(blocks),
+        }
+
+        # bounds on transfers that are not in the ring
+        self.complete = True
+        self.floor = np.iinfo(np.int64).min
+        self.missing_max = {field: -np.inf for field in NUMERIC_FIELDS}
+        # other writers: complete only up to ``settled``
+        self.shared = False
+        self.settled: Optional[int] = None
+
+        self.evicted = 0
+        self.rejected = 0
+        self.duplicates = 0
+        self.served = 0
+        self.passed = 0
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def column(self, field: str) -> np.ndarray:
+        return {"ts": self.ts, "usd_raw": self.usd, "value": self.value, "_id": self.id}[field]
+
+    def _rows(self, blocks: np.ndarray) -> np.ndarray:
+        """Filled slots of ``blocks``."""
+        rows = (blocks[:, None] * BLOCK + np.arange(BLOCK)).ravel()
+        return rows[rows < len(self)]
+
+    # ---- writes ----
+
+    def add(self, docs: List[Dict[str, Any]]) -> int:
+        """Append stored transfers not already in the ring; returns how many were added."""
+        docs = self._unseen(docs)
+        keep, rejected = [], []
+        for doc in docs:
+            (keep if self._fits(doc) else rejected).append(doc)
+        if rejected:
+            self.rejected += len(rejected)
+            self._missing(
+                [d.get("ts") for d in rejected], [d.get("usd_raw") for d in rejected], [d.get("value") for d in rejected]
+            )
+
+        codes = [
+            (self.chains.code(d["chain"]), self.tokens.code(d["token"]),
+             self.labels.code(d.get("from_label")), self.labels.code(d.get("to_label")))
+            for d in keep
+        ]
+        full = [i for i, c in enumerate(codes) if None in c]
+        if full:
+            # a code table ran out of room: leave those rows to MongoDB
+            dropped = [keep[i] for i in full]
+            self.rejected += len(dropped)
+            self._missing([d["ts"] for d in dropped], [d["usd_raw"] for d in dropped], [d["value"] for d in dropped])
+            keep = [d for d, c in zip(keep, codes) if None not in c]
+            codes = [c for c in codes if None not in c]
+
+        n = len(keep)
+        if not n:
+            return 0
+        if n > self.capacity:
+            over = keep[:n - self.capacity]
+            self.evicted += len(over)
+            self._missing([d["ts"] for d in over], [d["usd_raw"] for d in over], [d["value"] for d in over])
+            keep, codes = keep[-self.capacity:], codes[-self.capacity:]
+            n = self.capacity
+
+        slots = (self.written + np.arange(n)) % self.capacity
+        old = slots[slots < len(self)]
+        if len(old):
+            self.evicted += len(old)
+            self._missing(self.ts[old], self.usd[old], self.value[old])
+
+        self.id[slots] = [d["_id"].encode() for d in keep]
+        self.ts[slots] = [d["ts"] for d in keep]
+        self.value[slots] = [d["value"] for d in keep]
+        self.integral[slots] = [isinstance(d["value"], int) for d in keep]
+        self.usd[slots] = [d["usd_raw"] for d in keep]
+        self.from_address[slots] = [d["from_address"].encode() for d in keep]
+        self.to_address[slots] = [d["to_address"].encode() for d in keep]
+        chain, token, from_label, to_label = (np.array(c) for c in zip(*codes))
+        self.chain[slots], self.token[slots] = chain, token
+        self.from_label[slots], self.to_label[slots] = from_label, to_label
+        self.written += n
+
+        size = len(self)
+        for block in np.unique(slots // BLOCK).tolist():
+            lo, hi = block * BLOCK, min((block + 1) * BLOCK, size)
+            for field, top in self.block_max.items():
+                top[block] = self.column(field)[lo:hi].max()
+        return n
+
+    def _fits(self, doc: Dict[str, Any]) -> bool:
+        """Whether ``doc`` can be stored without losing anything the API returns or sorts on."""
+        _id, sender, receiver = doc.get("_id"), doc.get("from_address"), doc.get("to_address")
+        value, usd = doc.get("value"), doc.get("usd_raw")
+        return (
+            isinstance(_id, str) and isinstance(sender, str) and isinstance(receiver, str)
+            and len(_id) <= self.id_width
+            and len(sender) <= self.address_width and len(receiver) <= self.address_width
+            and (_id + sender + receiver).isascii()
+            and isinstance(doc.get("ts"), int)
+            and isinstance(value, (int, float)) and isinstance(usd, (int, float))
+            and not isinstance(value, bool) and not isinstance(usd, bool)
+            and not (isinstance(value, int) and abs(value) > MAX_EXACT_INT)
+            and isinstance(doc.get("chain"), str) and isinstance(doc.get("token"), str)
+        )
+
+    def _unseen(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """``docs`` without those already in the ring (a live batch overlapping a sync)."""
+        size = len(self)
+        times = [d["ts"] for d in docs if _number(d.get("ts"))]
+        if not size or not times:
+            return docs
+        oldest = min(times)
+        blocks = np.flatnonzero(self.block_max["ts"][:-(-size // BLOCK)] >= oldest)
+        rows = self._rows(blocks)
+        recent = self.id[rows[self.ts[rows] >= oldest]]
+        if not len(recent):
+            return docs
+        seen = set(recent.tolist())
+        fresh = [d for d in docs if not (isinstance(d.get("_id"), str) and d["_id"].encode() in seen)]
+        self.duplicates += len(docs) - len(fresh)
+        return fresh
+
+    def _missing(self, ts: Sequence, usd: Sequence, value: Sequence):
+        """Widen the bounds to cover transfers that are (no longer) in the ring."""
+        if not len(ts):
+            return
+        self.complete = False
+        newest, limit = _largest(ts), np.iinfo(np.int64).max
+        if newest > -np.inf:
+            self.floor = max(self.floor, int(newest) + 1 if newest < limit else limit)
+        for field, values in (("usd_raw", usd), ("value", value)):
+            self.missing_max[field] = max(self.missing_max[field], _largest(values))
+
+    def settle(self, shared: bool, settled: Optional[int] = None):
+        """Record whether other processes write transfers, and up to when the ring has caught up with them."""
+        self.shared = shared
+        self.settled = settled if shared else None
+
+    def exclude_before(self, ts: int, usd_max: Optional[float], value_max: Optional[float]):
+        """Record that stored transfers older than ``ts`` were not loaded, with their largest amounts."""
+        if usd_max is None:
+            return
+        self.complete = False
+        self.floor = max(self.floor, ts)
+        self.missing_max["usd_raw"] = max(self.missing_max["usd_raw"], usd_max)
+        self.missing_max["value"] = max(self.missing_max["value"], value_max)
+
+    # ---- reads ----
+
+    def _matcher(self, query: Dict[str, Any]):
+        """Row filter for a ``build_filter`` query, or None for anything else."""
+        checks = []
+        for key, cond in query.items():
+            if key in ("token", "chain") and isinstance(cond, str):
+                codes, column = (self.tokens, self.token) if key == "token" else (self.chains, self.chain)
+                code = codes.index.get(cond, -2)
+                checks.append(lambda rows, column=column, code=code: column[rows] == code)
+            elif key == "usd_raw" and isinstance(cond, dict) and list(cond) == ["$gte"] and _number(cond["$gte"]):
+                checks.append(lambda rows, low=cond["$gte"]: self.usd[rows] >= low)
+            else:
+                return None
+
+        def match(rows: np.ndarray) -> np.ndarray:
+            keep = np.ones(len(rows), dtype=bool)
+            for check in checks:
+                keep &= check(rows)
+            return rows[keep]
+        return match
+
+    def _after(self, keys: List[str], values: List[Any]):
+        """Row filter for rows strictly after a cursor in descending ``keys`` order, or None."""
+        *numbers, last_id = values
+        if not all(_number(v) for v in numbers) or not _fits(last_id, self.id_width):
+            return None
+        bounds = numbers + [last_id.encode()]
+
+        def after(rows: np.ndarray) -> np.ndarray:
+            keep = np.zeros(len(rows), dtype=bool)
+            tied = np.ones(len(rows), dtype=bool)
+            for key, bound in zip(keys, bounds):
+                column = self.column(key)[rows]
+                keep |= tied & (column < bound)
+                tied &= column == bound
+            return rows[keep]
+        return after
+
+    def _excludes_missing(self, query: Dict[str, Any]) -> bool:
+        """Whether no missing transfer can match ``query``."""
+        if self.complete:
+            return True
+        low = _min_usd(query)
+        return low is not None and low > self.missing_max["usd_raw"]
+
+    def _ahead_of_missing(self, keys: List[str], slot: int) -> bool:
+        """Whether the row in ``slot`` sorts ahead of every missing transfer."""
+        ts_ok = self.ts[slot] >= self.floor
+        if keys[0] == "ts":
+            return bool(ts_ok)
+        lead, bound = self.column(keys[0])[slot], self.missing_max[keys[0]]
+        return bool(lead > bound or (lead == bound and ts_ok))
+
+    def _top(self, keys: List[str], need: int, filters, floors: Dict[str, float]) -> np.ndarray:
+        """
+        Slots of the first ``need`` rows passing ``filters``, in descending
+        ``keys`` order. Only blocks holding some row at or above every one of
+        ``floors`` (field -> lowest useful value) are visited.
+        """
+        size = len(self)
+        lead = self.column(keys[0])
+        blocks = -(-size // BLOCK)
+        maxima = self.block_max[keys[0]][:blocks]
+        useful = np.ones(blocks, dtype=bool)
+        for field, low in floors.items():
+            useful &= self.block_max[field][:blocks] >= low
+        useful = np.flatnonzero(useful)
+        order = useful[np.argsort(maxima[useful], kind="stable")[::-1]]
+        blocks = len(order)
+        found = np.zeros(0, dtype=np.int64)
+        done, step = 0, 1
+        while done < blocks:
+            chosen = order[done:done + step]
+            done, step = done + len(chosen), step * 2
+            rows = self._rows(chosen)
+            for keep in filters:
+                rows = keep(rows)
+            found = np.concatenate([found, rows])
+            if len(found) >= need:
+                values = lead[found]
+                kth = np.partition(values, len(values) - need)[len(values) - need]
+                found = found[values >= kth]
+                # a block whose maximum is below the current cut cannot contribute
+                if done >= blocks or maxima[order[done]] < kth:
+                    break
+        ranked = np.lexsort([self.column(key)[found] for key in reversed(keys)])[::-1]
+        return found[ranked[:need]]
+
+    def page(
+        self,
+        query: Dict[str, Any],
+        sort_by: str = "time",
+        limit: int = 15,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+    ) -> Optional[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        One page of transfers, like ``TransferStore.find_page``, or None
+        when the ring cannot prove the page complete and the caller has to
+        ask MongoDB.
+        """
+        if sort_by not in SORT_FIELDS:
+            sort_by = "time"
+        keys = sort_keys(sort_by)
+        match = self._matcher(query)
+        if match is None or not len(self):
+            return self._pass()
+        filters = [match]
+        position = decode_cursor(cursor, sort_by) if cursor else None
+        if self.shared and not (
+            position and keys[0] == "ts" and self.settled is not None
+            and _number(position[0]) and position[0] <= self.settled
+        ):
+            # transfers other processes wrote since the last sync could come first
+            return self._pass()
+        if position:
+            after = self._after(keys, position)
+            if after is None:
+                return self._pass()
+            filters.append(after)
+            skip = 0
+
+        floors = {}
+        low = _min_usd(query)
+        if low is not None:
+            floors["usd_raw"] = low
+        excluded = self._excludes_missing(query)
+        if not excluded:
+            # rows below the bound on missing transfers could never end an exact page
+            lead = keys[0]
+            cut = self.floor if lead == "ts" else self.missing_max[lead]
+            floors[lead] = max(floors.get(lead, cut), cut)
+            filters.insert(0, lambda rows: rows[self.column(lead)[rows] >= cut])
+
+        need = skip + limit + 1
+        top = self._top(keys, need, filters, floors)
+        exact = excluded or (len(top) == need and self._ahead_of_missing(keys, top[-1]))
+        if not exact:
+            return self._pass()
+
+        self.served += 1
+        docs = self.documents(top[skip:skip + limit])
+        next_cursor = encode_cursor(sort_by, docs[-1]) if len(top) > skip + limit else None
+        return docs, next_cursor
+
+    def _pass(self) -> None:
+        self.passed += 1
+        return None
+
+    def count(self, query: Dict[str, Any]) -> Optional[int]:
+        """Rows matching a filtered ``query`` capped at ``COUNT_LIMIT``, or None when the ring cannot tell."""
+        match = self._matcher(query) if query else None
+        if match is None:
+            return None
+        exact = not self.shared and self._excludes_missing(query)
+        if len(self) < COUNT_LIMIT and not exact:
+            return None
+        found = len(match(np.arange(len(self))))
+        if found >= COUNT_LIMIT or exact:
+            return min(found, COUNT_LIMIT)
+        return None
+
+    def documents(self, slots: np.ndarray) -> List[Dict[str, Any]]:
+        """Stored-transfer documents for ``slots``."""
+        columns = zip(
+            self.id[slots].tolist(),
+            self.ts[slots].tolist(),
+            self.chains.decode(self.chain[slots]),
+            self.tokens.decode(self.token[slots]),
+            self.from_address[slots].tolist(),
+            self.labels.decode(self.from_label[slots]),
+            self.to_address[slots].tolist(),
+            self.labels.decode(self.to_label[slots]),
+            self.value[slots].tolist(),
+            self.integral[slots].tolist(),
+            self.usd[slots].tolist(),
+        )
+        return [
+            {
+                "_id": _id.decode(),
+                "ts": ts,
+                "chain": chain,
+                "token": token,
+                "from_address": from_address.decode(),
+                "from_label": from_label,
+                "to_address": to_address.decode(),
+                "to_label": to_label,
+                "value": int(value) if integral else value,
+                "usd_raw": usd,
+            }
+            for _id, ts, chain, token, from_address, from_label, to_address, to_label, value, integral, usd in columns
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Ring size, coverage bounds and how many pages were served from memory."""
+        return {
+            "transfers": len(self),
+            "capacity": self.capacity,
+            "written": self.written,
+            "evicted": self.evicted,
+            "rejected": self.rejected,
+            "duplicates": self.duplicates,
+            "complete": self.complete,
+            "floor": None if self.complete else self.floor,
+            "shared": self.shared,
+            "settled": self.settled,
+            "served": self.served,
+            "passed": self.passed,
+            "chains": len(self.chains.values),
+            "tokens": len(self.tokens.values),
+            "labels": len(self.labels.values),
+        }
@@ -0,0 +1,240 @@
+"""
+Transfer Ingestion
+==================
+Batched, backpressured writer that moves transfer events into Mongo.
+
+Feeders hand documents to a bounded asyncio queue. A single flusher task
+groups them into batches (closed by size or by ``flush_interval``) and
+writes each batch with an unordered ``insert_many``. At most
+``max_in_flight`` writes run at once; when Mongo falls behind the flusher
+stops draining, the queue fills up and ``submit`` starts to wait, which
+slows feeders down instead of growing memory.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class IngestPipeline:
+    """Bounded queue + batch writer in front of a ``TransferStore``."""
+
+    def __init__(
+        self,
+        store,
+        max_queue: int = 50_000,
+        batch_size: int = 1_000,
+        flush_interval: float = 0.05,
+        max_in_flight: int = 4,
+        max_retries: int = 3,
+    ):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=max_queue)
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._writes: set = set()
+        self._flusher: Optional[asyncio.Task] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._flush_ms_total = 0.0
+
+    # ---- feeder side ----
+
+    async def submit(self, doc: Dict[str, Any]):
+        """Queue one transfer, waiting while the queue is full."""
+        await self.queue.put(doc)
+        self.accepted += 1
+
+    async def submit_many(self, docs: Iterable[Dict[str, Any]]):
+        """Queue several transfers, waiting for space as needed."""
+        for doc in docs:
+            if self.queue.full():
+                await self.queue.put(doc)
+            else:
+                self.queue.put_nowait(doc)
+            self.accepted += 1
+
+    def try_submit(self, doc: Dict[str, Any]) -> bool:
+        """Queue a transfer without waiting; returns False if it was rejected."""
+        try:
+            self.queue.put_nowait(doc)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def add_listener(self, callback: Callable[[List[Dict[str, Any]]], None]):
+        """Call ``callback(batch)`` after every successfully written batch."""
+        self._listeners.append(callback)
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """Start the flusher task on the running loop."""
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush whatever is queued, then stop the flusher."""
+        if self._flusher is None:
+            return
+        self._flusher.cancel()
+        try:
+            await self._flusher
+        except asyncio.CancelledError:
+            pass
+        self._flusher = None
+        pending, self._pending = self._pending, []
+        await self._write(pending)
+        while not self.queue.empty():
+            await self._write(self._drain(self.batch_size))
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    # ---- flusher ----
+
+    def _drain(self, n: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < n and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = self._pending = [await self.queue.get()]
+            deadline = loop.time() + self.flush_interval
+            batch.extend(self._drain(self.batch_size - 1))
+            if len(batch) < self.batch_size:
+                await asyncio.sleep(max(0.0, deadline - loop.time()))
+                batch.extend(self._drain(self.batch_size - len(batch)))
+
+            # Blocks here while max_in_flight writes are pending; the queue
+            # then fills and feeders wait in submit().
+            await self._slots.acquire()
+            self._pending = []
+            task = asyncio.create_task(self._write_and_release(batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def _write_and_release(self, batch: List[Dict[str, Any]]):
+        try:
+            await self._write(batch)
+        finally:
+            self._slots.release()
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        started = time.perf_counter()
+        stored = await self._insert_with_retry(batch)
+        written = len(stored)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._flush_ms_total += elapsed_ms
+        self.written += written
+        self.failed += len(batch) - written
+
+        if written:
+            for callback in self._listeners:
+                try:
+                    callback(stored)
+                except Exception:
+                    logger.exception("Ingest listener failed")
+
+    async def _insert_with_retry(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert a batch, returning the documents that ended up stored."""
+        delay = 0.1
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.store.insert_many(batch)
+                return batch
+            except BulkWriteError as exc:
+                # Duplicates are rows a previous attempt already stored.
+                failed = {
+                    err["index"] for err in exc.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY
+                }
+                if not failed:
+                    return batch
+                logger.warning("Ingest batch had %d write errors", len(failed))
+                return [doc for i, doc in enumerate(batch) if i not in failed]
+            except PyMongoError:
+                if attempt == self.max_retries:
+                    logger.exception("Dropping ingest batch of %d after retries", len(batch))
+                    return []
+                await asyncio.sleep(delay)
+                delay *= 2
+        return []
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue, batch and flush-latency counters."""
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "in_flight": len(self._writes),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": round(self.written / self.batches, 1) if self.batches else 0,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "avg_flush_ms": round(self._flush_ms_total / self.batches, 2) if self.batches else 0,
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+
+class WriterRegistry:
+    """
+    Processes writing transfers, by heartbeat in a shared collection.
+
+    Each process upserts its own entry on every ``beat``. Entries not
+    refreshed within ``expiry`` seconds count as gone, so a process knows
+    whether another one may be writing to the same collection.
+    """
+
+    def __init__(self, expiry: float = 5.0, collection=None):
+        self.id = uuid.uuid4().hex
+        self.expiry = expiry
+        self.collection = collection
+
+    def bind(self, collection):
+        """Use ``collection``, e.g. once the app has opened its Mongo client."""
+        self.collection = collection
+
+    async def beat(self) -> int:
+        """Refresh this process's entry; returns how many other writers are alive."""
+        now_ms = int(time.time() * 1000)
+        await self.collection.update_one({"_id": self.id}, {"$set": {"seen": now_ms}}, upsert=True)
+        return await self.collection.count_documents(
+            {"_id": {"$ne": self.id}, "seen": {"$gt": now_ms - int(self.expiry * 1000)}}
+        )
+
+    async def leave(self):
+        """Remove this process's entry."""
+        await self.collection.delete_one({"_id": self.id})
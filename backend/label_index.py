@@ -0,0 +1,207 @@
+"""
+Address Label Index
+===================
+Compact, memory-mapped map from 20-byte addresses to wallet labels.
+
+The label file holds the addresses as one sorted block of raw 20-byte keys,
+a parallel block of uint32 label ids, and a small JSON table of distinct
+label strings. That is 24 bytes per labeled address, and because the file
+is memory-mapped read-only, every worker process on a host shares the same
+page-cache copy. Lookups are ``np.searchsorted`` over the key block, so a
+whole page of addresses is resolved in one vectorized call.
+
+``LabelService`` wraps the current index, swaps in a new one when the file
+on disk is replaced (write to a temp file, then ``os.replace``), and keeps a
+small in-memory overlay for labels learned at runtime.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FILB"
+VERSION = 1
+# magic, version, address count, label-table offset, label-table length
+HEADER = struct.Struct("<4sIQQQ")
+ADDRESS_DTYPE = np.dtype("S20")
+
+
+def address_bytes(address: str) -> Optional[bytes]:
+    """Raw 20 bytes of a 0x-prefixed hex address, or None if malformed."""
+    if not address or len(address) != 42 or not address.startswith(("0x", "0X")):
+        return None
+    try:
+        return bytes.fromhex(address[2:])
+    except ValueError:
+        return None
+
+
+def write_label_file(path: str, records: Iterable[Tuple[str, str]]):
+    """
+    Build a label file from ``(address, label)`` pairs.
+
+    Later duplicates of an address win. The file is written next to
+    ``path`` and moved into place atomically, so readers never see a
+    partial file.
+    """
+    by_address: Dict[bytes, str] = {}
+    for address, label in records:
+        raw = address_bytes(address)
+        if raw is not None and label:
+            by_address[raw] = label
+
+    labels = sorted(set(by_address.values()))
+    label_ids = {label: i for i, label in enumerate(labels)}
+    keys = np.array(list(by_address.keys()), dtype=ADDRESS_DTYPE)
+    ids = np.array([label_ids[label] for label in by_address.values()], dtype=np.uint32)
+    order = np.argsort(keys, kind="stable")
+    keys, ids = keys[order], ids[order]
+
+    table = json.dumps(labels, ensure_ascii=False).encode("utf-8")
+    table_offset = HEADER.size + keys.nbytes + ids.nbytes
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as fh:
+        fh.write(HEADER.pack(MAGIC, VERSION, len(keys), table_offset, len(table)))
+        fh.write(keys.tobytes())
+        fh.write(ids.tobytes())
+        fh.write(table)
+    os.replace(tmp_path, path)
+
+
+class LabelIndex:
+    """Read-only view over one memory-mapped label file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as fh:
+            self.stat = os.fstat(fh.fileno())
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, table_offset, table_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a label index file")
+        self.keys = np.frombuffer(self._mmap, dtype=ADDRESS_DTYPE, count=count, offset=HEADER.size)
+        self.ids = np.frombuffer(self._mmap, dtype=np.uint32, count=count, offset=HEADER.size + count * 20)
+        self.labels: List[str] = json.loads(self._mmap[table_offset:table_offset + table_len])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup_many(self, addresses: Sequence[str]) -> List[Optional[str]]:
+        """Labels for a batch of addresses (None where unlabeled), in one search."""
+        if not addresses or not len(self.keys):
+            return [None] * len(addresses)
+        raw = [address_bytes(a) or b"" for a in addresses]
+        wanted = np.array(raw, dtype=ADDRESS_DTYPE)
+        pos = np.searchsorted(self.keys, wanted)
+        pos[pos >= len(self.keys)] = 0
+        found = (self.keys[pos] == wanted) & (np.array([len(r) for r in raw]) == 20)
+        label_ids = self.ids[pos]
+        return [self.labels[i] if ok else None for i, ok in zip(label_ids.tolist(), found.tolist())]
+
+    def lookup(self, address: str) -> Optional[str]:
+        """Label for one address, or None."""
+        return self.lookup_many([address])[0]
+
+
+class LabelService:
+    """Current label index plus runtime-learned labels, with hot reload."""
+
+    def __init__(self, path: str, max_overlay: int = 100_000):
+        self.path = path
+        self.max_overlay = max_overlay
+        self.index: Optional[LabelIndex] = None
+        self.overlay: Dict[str, str] = {}
+        self.reloads = 0
+
+    def load(self):
+        """Map the label file, replacing the current index."""
+        self.index = LabelIndex(self.path)
+        self.reloads += 1
+
+    def reload_if_changed(self) -> bool:
+        """Swap in the label file if it was replaced on disk; keeps the old index on errors."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        current = self.index.stat if self.index else None
+        if current and (stat.st_ino, stat.st_mtime_ns, stat.st_size) == (
+            current.st_ino, current.st_mtime_ns, current.st_size
+        ):
+            return False
+        try:
+            self.load()
+        except (OSError, ValueError):
+            logger.exception("Failed to reload label index %s", self.path)
+            return False
+        return True
+
+    def learn(self, address: str, label: str):
+        """Remember a label seen at runtime that the index does not have, replacing one learned earlier."""
+        address = address.lower()
+        learned = self.overlay.get(address)
+        if learned == label or (learned is None and len(self.overlay) >= self.max_overlay):
+            return
+        if self.index is None or self.index.lookup(address) != label:
+            self.overlay[address] = label
+        elif learned is not None:
+            # the index agrees again; its label shows through
+            del self.overlay[address]
+
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Runtime-learned labels, for a checkpoint."""
+        return {
+            "addresses": np.array(list(self.overlay), dtype=str),
+            "labels": np.array(list(self.overlay.values()), dtype=str),
+        }, {}
+
+    def import_state(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        """Restore labels saved by ``export_state``."""
+        self.overlay = dict(zip(arrays["addresses"].tolist(), arrays["labels"].tolist()))
+
+    def label_of(self, address: str) -> Optional[str]:
+        """Label for one address."""
+        label = self.overlay.get(address.lower()) if self.overlay else None
+        if label is None and self.index is not None:
+            label = self.index.lookup(address)
+        return label
+
+    def labels_of(self, addresses: Sequence[str]) -> List[Optional[str]]:
+        """Labels for many addresses with a single index search."""
+        found = self.index.lookup_many(addresses) if self.index is not None else [None] * len(addresses)
+        if self.overlay:
+            found = [self.overlay.get(a.lower(), label) for a, label in zip(addresses, found)]
+        return found
+
+    def stats(self) -> Dict[str, int]:
+        """Index size, overlay size and reload count."""
+        return {
+            "indexed": len(self.index) if self.index is not None else 0,
+            "labels": len(self.index.labels) if self.index is not None else 0,
+            "overlay": len(self.overlay),
+            "reloads": self.reloads,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    import csv
+
+    parser = argparse.ArgumentParser(description="Build a label index file from an address,label CSV")
+    parser.add_argument("csv_path")
+    parser.add_argument("out_path")
+    args = parser.parse_args()
+
+    with open(args.csv_path, newline="") as fh:
+        rows = ((row[0].strip(), row[1].strip()) for row in csv.reader(fh) if len(row) >= 2)
+        write_label_file(args.out_path, rows)
+    print(f"Wrote {len(LabelIndex(args.out_path))} labels to {args.out_path}")
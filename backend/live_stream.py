@@ -0,0 +1,163 @@
+"""
+Live Transfer Stream
+====================
+Fan-out of newly ingested transfers to WebSocket/SSE subscribers.
+
+Subscribers are indexed by ``(token, chain)`` with ``None`` as a wildcard,
+and inside each bucket they are kept sorted by ``min_usd``. Dispatching a
+transfer visits only the four buckets that can match it and, in each, takes
+the prefix of subscribers whose threshold is at or below the transfer's USD
+value, so cost follows the number of matching subscribers rather than the
+total.
+
+Every subscriber owns a bounded queue. When it is full the oldest event is
+dropped to make room (the client sees the newest data); a subscriber that
+keeps overflowing is disconnected.
+"""
+
+import asyncio
+import bisect
+import itertools
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BucketKey = Tuple[Optional[str], Optional[str]]
+
+
+class Subscriber:
+    """One connected client and its pending events."""
+
+    __slots__ = ("id", "token", "chain", "min_usd", "queue", "dropped", "max_dropped", "closed")
+
+    def __init__(self, sub_id: int, token: Optional[str], chain: Optional[str],
+                 min_usd: float, queue_size: int, max_dropped: int):
+        self.id = sub_id
+        self.token = token
+        self.chain = chain
+        self.min_usd = min_usd
+        self.queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.max_dropped = max_dropped
+        self.closed = False
+
+    def offer(self, event: Dict[str, Any]) -> bool:
+        """Enqueue an event, evicting the oldest when full. False means too slow."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            if self.dropped > self.max_dropped:
+                return False
+        self.queue.put_nowait(event)
+        return True
+
+    async def next(self) -> Optional[Dict[str, Any]]:
+        """Wait for the next event; None once the subscriber was closed."""
+        return await self.queue.get()
+
+
+class _Bucket:
+    """Subscribers sharing a (token, chain) key, sorted by min_usd."""
+
+    __slots__ = ("thresholds", "subscribers")
+
+    def __init__(self):
+        self.thresholds: List[Tuple[float, int]] = []
+        self.subscribers: List[Subscriber] = []
+
+    def add(self, sub: Subscriber):
+        i = bisect.bisect_right(self.thresholds, (sub.min_usd, sub.id))
+        self.thresholds.insert(i, (sub.min_usd, sub.id))
+        self.subscribers.insert(i, sub)
+
+    def remove(self, sub: Subscriber):
+        i = bisect.bisect_left(self.thresholds, (sub.min_usd, sub.id))
+        if i < len(self.thresholds) and self.thresholds[i] == (sub.min_usd, sub.id):
+            del self.thresholds[i]
+            del self.subscribers[i]
+
+    def matching(self, usd: float) -> List[Subscriber]:
+        end = bisect.bisect_right(self.thresholds, (usd, float("inf")))
+        return self.subscribers[:end]
+
+
+class TransferStream:
+    """Subscriber registry and dispatcher for live transfers."""
+
+    def __init__(self, queue_size: int = 256, max_dropped: int = 1024):
+        self.queue_size = queue_size
+        self.max_dropped = max_dropped
+        self._ids = itertools.count(1)
+        self._buckets: Dict[BucketKey, _Bucket] = {}
+        self.subscriber_count = 0
+        self.delivered = 0
+        self.disconnected = 0
+
+    def subscribe(self, token: Optional[str] = None, chain: Optional[str] = None,
+                  min_usd: Optional[float] = None) -> Subscriber:
+        """Register a subscriber with the same filters as ``/api/transfers``."""
+        sub = Subscriber(
+            next(self._ids),
+            token.upper() if token else None,
+            chain.lower() if chain else None,
+            float(min_usd or 0.0),
+            self.queue_size,
+            self.max_dropped,
+        )
+        key = (sub.token, sub.chain)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+        bucket.add(sub)
+        self.subscriber_count += 1
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        """Remove a subscriber and wake anything waiting on it."""
+        if sub.closed:
+            return
+        sub.closed = True
+        key = (sub.token, sub.chain)
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.remove(sub)
+            if not bucket.subscribers:
+                del self._buckets[key]
+        self.subscriber_count -= 1
+        if sub.queue.full():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
+
+    def publish(self, doc: Dict[str, Any], formatter: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        """Deliver ``formatter(doc)`` to every subscriber whose filters match ``doc``."""
+        token, chain, usd = doc["token"], doc["chain"], doc["usd_raw"]
+        event = None
+        slow = []
+        for key in ((token, chain), (token, None), (None, chain), (None, None)):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            for sub in bucket.matching(usd):
+                if event is None:
+                    event = formatter(doc)
+                if sub.offer(event):
+                    self.delivered += 1
+                else:
+                    slow.append(sub)
+        for sub in slow:
+            self.disconnected += 1
+            self.unsubscribe(sub)
+
+    def publish_batch(self, docs: List[Dict[str, Any]], formatter: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        """Publish a batch of stored transfers."""
+        if not self._buckets:
+            return
+        for doc in docs:
+            self.publish(doc, formatter)
+
+    def stats(self) -> Dict[str, int]:
+        """Subscriber and delivery counters."""
+        return {
+            "subscribers": self.subscriber_count,
+            "buckets": len(self._buckets),
+            "delivered": self.delivered,
+            "disconnected_slow": self.disconnected,
+        }
@@ -0,0 +1,233 @@
+"""
+Metrics
+=======
+In-process latency histograms exposed in Prometheus text format.
+
+``MetricsMiddleware`` records one histogram and an in-flight gauge per
+route template, ``MongoCommandMetrics`` is a pymongo command listener that
+times every command by collection and operation, and ``span()`` lets a
+handler time its own phases (query, formatting, ...). Requests slower than
+the configured threshold are logged with the spans they recorded.
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from routing import route_template
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+_request_route: ContextVar[str] = ContextVar("request_route", default="")
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+
+
+class MetricsRegistry:
+    """Histograms and counters for HTTP routes, Mongo commands and spans."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str], Histogram] = {}
+        self.responses: Dict[Tuple[str, str, int], int] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.mongo: Dict[Tuple[str, str], Histogram] = {}
+        self.mongo_failures: Dict[Tuple[str, str], int] = {}
+        self.spans: Dict[Tuple[str, str], Histogram] = {}
+        self.slow_requests = 0
+
+    def _observe(self, table: Dict, key, seconds: float):
+        with self._lock:
+            hist = table.get(key)
+            if hist is None:
+                hist = table[key] = Histogram()
+            hist.observe(seconds)
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        self._observe(self.requests, (method, route), seconds)
+        with self._lock:
+            key = (method, route, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def observe_mongo(self, collection: str, command: str, seconds: float, failed: bool = False):
+        self._observe(self.mongo, (collection, command), seconds)
+        if failed:
+            with self._lock:
+                key = (collection, command)
+                self.mongo_failures[key] = self.mongo_failures.get(key, 0) + 1
+
+    def observe_span(self, route: str, name: str, seconds: float):
+        self._observe(self.spans, (route, name), seconds)
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format."""
+        out: List[str] = []
+        with self._lock:
+            self._render_histograms(
+                out, "http_request_duration_seconds", "HTTP request latency by route",
+                self.requests, ("method", "route"),
+            )
+            out.append("# HELP http_responses_total HTTP responses by route and status")
+            out.append("# TYPE http_responses_total counter")
+            for (method, route, status), n in sorted(self.responses.items()):
+                out.append(f"http_responses_total{{{_labels(method=method, route=route, status=status)}}} {n}")
+            out.append("# HELP http_requests_in_flight Requests currently being handled")
+            out.append("# TYPE http_requests_in_flight gauge")
+            for route, n in sorted(self.in_flight.items()):
+                out.append(f"http_requests_in_flight{{{_labels(route=route)}}} {n}")
+            out.append("# HELP http_slow_requests_total Requests slower than the slow-request threshold")
+            out.append("# TYPE http_slow_requests_total counter")
+            out.append(f"http_slow_requests_total {self.slow_requests}")
+            self._render_histograms(
+                out, "mongo_command_duration_seconds", "MongoDB command latency",
+                self.mongo, ("collection", "command"),
+            )
+            out.append("# HELP mongo_command_failures_total Failed MongoDB commands")
+            out.append("# TYPE mongo_command_failures_total counter")
+            for (collection, command), n in sorted(self.mongo_failures.items()):
+                out.append(f"mongo_command_failures_total{{{_labels(collection=collection, command=command)}}} {n}")
+            self._render_histograms(
+                out, "handler_span_duration_seconds", "Time spent in named handler phases",
+                self.spans, ("route", "span"),
+            )
+        return "\n".join(out) + "\n"
+
+    @staticmethod
+    def _render_histograms(out: List[str], name: str, help_text: str, table: Dict, label_names):
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} histogram")
+        for key, hist in sorted(table.items()):
+            labels = _labels(**dict(zip(label_names, key)))
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, hist.counts):
+                cumulative += n
+                out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            out.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+            out.append(f"{name}_sum{{{labels}}} {hist.total:.6f}")
+            out.append(f"{name}_count{{{labels}}} {hist.count}")
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def span(name: str):
+    """Time a phase of the current request (``with span("format"): ...``)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe_span(_request_route.get() or "background", name, elapsed)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status and in-flight counts."""
+
+    def __init__(self, app, routes: List, slow_request_ms: float = 500.0):
+        self.app = app
+        self.routes = routes
+        self.slow_request_s = slow_request_ms / 1000
+
+    def route_path(self, scope) -> str:
+        """Template of the route serving ``scope`` (bounded label cardinality)."""
+        return route_template(self.routes, scope) or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        streaming = False
+        spans: List[Tuple[str, float]] = []
+        spans_token = _request_spans.set(spans)
+        route_path = self.route_path(scope)
+        route_token = _request_route.set(route_path)
+        registry.in_flight[route_path] = registry.in_flight.get(route_path, 0) + 1
+
+        async def send_wrapper(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type" and value.startswith(b"text/event-stream"):
+                        streaming = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.in_flight[route_path] -= 1
+            _request_spans.reset(spans_token)
+            _request_route.reset(route_token)
+
+            if not streaming:
+                registry.observe_request(scope["method"], route_path, status, elapsed)
+                if elapsed >= self.slow_request_s:
+                    registry.slow_requests += 1
+                    breakdown = ", ".join(f"{name}={s * 1000:.1f}ms" for name, s in spans)
+                    logger.warning(
+                        "Slow request %s %s -> %d in %.1f ms%s",
+                        scope["method"], scope["path"], status, elapsed * 1000,
+                        f" ({breakdown})" if breakdown else "",
+                    )
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo listener timing commands by collection and operation."""
+
+    def __init__(self, metrics: MetricsRegistry):
+        self.metrics = metrics
+        self._collections: Dict[Tuple, str] = {}
+
+    @staticmethod
+    def _key(event) -> Tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        # getMore names the cursor id; its collection is a separate field
+        name = "collection" if event.command_name == "getMore" else event.command_name
+        target = event.command.get(name)
+        self._collections[self._key(event)] = target if isinstance(target, str) else event.database_name
+
+    def succeeded(self, event):
+        collection = self._collections.pop(self._key(event), "unknown")
+        self.metrics.observe_mongo(collection, event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop(self._key(event), "unknown")
+        self.metrics.observe_mongo(collection, event.command_name, event.duration_micros / 1e6, failed=True)
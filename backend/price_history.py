@@ -0,0 +1,210 @@
+"""
+Price History Engine
+====================
+NumPy-backed OHLCV series per token with cached, downsampled period views.
+
+Each token has one hourly base series. Period views (1W/1M/3M/1Y/ALL) are
+slices of that series, reduced to at most ``max_points`` with
+Largest-Triangle-Three-Buckets so chart shape (peaks, drops) survives while
+the payload stays bounded. Formatted views are cached per
+``(token, period, max_points)`` and dropped when the token's series changes.
+"""
+
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+HOUR_MS = 3_600_000
+DAY_MS = 24 * HOUR_MS
+
+# Period -> number of hourly points in the view (None = whole series)
+PERIOD_HOURS = {
+    "1W": 24 * 7,
+    "1M": 24 * 30,
+    "3M": 24 * 90,
+    "1Y": 24 * 365,
+    "ALL": None,
+}
+
+DEFAULT_HISTORY_HOURS = 24 * 365 * 3
+DEFAULT_MAX_POINTS = 500
+CACHE_SIZE = 512
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    Always keeps the first and last point; each bucket in between keeps the
+    point forming the largest triangle with the previously kept point and
+    the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs((x[a] - avg_x) * (by - y[a]) - (x[a] - bx) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def label_unit(ts: np.ndarray) -> str:
+    """datetime64 unit for point labels: days, unless two neighbouring points fall on the same day."""
+    days = ts // DAY_MS
+    return "h" if np.any(days[1:] == days[:-1]) else "D"
+
+
+class PriceSeries:
+    """Hourly OHLCV arrays for a single token."""
+
+    __slots__ = ("ts", "open", "high", "low", "close", "volume", "version")
+
+    def __init__(self, ts, open_, high, low, close, volume):
+        self.ts = ts
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.version = 0
+
+    @classmethod
+    def synthetic(cls, seed: int, last_price: float, daily_volume: float,
+                  end_ms: int, hours: int = DEFAULT_HISTORY_HOURS) -> "PriceSeries":
+        """Random-walk history ending exactly at ``last_price``."""
+        rng = np.random.default_rng(seed)
+        log_returns = rng.normal(0.0, 0.008, hours)
+        log_returns[0] = 0.0
+        path = np.cumsum(log_returns)
+        close = last_price * np.exp(path - path[-1])
+
+        open_ = np.empty_like(close)
+        open_[0] = close[0]
+        open_[1:] = close[:-1]
+        wick = np.abs(rng.normal(0.0, 0.004, (2, hours)))
+        high = np.maximum(open_, close) * (1 + wick[0])
+        low = np.minimum(open_, close) * (1 - wick[1])
+        volume = rng.lognormal(0.0, 0.5, hours) * (daily_volume / 24)
+
+        end = end_ms - end_ms % HOUR_MS
+        ts = end - HOUR_MS * np.arange(hours - 1, -1, -1, dtype=np.int64)
+        return cls(ts, open_, high, low, close, volume)
+
+    def window(self, hours: Optional[int]) -> slice:
+        """Slice covering the most recent ``hours`` points."""
+        if hours is None or hours >= len(self.ts):
+            return slice(0, len(self.ts))
+        return slice(len(self.ts) - hours, len(self.ts))
+
+
+class PriceHistoryEngine:
+    """Per-token price series with an LRU cache of formatted period views."""
+
+    def __init__(self, tokens: Dict[str, dict], now_ms: int,
+                 history_hours: int = DEFAULT_HISTORY_HOURS, cache_size: int = CACHE_SIZE):
+        self.tokens = tokens
+        self.now_ms = now_ms
+        self.history_hours = history_hours
+        self.cache_size = cache_size
+        self.series: Dict[str, PriceSeries] = {}
+        # (price, volume) each series was generated from
+        self._sources: Dict[str, Tuple[float, float]] = {}
+        self._generated = 0
+        self._cache: "OrderedDict[Tuple, Any]" = OrderedDict()
+
+    def get_series(self, token_id: str) -> PriceSeries:
+        """Base series for a token, generated on first use."""
+        series = self.series.get(token_id)
+        if series is None:
+            token = self.tokens[token_id]
+            series = PriceSeries.synthetic(
+                zlib.crc32(token_id.encode()),
+                token["price"],
+                token["volume_24h"],
+                self.now_ms,
+                self.history_hours,
+            )
+            # a regenerated series must not reuse the version of the one it replaces
+            self._generated += 1
+            series.version = self._generated
+            self.series[token_id] = series
+            self._sources[token_id] = (token["price"], token["volume_24h"])
+        return series
+
+    def refresh(self, tokens: Optional[Dict[str, dict]] = None):
+        """
+        Follow new token parameters: series whose token is gone or whose
+        price or volume changed are dropped and regenerated on next use.
+        """
+        if tokens is not None:
+            self.tokens = tokens
+        for token_id in list(self.series):
+            token = self.tokens.get(token_id)
+            if token is None or self._sources[token_id] != (token["price"], token["volume_24h"]):
+                del self.series[token_id]
+                del self._sources[token_id]
+                self.invalidate(token_id)
+
+    def view_arrays(self, token_id: str, period: str, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Timestamps and closes for a period, downsampled to ``max_points``."""
+        series = self.get_series(token_id)
+        window = series.window(PERIOD_HOURS.get(period))
+        ts = series.ts[window]
+        close = series.close[window]
+        keep = lttb(ts.astype(np.float64), close, max_points)
+        return ts[keep], close[keep]
+
+    def _cached(self, key: Tuple, build):
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        value = self._cache[key] = build()
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    def view(self, token_id: str, period: str, max_points: int = DEFAULT_MAX_POINTS) -> List[dict]:
+        """Chart points ``[{"date", "price"}]`` for a period (a ``PERIOD_HOURS`` key), served from cache."""
+        if period not in PERIOD_HOURS:
+            raise ValueError(f"Unknown period: {period}")
+
+        def build():
+            ts, close = self.view_arrays(token_id, period, max_points)
+            unit = label_unit(ts)
+            labels = np.datetime_as_string(ts.astype("datetime64[ms]"), unit=unit).tolist()
+            if unit == "h":
+                labels = [label.replace("T", " ") + ":00" for label in labels]
+            prices = np.round(close, 2)
+            return [{"date": d, "price": p} for d, p in zip(labels, prices.tolist())]
+
+        return self._cached((token_id, period, max_points), build)
+
+    def view_columns(self, token_id: str, period: str, max_points: int = DEFAULT_MAX_POINTS) -> Tuple[np.ndarray, np.ndarray]:
+        """Unformatted ``(ts, close)`` arrays for a period, served from cache."""
+        if period not in PERIOD_HOURS:
+            raise ValueError(f"Unknown period: {period}")
+        return self._cached(
+            (token_id, period, max_points, "columns"),
+            lambda: self.view_arrays(token_id, period, max_points),
+        )
+
+    def invalidate(self, token_id: str):
+        """Remove all cached views for a token."""
+        for key in [k for k in self._cache if k[0] == token_id]:
+            del self._cache[key]
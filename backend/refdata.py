@@ -0,0 +1,368 @@
+"""
+Shared Reference Data
+=====================
+Read-only reference tables (token metadata, logos, entities, chains)
+published once into a memory-mapped snapshot that every worker attaches to.
+
+A snapshot file holds, per table, a sorted block of fixed-width keys, a
+block of record offsets and the JSON-encoded records. Workers map the file
+read-only, so all processes on a host share one page-cache copy, and a
+lookup decodes only the record it needs. Small tables (logos, chains and
+the like) are decoded once per generation and served from that copy, so
+hot paths pay a dict lookup rather than a JSON decode. Table views keep the
+original key order for iteration.
+
+Snapshots are named by a hash of their content and announced through a
+small ``CURRENT`` pointer file. Publishing writes the new snapshot, then
+atomically replaces the pointer; attached processes notice the new
+generation and swap to it, while readers of the old one keep a valid
+mapping until they drop it. Workers starting up attach to whatever is
+current rather than publishing, so a restart never reverts a generation
+an operator published.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FIRD"
+VERSION = 1
+# magic, version, directory offset, directory length
+HEADER = struct.Struct("<4sIQQ")
+POINTER = "CURRENT"
+# tables with at most this many records are decoded whole and kept per generation
+SMALL_TABLE = 1024
+
+Table = Union[Dict[str, Any], List[Any]]
+
+
+def _encode_tables(tables: Dict[str, Table]) -> bytes:
+    """Serialize tables into the snapshot layout."""
+    blocks: List[bytes] = []
+    directory: Dict[str, Dict[str, Any]] = {}
+    offset = HEADER.size
+
+    def add(block: bytes) -> int:
+        nonlocal offset
+        start = offset
+        blocks.append(block)
+        offset += len(block)
+        pad = -offset % 8
+        if pad:
+            blocks.append(b"\0" * pad)
+            offset += pad
+        return start
+
+    for name, table in tables.items():
+        is_map = isinstance(table, dict)
+        keys = [str(k) for k in table] if is_map else []
+        values = list(table.values()) if is_map else list(table)
+        records = [json.dumps(v, ensure_ascii=False, separators=(",", ":")).encode("utf-8") for v in values]
+        # records are stored in sorted-key order for maps, list order otherwise
+        order = np.argsort(np.array(keys, dtype=object), kind="stable") if is_map else np.arange(len(records))
+        sorted_records = [records[i] for i in order]
+        offsets = np.zeros(len(records) + 1, dtype=np.uint64)
+        np.cumsum([len(r) for r in sorted_records], out=offsets[1:])
+
+        entry = {"kind": "map" if is_map else "list", "count": len(records)}
+        if is_map:
+            width = max((len(k.encode("utf-8")) for k in keys), default=1)
+            key_block = np.array([keys[i].encode("utf-8") for i in order], dtype=f"S{width}")
+            entry.update(width=width, keys=add(key_block.tobytes()))
+            # position of each original key in sorted order, for ordered iteration
+            entry["order"] = add(np.argsort(order).astype(np.uint32).tobytes())
+        entry["offsets"] = add(offsets.tobytes())
+        entry["data"] = add(b"".join(sorted_records))
+        directory[name] = entry
+
+    directory_bytes = json.dumps(directory).encode("utf-8")
+    directory_offset = add(directory_bytes)
+    return HEADER.pack(MAGIC, VERSION, directory_offset, len(directory_bytes)) + b"".join(blocks)
+
+
+def publish(directory: str, tables: Dict[str, Table]) -> str:
+    """
+    Write ``tables`` as a snapshot in ``directory`` and make it current.
+
+    Identical content maps to the same file, so workers publishing the same
+    tables at startup share one snapshot. Snapshots other than the new and
+    the previously current one are removed; processes still mapping them
+    keep a valid mapping. Returns the generation id.
+    """
+    payload = _encode_tables(tables)
+    generation = hashlib.blake2b(payload, digest_size=8).hexdigest()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"refdata-{generation}.bin")
+    if not os.path.exists(path):
+        tmp = f"{path}.tmp.{os.getpid()}"
+        with open(tmp, "wb") as fh:
+            fh.write(payload)
+        os.replace(tmp, path)
+    previous = current_generation(directory)
+    pointer = os.path.join(directory, POINTER)
+    tmp = f"{pointer}.tmp.{os.getpid()}"
+    with open(tmp, "w") as fh:
+        fh.write(generation)
+    os.replace(tmp, pointer)
+
+    keep = {f"refdata-{generation}.bin", f"refdata-{previous}.bin"}
+    for name in os.listdir(directory):
+        if name.startswith("refdata-") and name.endswith(".bin") and name not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return generation
+
+
+def current_generation(directory: str) -> Optional[str]:
+    """Generation named by the pointer file, or None if nothing is published."""
+    try:
+        with open(os.path.join(directory, POINTER)) as fh:
+            return fh.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class Snapshot:
+    """One mapped snapshot file."""
+
+    def __init__(self, path: str, generation: str):
+        self.generation = generation
+        with open(path, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, dir_offset, dir_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a reference data snapshot")
+        self.directory = json.loads(self._mmap[dir_offset:dir_offset + dir_len])
+        self._arrays: Dict[str, Tuple] = {}
+        self._decoded: Dict[str, Table] = {}
+
+    def arrays(self, name: str) -> Tuple[Dict[str, Any], Optional[np.ndarray], Optional[np.ndarray], np.ndarray]:
+        """Directory entry plus key, order and offset arrays of a table (views over the map)."""
+        cached = self._arrays.get(name)
+        if cached is None:
+            entry = self.directory[name]
+            n = entry["count"]
+            keys = order = None
+            if entry["kind"] == "map":
+                keys = np.frombuffer(self._mmap, dtype=f"S{entry['width']}", count=n, offset=entry["keys"])
+                order = np.frombuffer(self._mmap, dtype=np.uint32, count=n, offset=entry["order"])
+            offsets = np.frombuffer(self._mmap, dtype=np.uint64, count=n + 1, offset=entry["offsets"])
+            cached = self._arrays[name] = (entry, keys, order, offsets)
+        return cached
+
+    def record(self, name: str, index: int) -> Any:
+        """Decode the record at sorted position ``index``."""
+        entry, _, _, offsets = self.arrays(name)
+        start = entry["data"] + int(offsets[index])
+        end = entry["data"] + int(offsets[index + 1])
+        return json.loads(self._mmap[start:end])
+
+    def decoded(self, name: str) -> Table:
+        """
+        Whole table decoded, as a dict or list in original order.
+
+        Small tables are decoded once and the same objects are returned on
+        every call, so callers must treat records as read-only.
+        """
+        table = self._decoded.get(name)
+        if table is not None:
+            return table
+        entry, keys, order, _ = self.arrays(name)
+        if entry["kind"] == "map":
+            table = {
+                key.decode("utf-8"): self.record(name, i)
+                for key, i in zip(keys[order].tolist(), order.tolist())
+            }
+        else:
+            table = [self.record(name, i) for i in range(entry["count"])]
+        if entry["count"] <= SMALL_TABLE:
+            self._decoded[name] = table
+        return table
+
+    def cached(self, name: str) -> Optional[Table]:
+        """Decoded copy of a small table, or None for tables read record by record."""
+        if self.directory[name]["count"] > SMALL_TABLE:
+            return None
+        return self.decoded(name)
+
+
+class ReferenceData:
+    """Attachment to the current snapshot in a directory, with generation swap."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.snapshot: Optional[Snapshot] = None
+        self.swaps = 0
+        self.rejected: Optional[str] = None
+
+    def attach(self, accept: Optional[Callable[[Snapshot], bool]] = None) -> bool:
+        """
+        Map the current generation if it differs from the attached one.
+
+        ``accept`` can veto a mapped generation; a vetoed generation is
+        remembered and not retried until another one is published.
+        """
+        generation = current_generation(self.directory)
+        if generation is None or generation == self.rejected:
+            return False
+        if self.snapshot and self.snapshot.generation == generation:
+            return False
+        path = os.path.join(self.directory, f"refdata-{generation}.bin")
+        snapshot = Snapshot(path, generation)
+        if accept is not None and not accept(snapshot):
+            self.rejected = generation
+            return False
+        self.snapshot = snapshot
+        self.rejected = None
+        self.swaps += 1
+        return True
+
+    def load(self, tables: Dict[str, Table], replace: bool = False) -> str:
+        """
+        Attach to the current generation, publishing ``tables`` first only
+        if nothing usable is published yet or ``replace`` is set.
+        """
+        if not replace:
+            try:
+                self.attach()
+            except (OSError, ValueError):
+                logger.exception("Current reference data in %s is unreadable; republishing", self.directory)
+            if self.snapshot is not None:
+                return self.snapshot.generation
+        publish(self.directory, tables)
+        self.attach()
+        return self.snapshot.generation
+
+    def reload_if_changed(self, accept: Optional[Callable[[Snapshot], bool]] = None) -> bool:
+        """Swap to a newly published generation; keeps the current one on errors or a veto."""
+        try:
+            return self.attach(accept)
+        except (OSError, ValueError):
+            logger.exception("Failed to attach reference data in %s", self.directory)
+            return False
+
+    def table(self, name: str) -> Union["RefMap", "RefList"]:
+        """Live view of one table that follows generation swaps."""
+        kind = self.snapshot.directory[name]["kind"]
+        return RefMap(self, name) if kind == "map" else RefList(self, name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Attached generation, table sizes and swap count."""
+        if self.snapshot is None:
+            return {"generation": None, "tables": {}, "swaps": self.swaps}
+        return {
+            "generation": self.snapshot.generation,
+            "tables": {name: entry["count"] for name, entry in self.snapshot.directory.items()},
+            "swaps": self.swaps,
+        }
+
+
+class RefMap:
+    """Read-only mapping over a snapshot table; records are decoded on access."""
+
+    def __init__(self, data: ReferenceData, name: str):
+        self._data = data
+        self.name = name
+
+    def _find(self, key: str) -> Tuple[Snapshot, int]:
+        snapshot = self._data.snapshot
+        _, keys, _, _ = snapshot.arrays(self.name)
+        wanted = str(key).encode("utf-8")
+        i = int(np.searchsorted(keys, wanted))
+        if i < len(keys) and keys[i] == wanted:
+            return snapshot, i
+        return snapshot, -1
+
+    def get(self, key: str, default: Any = None) -> Any:
+        table = self._data.snapshot.cached(self.name)
+        if table is not None:
+            return table.get(key, default)
+        snapshot, i = self._find(key)
+        return snapshot.record(self.name, i) if i >= 0 else default
+
+    def __getitem__(self, key: str) -> Any:
+        table = self._data.snapshot.cached(self.name)
+        if table is not None:
+            return table[key]
+        snapshot, i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return snapshot.record(self.name, i)
+
+    def __contains__(self, key: object) -> bool:
+        table = self._data.snapshot.cached(self.name)
+        if table is not None:
+            return key in table
+        return self._find(key)[1] >= 0
+
+    def __len__(self) -> int:
+        return self._data.snapshot.directory[self.name]["count"]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def keys(self) -> List[str]:
+        """Keys in their original order."""
+        _, keys, order, _ = self._data.snapshot.arrays(self.name)
+        return [k.decode("utf-8") for k in keys[order].tolist()]
+
+    def values(self) -> List[Any]:
+        """Decoded records in original key order."""
+        return list(self._data.snapshot.decoded(self.name).values())
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return list(zip(self.keys(), self.values()))
+
+
+class RefList:
+    """Read-only sequence over a snapshot table."""
+
+    def __init__(self, data: ReferenceData, name: str):
+        self._data = data
+        self.name = name
+
+    def __len__(self) -> int:
+        return self._data.snapshot.directory[self.name]["count"]
+
+    def __getitem__(self, index: int) -> Any:
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError(index)
+        table = self._data.snapshot.cached(self.name)
+        return table[index] if table is not None else self._data.snapshot.record(self.name, index)
+
+    def __iter__(self) -> Iterator[Any]:
+        snapshot = self._data.snapshot
+        table = snapshot.cached(self.name)
+        if table is not None:
+            return iter(table)
+        return (snapshot.record(self.name, i) for i in range(snapshot.directory[self.name]["count"]))
+
+    def copy(self) -> List[Any]:
+        """Decoded records as a new list."""
+        return list(self)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Publish reference tables from a JSON file ({name: dict|list})")
+    parser.add_argument("json_path")
+    parser.add_argument("directory")
+    args = parser.parse_args()
+
+    with open(args.json_path) as fh:
+        generation = publish(args.directory, json.load(fh))
+    print(f"Published generation {generation} to {args.directory}")
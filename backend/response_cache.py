@@ -0,0 +1,181 @@
+"""
+Response Cache
+==============
+In-process cache of encoded JSON responses for read-mostly endpoints.
+
+Entries are keyed by route path plus normalized query parameters and hold
+the serialized body together with its ETag, so a hit skips both the
+handler and JSON encoding, and a matching ``If-None-Match`` is answered
+with an empty 304. Entries expire by TTL, are evicted least-recently-used
+beyond the entry/byte bounds, and can be dropped early by tag when the
+data behind them changes.
+"""
+
+import functools
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+from routing import request_key, request_signature
+
+
+class CacheEntry:
+    """Encoded body, its ETag, expiry (monotonic seconds) and invalidation tags."""
+
+    __slots__ = ("body", "etag", "expires", "tags")
+
+    def __init__(self, body: bytes, etag: str, expires: float, tags: Iterable[str]):
+        self.body = body
+        self.etag = etag
+        self.expires = expires
+        self.tags = tuple(tags)
+
+
+def encode_json(content: Any) -> bytes:
+    """Serialize exactly like FastAPI's default JSONResponse."""
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the body bytes."""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches ``etag`` (weak comparison)."""
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """TTL + LRU store of pre-encoded responses with tag invalidation."""
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 32 * 1024 * 1024, default_ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Live entry for ``key``, refreshing its LRU position."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, body: bytes, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> CacheEntry:
+        """Store an encoded body, evicting least-recently-used entries past the bounds."""
+        if key in self._entries:
+            self._remove(key)
+        entry = CacheEntry(body, make_etag(body), time.monotonic() + (ttl or self.default_ttl), tags)
+        self._entries[key] = entry
+        self.size_bytes += len(body)
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while self._entries and (len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        return entry
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.size_bytes -= len(entry.body)
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, *tags: str) -> int:
+        """Drop every entry carrying any of ``tags``; returns how many were removed."""
+        removed = 0
+        for tag in tags:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                removed += 1
+        return removed
+
+    def clear(self):
+        """Drop every entry."""
+        self._entries.clear()
+        self._tags.clear()
+        self.size_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+        }
+
+    def _respond(self, request, entry: CacheEntry, status: str) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "X-Cache": status}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def cached(self, ttl: Optional[float] = None, tags: Iterable[str] = ()) -> Callable:
+        """
+        Cache a JSON endpoint's encoded response.
+
+        Apply below the ``@api_router.get`` decorator. Handlers that return a
+        ``Response`` themselves are passed through uncached.
+        """
+        tags = tuple(tags)
+
+        def decorator(func):
+            sig, request_name, injected = request_signature(func)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs.pop(request_name) if injected else kwargs[request_name]
+                key = request_key(request)
+                entry = self.get(key)
+                if entry is not None:
+                    self.hits += 1
+                    return self._respond(request, entry, "HIT")
+
+                self.misses += 1
+                result = await func(*args, **kwargs)
+                if isinstance(result, Response):
+                    return result
+                entry = self.put(key, encode_json(result), ttl, tags)
+                return self._respond(request, entry, "MISS")
+
+            wrapper.__signature__ = sig
+            return wrapper
+
+        return decorator
@@ -0,0 +1,49 @@
+"""
+Routing Helpers
+===============
+Utilities shared by decorators that wrap ``api_router`` handlers.
+"""
+
+import inspect
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import Request
+from starlette.routing import Match
+
+INJECTED_REQUEST = "_request"
+
+
+def request_signature(func: Callable) -> Tuple[inspect.Signature, str, bool]:
+    """
+    Signature for a wrapper of ``func`` that always receives the ``Request``.
+
+    Returns the signature, the name of the ``Request`` parameter and whether
+    it was added (True) or already declared by the handler (False). Added
+    parameters must be removed from ``kwargs`` before calling ``func``.
+    """
+    sig = inspect.signature(func)
+    for param in sig.parameters.values():
+        if param.annotation is Request:
+            return sig, param.name, False
+
+    params = list(sig.parameters.values())
+    params.append(inspect.Parameter(INJECTED_REQUEST, inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+    return sig.replace(parameters=params), INJECTED_REQUEST, True
+
+
+def request_key(request: Request) -> str:
+    """Route path plus query parameters in a canonical order."""
+    items = sorted(request.query_params.multi_items())
+    if not items:
+        return request.url.path
+    query = "&".join(f"{k}={v}" for k, v in items)
+    return f"{request.url.path}?{query}"
+
+
+def route_template(routes: List, scope) -> Optional[str]:
+    """Path template of the route that fully matches ``scope``, if any."""
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return None
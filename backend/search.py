@@ -0,0 +1,512 @@
+"""
+Search Index
+============
+In-memory autocomplete over tokens, entities, wallet labels and addresses.
+
+Names (token symbols and names, entity names, labels) and addresses each
+live in a ``PrefixIndex``: a sorted NumPy key block plus a small sorted
+insert buffer that is merged into the block once it fills. A prefix query
+is a pair of binary searches, so lookups stay in microseconds over
+millions of keys while keys can still be added one at a time. Addresses
+are stored as their raw 20 bytes, like the label file, and a hex prefix
+becomes a byte range. Labeled addresses are not copied: address queries
+also search the label file's sorted key block in place. Addresses seen
+only in transfers are capped at ``max_addresses``, keeping the most
+active; pinned addresses (reference holders, learned labels) are kept.
+
+Multi-word names are also indexed from each word onwards ("hot wallet"
+finds "Binance: Hot Wallet"), and the delete-one neighborhood of every
+name word gives one-typo fuzzy matches when prefixes find too few.
+
+Results rank by kind (token, entity, label, address), then by weight
+(market cap, holdings, tagged addresses or transfer activity), with exact
+matches first. A prefix covering more than ``SCAN_LIMIT`` keys is ranked
+among the few thousand heaviest entries (refreshed every few seconds) and
+the head of its range instead of scanning the whole range.
+"""
+
+import bisect
+import math
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from label_index import ADDRESS_DTYPE, address_bytes
+
+TOKEN, ENTITY, LABEL, ADDRESS = "token", "entity", "label", "address"
+KINDS = (TOKEN, ENTITY, LABEL, ADDRESS)
+KIND_BOOST = {TOKEN: 30.0, ENTITY: 20.0, LABEL: 10.0, ADDRESS: 0.0}
+_BOOSTS = np.array([KIND_BOOST[kind] for kind in KINDS])
+EXACT_BOOST = 100.0
+FUZZY_PENALTY = 5.0
+
+KEY_WIDTH = 48  # name keys are truncated to this many bytes
+SCAN_LIMIT = 32_768
+LEADERS = 4_096
+LEADERS_MAX_AGE_S = 5.0
+MIN_FUZZY_LENGTH = 3
+
+_HEX_QUERY = re.compile(r"^(0x)?([0-9a-f]{1,40})$")
+_WORD_SPLIT = re.compile(r"[\s:/._()-]+")
+
+
+def words_of(text: str) -> List[str]:
+    """Lowercase words of a name."""
+    return [w for w in _WORD_SPLIT.split(text.lower()) if w]
+
+
+def name_keys(text: str) -> List[str]:
+    """Keys indexing a name: the whole name and its word suffixes."""
+    words = words_of(text)
+    keys = [text.strip().lower()] + [" ".join(words[i:]) for i in range(len(words))]
+    return list(dict.fromkeys(k for k in keys if k))
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """True if ``a`` and ``b`` differ by at most one insert, delete, substitution or swap."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:])
+    if len(a) > len(b):
+        return a[i + 1:] == b[i:]
+    return a[i:] == b[i + 1:]
+
+
+def _deletes(word: str) -> Set[str]:
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def hex_range(digits: str) -> Tuple[bytes, Optional[bytes]]:
+    """Raw-byte range ``[lo, hi)`` of addresses starting with hex ``digits`` (hi None: to the end)."""
+    lo = bytes.fromhex(digits + "0" * (len(digits) % 2))
+    top = digits + "f" * (len(digits) % 2)
+    upper = int(top, 16) + 1
+    if upper >= 16 ** len(top):
+        return lo, None
+    return lo, upper.to_bytes(len(top) // 2, "big")
+
+
+class PrefixIndex:
+    """
+    Sorted fixed-width byte keys, each pointing at an entry id, plus an insert buffer.
+
+    Buffered keys are kept without trailing NUL bytes, matching how NumPy
+    ``S`` arrays compare and return them.
+    """
+
+    def __init__(self, width: int, merge_at: int = 4_096):
+        self.dtype = np.dtype(f"S{width}")
+        self.merge_at = merge_at
+        self.keys = np.empty(0, dtype=self.dtype)
+        self.entries = np.empty(0, dtype=np.int64)
+        self._pending: List[Tuple[bytes, int]] = []
+
+    def __len__(self):
+        return len(self.keys) + len(self._pending)
+
+    def _key(self, key: bytes) -> bytes:
+        return bytes(key[:self.dtype.itemsize]).rstrip(b"\0")
+
+    def add(self, key: bytes, entry: int):
+        """Index ``entry`` under ``key``."""
+        bisect.insort(self._pending, (self._key(key), entry))
+        if len(self._pending) >= self.merge_at:
+            self.merge()
+
+    def add_many(self, keys: np.ndarray, entries: np.ndarray):
+        """Bulk-insert keys straight into the sorted block."""
+        self._insert(keys.astype(self.dtype), entries.astype(np.int64))
+
+    def merge(self):
+        """Fold the insert buffer into the sorted block."""
+        if self._pending:
+            keys, entries = zip(*self._pending)
+            self._pending = []
+            self._insert(np.array(keys, dtype=self.dtype), np.array(entries, dtype=np.int64))
+
+    def _insert(self, keys: np.ndarray, entries: np.ndarray):
+        order = np.argsort(keys, kind="stable")
+        at = np.searchsorted(self.keys, keys[order])
+        self.keys = np.insert(self.keys, at, keys[order])
+        self.entries = np.insert(self.entries, at, entries[order])
+
+    def _bounds(self, lo: bytes, hi: Optional[bytes]) -> Tuple[int, int]:
+        start = int(np.searchsorted(self.keys, np.array(lo, dtype=self.dtype)))
+        end = len(self.keys) if hi is None else int(np.searchsorted(self.keys, np.array(hi, dtype=self.dtype)))
+        return start, end
+
+    def lookup(self, keys: List[bytes]) -> np.ndarray:
+        """Entry of each exact key (-1 where absent), for keys that map to a single entry."""
+        wanted = np.array(keys, dtype=self.dtype)
+        found = np.full(len(keys), -1, dtype=np.int64)
+        if len(self.keys):
+            pos = np.searchsorted(self.keys, wanted)
+            pos[pos >= len(self.keys)] = 0
+            hit = self.keys[pos] == wanted
+            found[hit] = self.entries[pos[hit]]
+        if self._pending:
+            for i in np.flatnonzero(found < 0).tolist():
+                key = self._key(keys[i])
+                j = bisect.bisect_left(self._pending, (key, -1))
+                if j < len(self._pending) and self._pending[j][0] == key:
+                    found[i] = self._pending[j][1]
+        return found
+
+    def range(self, lo: bytes, hi: Optional[bytes], head: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Keys in ``[lo, hi)`` and their entries, buffered ones appended.
+
+        With ``head``, only the first ``head`` keys of the sorted block are
+        returned (plus all buffered ones in range).
+        """
+        start, end = self._bounds(lo, hi)
+        if head is not None:
+            end = min(end, start + head)
+        keys, entries = self.keys[start:end], self.entries[start:end]
+        if self._pending:
+            first = bisect.bisect_left(self._pending, (self._key(lo), -1))
+            last = len(self._pending) if hi is None else bisect.bisect_left(self._pending, (self._key(hi), -1))
+            if last > first:
+                extra_keys, extra_entries = zip(*self._pending[first:last])
+                keys = np.concatenate([keys, np.array(extra_keys, dtype=self.dtype)])
+                entries = np.concatenate([entries, np.array(extra_entries, dtype=np.int64)])
+        return keys, entries
+
+    def count(self, lo: bytes, hi: Optional[bytes]) -> int:
+        """Number of sorted-block keys in ``[lo, hi)``."""
+        start, end = self._bounds(lo, hi)
+        return end - start
+
+
+class SearchIndex:
+    """Named entries (tokens, entities, labels) and addresses, searchable by prefix."""
+
+    def __init__(self, labeled: Optional[Callable[[], Optional[np.ndarray]]] = None,
+                 max_addresses: int = 200_000):
+        """
+        ``labeled`` returns the sorted raw key block of labeled addresses
+        (``ADDRESS_DTYPE``, e.g. the mapped label file) or None.
+        """
+        self.labeled = labeled
+        self.max_addresses = max_addresses
+        self.names = PrefixIndex(KEY_WIDTH)
+        self.refs: List[str] = []
+        self.titles: List[str] = []
+        self.extras: List[Dict[str, Any]] = []
+        self.kinds = np.zeros(1024, dtype=np.int8)  # index into KINDS
+        self.weights = np.zeros(1024)
+        self.count = 0
+        self._by_ref: Dict[Tuple[str, str], int] = {}
+        self._keys: List[Set[str]] = []
+        self._fuzzy: Dict[str, Set[str]] = {}  # word with up to one letter deleted -> words
+        self._words: Set[str] = set()
+        self._name_leaders = PrefixIndex(KEY_WIDTH)
+        self._name_leaders_at = -math.inf
+
+        self.addresses = PrefixIndex(ADDRESS_DTYPE.itemsize)
+        self.address_keys = np.empty(1024, dtype=ADDRESS_DTYPE)
+        self.address_weights = np.zeros(1024)
+        self.address_pinned = np.zeros(1024, dtype=bool)
+        self.address_count = 0
+        self.pinned_count = 0
+        self.addresses_pruned = 0
+        self._address_leaders = PrefixIndex(ADDRESS_DTYPE.itemsize)
+        self._address_leaders_at = -math.inf
+
+        self.queries = 0
+
+    # ---- building ----
+
+    def add(
+        self,
+        kind: str,
+        ref: str,
+        title: str,
+        weight: float = 0.0,
+        keys: Iterable[str] = (),
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """
+        Insert or update a named entry and return its id.
+
+        ``title`` and ``keys`` are indexed along with their word suffixes.
+        Adding an existing (kind, ref) keeps the larger weight, merges
+        ``extra`` and indexes any new keys.
+        """
+        entry = self._by_ref.get((kind, ref))
+        if entry is None:
+            entry = self._by_ref[(kind, ref)] = self.count
+            self.count += 1
+            self.refs.append(ref)
+            self.titles.append(title)
+            self.extras.append(dict(extra or {}))
+            self._keys.append(set())
+            if entry >= len(self.weights):
+                self.kinds = np.concatenate([self.kinds, np.zeros(len(self.kinds), dtype=np.int8)])
+                self.weights = np.concatenate([self.weights, np.zeros(len(self.weights))])
+            self.kinds[entry] = KINDS.index(kind)
+            self.weights[entry] = weight
+        else:
+            self.weights[entry] = max(self.weights[entry], weight)
+            self.extras[entry].update(extra or {})
+        indexed = self._keys[entry]
+        for text in (title, *keys):
+            for key in name_keys(text):
+                if key in indexed:
+                    continue
+                indexed.add(key)
+                self.names.add(key.encode("utf-8"), entry)
+            for word in words_of(text):
+                if word not in self._words:
+                    self._words.add(word)
+                    for variant in _deletes(word):
+                        self._fuzzy.setdefault(variant, set()).add(word)
+        return entry
+
+    def has(self, kind: str, ref: str) -> bool:
+        """Whether a named entry exists."""
+        return (kind, ref) in self._by_ref
+
+    def set_weight(self, kind: str, ref: str, weight: float):
+        """Replace the weight of a named entry, if it exists."""
+        entry = self._by_ref.get((kind, ref))
+        if entry is not None:
+            self.weights[entry] = weight
+
+    def _append_addresses(self, keys: np.ndarray) -> np.ndarray:
+        """Allocate entries for new raw addresses; returns their ids."""
+        start, end = self.address_count, self.address_count + len(keys)
+        size = len(self.address_keys)
+        while size < end:
+            size *= 2
+        if size > len(self.address_keys):
+            grown_keys = np.empty(size, dtype=ADDRESS_DTYPE)
+            grown_keys[:start] = self.address_keys[:start]
+            grown_weights = np.zeros(size)
+            grown_weights[:start] = self.address_weights[:start]
+            grown_pinned = np.zeros(size, dtype=bool)
+            grown_pinned[:start] = self.address_pinned[:start]
+            self.address_keys, self.address_weights, self.address_pinned = grown_keys, grown_weights, grown_pinned
+        self.address_keys[start:end] = keys
+        self.address_pinned[start:end] = False
+        self.address_count = end
+        return np.arange(start, end)
+
+    def _address_entries(self, addresses: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Entries of the distinct valid addresses (indexing new ones) and their appearance counts."""
+        raw = [r for r in (address_bytes(a) for a in addresses) if r is not None]
+        if not raw:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        unique, counts = np.unique(np.array(raw, dtype=ADDRESS_DTYPE), return_counts=True)
+        entries = self.addresses.lookup(unique.tolist())
+        missing = np.flatnonzero(entries < 0)
+        if len(missing):
+            entries[missing] = self._append_addresses(unique[missing])
+            for i in missing.tolist():
+                self.addresses.add(unique[i], int(entries[i]))
+        return entries, counts
+
+    def touch_addresses(self, addresses: Sequence[str], weight: float = 1.0):
+        """Add ``weight`` of activity per appearance of each address, indexing new ones."""
+        entries, counts = self._address_entries(addresses)
+        self.address_weights[entries] += counts * weight
+        # prune in steps of a quarter of the cap, so the O(n) rebuild is amortized
+        if self.address_count - self.pinned_count > self.max_addresses + self.max_addresses // 4:
+            self._prune_addresses()
+
+    def pin_addresses(self, addresses: Sequence[str]):
+        """Index addresses that are never pruned, however little activity they have."""
+        entries, _ = self._address_entries(addresses)
+        fresh = entries[~self.address_pinned[entries]]
+        self.address_pinned[fresh] = True
+        self.pinned_count += len(fresh)
+
+    def _prune_addresses(self):
+        """Keep pinned addresses and the most active others, up to ``max_addresses`` unpinned."""
+        n = self.address_count
+        pinned = self.address_pinned[:n]
+        others = np.flatnonzero(~pinned)
+        heaviest = np.argsort(-self.address_weights[others], kind="stable")[:self.max_addresses]
+        others = others[heaviest]
+        kept = np.sort(np.concatenate([np.flatnonzero(pinned), others]))
+        self.addresses_pruned += n - len(kept)
+        self.address_keys[:len(kept)] = self.address_keys[kept]
+        self.address_weights[:len(kept)] = self.address_weights[kept]
+        self.address_pinned[:len(kept)] = self.address_pinned[kept]
+        self.address_weights[len(kept):n] = 0.0
+        self.address_count = len(kept)
+        self.addresses = PrefixIndex(ADDRESS_DTYPE.itemsize)
+        self.addresses.add_many(self.address_keys[:len(kept)], np.arange(len(kept)))
+        self._address_leaders_at = -math.inf
+
+    # ---- querying ----
+
+    def search(self, query: str, limit: int = 10, kinds: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        """Best ``limit`` matches for ``query`` as ``{type, id, title, score, ...}`` dicts."""
+        self.queries += 1
+        q = query.strip().lower()
+        if not q or limit <= 0:
+            return []
+        hits: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        if kinds is None or kinds - {ADDRESS}:
+            for hit in self._search_names(q, limit, kinds):
+                hits[(hit["type"], hit["id"])] = hit
+            if len(hits) < limit and len(q) >= MIN_FUZZY_LENGTH:
+                for hit in self._search_fuzzy(q, limit, kinds):
+                    hits.setdefault((hit["type"], hit["id"]), hit)
+        if kinds is None or ADDRESS in kinds:
+            for hit in self._search_addresses(q, limit):
+                hits[(hit["type"], hit["id"])] = hit
+        return sorted(hits.values(), key=lambda h: -h["score"])[:limit]
+
+    def _hit(self, entry: int, score: float) -> Dict[str, Any]:
+        return {
+            "type": KINDS[self.kinds[entry]], "id": self.refs[entry], "title": self.titles[entry],
+            **self.extras[entry], "score": round(score, 3),
+        }
+
+    def _ranked(
+        self, entries: np.ndarray, bonus: np.ndarray, limit: int, kinds: Optional[Set[str]]
+    ) -> List[Tuple[int, float]]:
+        """Best ``limit`` distinct entries by kind, weight and ``bonus``."""
+        if kinds is not None:
+            keep = np.isin(self.kinds[entries], [KINDS.index(kind) for kind in kinds])
+            entries, bonus = entries[keep], bonus[keep]
+        scores = _BOOSTS[self.kinds[entries]] + np.log10(1 + self.weights[entries]) + bonus
+        # an entry can match through several keys; a few times ``limit`` candidates cover that
+        if len(scores) > 8 * limit:
+            part = np.argpartition(-scores, 8 * limit)[:8 * limit]
+            entries, scores = entries[part], scores[part]
+        ranked: Dict[int, float] = {}
+        for i in np.argsort(-scores, kind="stable").tolist():
+            ranked.setdefault(int(entries[i]), float(scores[i]))
+            if len(ranked) == limit:
+                break
+        return list(ranked.items())
+
+    def _search_names(self, q: str, limit: int, kinds: Optional[Set[str]]) -> List[Dict[str, Any]]:
+        prefix = q.encode("utf-8")[:KEY_WIDTH]
+        # keys starting with prefix sort below it with the last byte raised; UTF-8 never contains 0xff
+        upper = prefix[:-1] + bytes([prefix[-1] + 1])
+        if self.names.count(prefix, upper) > SCAN_LIMIT:
+            # the heaviest entries in range, plus the range head (where exact matches sort)
+            leader_keys, leader_entries = self._name_leaders_in(prefix, upper)
+            head_keys, head_entries = self.names.range(prefix, upper, head=8 * limit)
+            keys = np.concatenate([leader_keys, head_keys])
+            entries = np.concatenate([leader_entries, head_entries])
+        else:
+            keys, entries = self.names.range(prefix, upper)
+        if not len(entries):
+            return []
+        bonus = np.where(keys == prefix, EXACT_BOOST, 0.0)
+        return [self._hit(entry, score) for entry, score in self._ranked(entries, bonus, limit, kinds)]
+
+    def _search_fuzzy(self, q: str, limit: int, kinds: Optional[Set[str]]) -> List[Dict[str, Any]]:
+        """Prefix matches for the query with its last word corrected by one edit."""
+        words = words_of(q)
+        if not words:
+            return []
+        typed = words.pop()
+        corrected = {
+            word for variant in _deletes(typed) for word in self._fuzzy.get(variant, ())
+            if word != typed and within_one_edit(typed, word)
+        }
+        hits = []
+        for word in sorted(corrected):
+            for hit in self._search_names(" ".join(words + [word]), limit, kinds):
+                hit["score"] = round(hit["score"] - FUZZY_PENALTY, 3)
+                hit["fuzzy"] = True
+                hits.append(hit)
+        return sorted(hits, key=lambda h: -h["score"])[:limit]
+
+    def _search_addresses(self, q: str, limit: int) -> List[Dict[str, Any]]:
+        match = _HEX_QUERY.match(q)
+        if not match or (not match.group(1) and len(match.group(2)) < 4):
+            return []
+        digits = match.group(2)
+        lo, hi = hex_range(digits)
+        if self.addresses.count(lo, hi) > SCAN_LIMIT:
+            entries = self._address_leaders_in(lo, hi)
+            if len(entries) < limit:
+                entries = np.unique(np.concatenate([entries, self.addresses.range(lo, hi, head=limit)[1]]))
+        else:
+            entries = self.addresses.range(lo, hi)[1]
+        top = entries[np.argsort(-self.address_weights[entries], kind="stable")[:limit]]
+        found = [(self.address_keys[entry], float(self.address_weights[entry])) for entry in top.tolist()]
+        if len(found) < limit:
+            # labeled addresses without recorded activity, straight from the label file
+            seen = {key for key, _ in found}
+            for key in self._labeled_range(lo, hi, limit):
+                if key not in seen and len(found) < limit:
+                    found.append((key, 0.0))
+        exact = EXACT_BOOST if len(digits) == 40 else 0.0
+        return [
+            {
+                "type": ADDRESS,
+                "id": "0x" + key.ljust(ADDRESS_DTYPE.itemsize, b"\0").hex(),
+                "title": None,
+                "activity": weight,
+                "score": round(KIND_BOOST[ADDRESS] + math.log10(1 + weight) + exact, 3),
+            }
+            for key, weight in found
+        ]
+
+    def _labeled_range(self, lo: bytes, hi: Optional[bytes], head: int) -> List[bytes]:
+        """First ``head`` labeled addresses in ``[lo, hi)``."""
+        keys = self.labeled() if self.labeled is not None else None
+        if keys is None or not len(keys):
+            return []
+        start = int(np.searchsorted(keys, np.array(lo, dtype=ADDRESS_DTYPE)))
+        end = len(keys) if hi is None else int(np.searchsorted(keys, np.array(hi, dtype=ADDRESS_DTYPE)))
+        return keys[start:min(end, start + head)].tolist()
+
+    def _address_leaders_in(self, lo: bytes, hi: Optional[bytes]) -> np.ndarray:
+        """Most active addresses in ``[lo, hi)``, from a leader set refreshed every few seconds."""
+        now = time.monotonic()
+        if now - self._address_leaders_at > LEADERS_MAX_AGE_S:
+            n = min(LEADERS, self.address_count)
+            leaders = np.argpartition(-self.address_weights[:self.address_count], n - 1)[:n] if n else []
+            self._address_leaders = PrefixIndex(ADDRESS_DTYPE.itemsize)
+            self._address_leaders.add_many(self.address_keys[leaders], np.asarray(leaders, dtype=np.int64))
+            self._address_leaders_at = now
+        return self._address_leaders.range(lo, hi)[1]
+
+    def _name_leaders_in(self, lo: bytes, hi: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        """Keys in ``[lo, hi)`` of the heaviest named entries, from a leader set refreshed every few seconds."""
+        now = time.monotonic()
+        if now - self._name_leaders_at > LEADERS_MAX_AGE_S:
+            scores = _BOOSTS[self.kinds[:self.count]] + np.log10(1 + self.weights[:self.count])
+            n = min(LEADERS, self.count)
+            leaders = np.argpartition(-scores, n - 1)[:n].tolist() if n else []
+            pairs = [(key.encode("utf-8"), entry) for entry in leaders for key in self._keys[entry]]
+            self._name_leaders = PrefixIndex(KEY_WIDTH)
+            self._name_leaders.add_many(
+                np.array([key for key, _ in pairs], dtype=self.names.dtype),
+                np.array([entry for _, entry in pairs], dtype=np.int64),
+            )
+            self._name_leaders_at = now
+        return self._name_leaders.range(lo, hi)
+
+    def stats(self) -> Dict[str, Any]:
+        """Index sizes and query count."""
+        counts = dict(zip(KINDS, np.bincount(self.kinds[:self.count], minlength=len(KINDS)).tolist()))
+        counts[ADDRESS] = self.address_count
+        labeled = self.labeled() if self.labeled is not None else None
+        return {
+            "entries": counts,
+            "name_keys": len(self.names),
+            "address_keys": len(self.addresses),
+            "labeled_addresses": 0 if labeled is None else len(labeled),
+            "pinned_addresses": self.pinned_count,
+            "addresses_pruned": self.addresses_pruned,
+            "fuzzy_words": len(self._words),
+            "queries": self.queries,
+        }
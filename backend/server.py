@@ -6,7 +6,9 @@ A FastAPI backend for the Flow Intel on-chain analytics platform.
 Enhanced with filtering, sorting, and realistic mock data.
 """
 
-from fastapi import FastAPI, APIRouter, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -14,25 +16,80 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal, Annotated
 import uuid
 from datetime import datetime, timezone, timedelta
 import random
+import time
+import asyncio
+import json
+import hashlib
+import numpy as np
+
+from transfer_store import COUNT_LIMIT, TransferStore, InvalidCursor, build_filter
+from hot_tier import TransferHotTier
+from price_history import PriceHistoryEngine, DEFAULT_MAX_POINTS, PERIOD_HOURS
+from ingest import IngestPipeline, WriterRegistry
+from live_stream import TransferStream
+from exchange_flows import ExchangeFlowAggregator, WINDOWS as FLOW_WINDOWS
+from response_cache import ResponseCache, encode_json
+from holders import HolderLedger, label_entity
+from label_index import LabelService, write_label_file
+from dashboard import DashboardBatch, Section
+from synthetic import TransferGenerator, to_documents
+from encoding import check_format, columnar, FORMAT_DESCRIPTION
+from refdata import ReferenceData
+from checkpoint import CheckpointStore, ReplayWatermark
+from coalesce import SingleFlight
+from admission import AdmissionControl, AdmissionMiddleware, RoutePolicy
+from actors import ActorCorrelationEngine, WINDOWS as ACTOR_WINDOWS, DEFAULT_THRESHOLD as ACTOR_CLUSTER_THRESHOLD
+from simulation import SimulationEngine, SimulationJobStore, TradeLog, parameter_grid, best_result
+from alerts import NETFLOW_WINDOWS, AlertEngine, AlertRuleStore
+from search import SearchIndex, TOKEN, ENTITY, LABEL, ADDRESS, KINDS as SEARCH_KINDS
+from metrics import MetricsMiddleware, MongoCommandMetrics, registry as metrics_registry, span
+from timeseries import (
+    TimeSeriesStore, PERIODS as SERIES_PERIODS, RESOLUTIONS as SERIES_RESOLUTIONS, MINUTE_MS, DAY_MS,
+    DEFAULT_MAX_POINTS as SERIES_MAX_POINTS,
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, opened per worker process by the app lifespan
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Create the main app
-app = FastAPI(
-    title="Flow Intel Analytics API",
-    description="On-chain analytics platform for tracking liquidity movements",
-    version="2.0.0"
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+transfer_store = TransferStore()
+
+# Transfers generated into an empty collection on startup, reproducible from SEED_RANDOM
+SEED_TRANSFERS = int(os.environ.get('SEED_TRANSFERS', '2000'))
+SEED_RANDOM = int(os.environ.get('SEED_RANDOM', '42'))
+
+# Batched writer for new transfers; FEED_RATE drives the synthetic feeder (transfers/sec)
+ingest = IngestPipeline(
+    transfer_store,
+    max_queue=int(os.environ.get('INGEST_QUEUE_SIZE', '50000')),
+    batch_size=int(os.environ.get('INGEST_BATCH_SIZE', '1000')),
+    flush_interval=float(os.environ.get('INGEST_FLUSH_MS', '50')) / 1000,
+    max_in_flight=int(os.environ.get('INGEST_MAX_IN_FLIGHT', '4')),
 )
+FEED_RATE = float(os.environ.get('FEED_RATE', '5'))
+
+# Newest transfers in memory for the first pages of listings (0 disables); older pages go to MongoDB.
+# Every HOT_TIER_SYNC_SECONDS each worker heartbeats in the writers collection and, while other workers
+# write too, pulls in their transfers; HOT_TIER_SYNC_LAG_MS bounds how late a write may land after its ts.
+HOT_TIER_CAPACITY = int(os.environ.get('HOT_TIER_CAPACITY', '1000000'))
+HOT_TIER_SYNC_SECONDS = float(os.environ.get('HOT_TIER_SYNC_SECONDS', '1'))
+HOT_TIER_SYNC_LAG_MS = int(os.environ.get('HOT_TIER_SYNC_LAG_MS', '5000'))
+hot_tier = TransferHotTier(capacity=HOT_TIER_CAPACITY) if HOT_TIER_CAPACITY > 0 else None
+writers = WriterRegistry(expiry=3 * HOT_TIER_SYNC_SECONDS)
+
+# Push fan-out of newly written transfers to WebSocket/SSE subscribers
+transfer_stream = TransferStream(
+    queue_size=int(os.environ.get('STREAM_QUEUE_SIZE', '256')),
+    max_dropped=int(os.environ.get('STREAM_MAX_DROPPED', '1024')),
+)
+SSE_KEEPALIVE_SECONDS = 15
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -155,20 +212,20 @@ FEATURED_TOKENS = {
     },
 }
 
-# Exchange flows data with real tokens
-EXCHANGE_FLOWS_BASE = [
-    {"asset": "BTC", "logo": LOGOS["btc"], "price": 94250.43, "price_change": 2.14, "volume": 42890000000, "volume_change": 12.45, "netflow": 245000000, "netflow_change": 8.34, "color": "#F7931A"},
-    {"asset": "ETH", "logo": LOGOS["eth"], "price": 3342.18, "price_change": 1.87, "volume": 18450000000, "volume_change": -5.67, "netflow": -128000000, "netflow_change": -12.45, "color": "#627EEA"},
-    {"asset": "SOL", "logo": LOGOS["sol"], "price": 178.43, "price_change": 4.56, "volume": 5670000000, "volume_change": 23.12, "netflow": 78500000, "netflow_change": 45.23, "color": "#14F195"},
-    {"asset": "USDT", "logo": LOGOS["usdt"], "price": 1.00, "price_change": -0.01, "volume": 68900000000, "volume_change": 3.45, "netflow": 890000000, "netflow_change": 15.67, "color": "#26A17B"},
-    {"asset": "BNB", "logo": LOGOS["bnb"], "price": 612.34, "price_change": 1.23, "volume": 2340000000, "volume_change": -8.90, "netflow": -45000000, "netflow_change": -23.45, "color": "#F3BA2F"},
-    {"asset": "XRP", "logo": LOGOS["xrp"], "price": 2.87, "price_change": -2.34, "volume": 4560000000, "volume_change": 18.23, "netflow": 123000000, "netflow_change": 34.56, "color": "#23292F"},
-    {"asset": "ADA", "logo": LOGOS["ada"], "price": 0.98, "price_change": 3.45, "volume": 1230000000, "volume_change": -12.34, "netflow": -23000000, "netflow_change": -45.67, "color": "#0033AD"},
-    {"asset": "AVAX", "logo": LOGOS["avax"], "price": 38.67, "price_change": 2.89, "volume": 890000000, "volume_change": 15.67, "netflow": 34000000, "netflow_change": 28.90, "color": "#E84142"},
-    {"asset": "DOGE", "logo": LOGOS["doge"], "price": 0.34, "price_change": -1.23, "volume": 1890000000, "volume_change": -23.45, "netflow": -67000000, "netflow_change": -34.56, "color": "#C2A633"},
-    {"asset": "MATIC", "logo": LOGOS["matic"], "price": 0.87, "price_change": 1.56, "volume": 670000000, "volume_change": 8.90, "netflow": 12000000, "netflow_change": 12.34, "color": "#8247E5"},
-    {"asset": "LINK", "logo": LOGOS["link"], "price": 23.45, "price_change": 2.67, "volume": 780000000, "volume_change": -5.67, "netflow": 23000000, "netflow_change": 18.90, "color": "#2A5ADA"},
-    {"asset": "UNI", "logo": LOGOS["uni"], "price": 12.34, "price_change": -3.45, "volume": 560000000, "volume_change": 23.45, "netflow": -34000000, "netflow_change": -28.90, "color": "#FF007A"},
+# Assets tracked by the exchange-flow aggregator
+EXCHANGE_ASSETS = [
+    {"asset": "BTC", "logo": LOGOS["btc"], "price": 94250.43, "price_change": 2.14, "color": "#F7931A"},
+    {"asset": "ETH", "logo": LOGOS["eth"], "price": 3342.18, "price_change": 1.87, "color": "#627EEA"},
+    {"asset": "SOL", "logo": LOGOS["sol"], "price": 178.43, "price_change": 4.56, "color": "#14F195"},
+    {"asset": "USDT", "logo": LOGOS["usdt"], "price": 1.00, "price_change": -0.01, "color": "#26A17B"},
+    {"asset": "BNB", "logo": LOGOS["bnb"], "price": 612.34, "price_change": 1.23, "color": "#F3BA2F"},
+    {"asset": "XRP", "logo": LOGOS["xrp"], "price": 2.87, "price_change": -2.34, "color": "#23292F"},
+    {"asset": "ADA", "logo": LOGOS["ada"], "price": 0.98, "price_change": 3.45, "color": "#0033AD"},
+    {"asset": "AVAX", "logo": LOGOS["avax"], "price": 38.67, "price_change": 2.89, "color": "#E84142"},
+    {"asset": "DOGE", "logo": LOGOS["doge"], "price": 0.34, "price_change": -1.23, "color": "#C2A633"},
+    {"asset": "MATIC", "logo": LOGOS["matic"], "price": 0.87, "price_change": 1.56, "color": "#8247E5"},
+    {"asset": "LINK", "logo": LOGOS["link"], "price": 23.45, "price_change": 2.67, "color": "#2A5ADA"},
+    {"asset": "UNI", "logo": LOGOS["uni"], "price": 12.34, "price_change": -3.45, "color": "#FF007A"},
 ]
 
 # Entity balance changes for token detail page
@@ -206,10 +263,164 @@ CHAINS = {
     "optimism": {"color": "#FF0420", "icon": "○", "name": "Optimism"},
 }
 
+# Reference tables live in a read-only snapshot shared by all worker processes;
+# the names above are rebound to views over it. Workers attach to the current
+# generation; the built-in tables are published only when none exists yet, and
+# REFDATA_SOURCE (a JSON file of {table: dict | list}) is published on startup.
+REFDATA_DIR = os.environ.get(
+    'REFDATA_DIR',
+    '/dev/shm/flowintel-refdata' if os.path.isdir('/dev/shm') else str(ROOT_DIR / 'data' / 'refdata'),
+)
+REFDATA_SOURCE = os.environ.get('REFDATA_SOURCE')
+REFDATA_RELOAD_SECONDS = float(os.environ.get('REFDATA_RELOAD_SECONDS', '30'))
+reference_data = ReferenceData(REFDATA_DIR)
+
+def reference_tables():
+    """Tables to publish into the shared snapshot"""
+    if REFDATA_SOURCE:
+        with open(REFDATA_SOURCE) as fh:
+            return json.load(fh)
+    return {
+        "logos": LOGOS,
+        "top_entities": TOP_ENTITIES,
+        "featured_tokens": FEATURED_TOKENS,
+        "exchange_assets": EXCHANGE_ASSETS,
+        "entity_balance_changes": ENTITY_BALANCE_CHANGES_BASE,
+        "top_holders": TOP_HOLDERS_BASE,
+        "chains": CHAINS,
+    }
+
+reference_data.load(reference_tables(), replace=bool(REFDATA_SOURCE))
+LOGOS = reference_data.table("logos")
+TOP_ENTITIES = reference_data.table("top_entities")
+FEATURED_TOKENS = reference_data.table("featured_tokens")
+EXCHANGE_ASSETS = reference_data.table("exchange_assets")
+ENTITY_BALANCE_CHANGES_BASE = reference_data.table("entity_balance_changes")
+TOP_HOLDERS_BASE = reference_data.table("top_holders")
+CHAINS = reference_data.table("chains")
+
+# Hourly OHLCV history per featured token, with cached chart views
+price_history = PriceHistoryEngine(FEATURED_TOKENS, now_ms=int(time.time() * 1000))
+
+# Rolling exchange inflow/outflow per asset, fed by the ingest pipeline
+exchange_flows = ExchangeFlowAggregator(EXCHANGE_ASSETS.copy())
+
+# Encoded responses for read-mostly endpoints, invalidated by tag
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get('RESPONSE_CACHE_ENTRIES', '2048')),
+    max_bytes=int(os.environ.get('RESPONSE_CACHE_BYTES', str(32 * 1024 * 1024))),
+    default_ttl=float(os.environ.get('RESPONSE_CACHE_TTL', '60')),
+)
+
+# Identical concurrent requests to expensive handlers share one computation
+single_flight = SingleFlight(grace=float(os.environ.get('COALESCE_GRACE_MS', '250')) / 1000)
+
+# Memory-mapped address -> label index, hot-reloaded when the file is replaced
+LABELS_PATH = os.environ.get('LABELS_PATH', str(ROOT_DIR / 'data' / 'labels.bin'))
+LABELS_RELOAD_SECONDS = float(os.environ.get('LABELS_RELOAD_SECONDS', '30'))
+labels = LabelService(LABELS_PATH)
+
+# Prefix/fuzzy autocomplete over tokens, entities, labels and addresses. Labeled
+# addresses are read from the mapped label file; of the addresses only seen in
+# transfers, the SEARCH_MAX_ADDRESSES most active are kept
+search_index = SearchIndex(
+    labeled=lambda: labels.index.keys if labels.index is not None else None,
+    max_addresses=int(os.environ.get('SEARCH_MAX_ADDRESSES', '200000')),
+)
+
+# Net-flow correlation between labeled actors over 7d/30d/90d, refreshed in the background
+ACTOR_CAPACITY = int(os.environ.get('ACTOR_CAPACITY', '5000'))
+ACTOR_REFRESH_SECONDS = float(os.environ.get('ACTOR_REFRESH_SECONDS', '5'))
+actor_correlations = ActorCorrelationEngine(labels.labels_of, capacity=ACTOR_CAPACITY)
+
+def token_supplies():
+    """Circulating supply by token symbol, where it is known"""
+    return {
+        t["symbol"]: float(t["current_supply"].replace(",", ""))
+        for t in FEATURED_TOKENS.values()
+    }
+
+def token_prices():
+    """Reference USD price by token symbol"""
+    return {asset["asset"]: asset["price"] for asset in EXCHANGE_ASSETS}
+
+def reference_price_tokens():
+    """Series parameters for exchange assets without a featured price series"""
+    return {
+        asset["asset"].lower(): {"price": asset["price"], "volume_24h": 1e9}
+        for asset in EXCHANGE_ASSETS
+        if asset["asset"].lower() not in FEATURED_TOKENS
+    }
+
+# Derived from the reference tables; refreshed in place on a generation swap
+TOKEN_SUPPLIES = token_supplies()
+TOKEN_PRICES = token_prices()
+
+# Hourly closes for exchange assets without a featured price series
+reference_prices = PriceHistoryEngine(reference_price_tokens(), now_ms=int(time.time() * 1000))
+
+def token_price_series(symbol):
+    """Hourly price series for a token symbol, or None if it has none"""
+    token_id = symbol.lower()
+    if token_id in FEATURED_TOKENS:
+        return price_history.get_series(token_id)
+    if token_id in reference_prices.tokens:
+        return reference_prices.get_series(token_id)
+    return None
+
+# Copy-trading backtests over actors' trades, swept in worker processes
+SIMULATION_WORKERS = int(os.environ.get('SIMULATION_WORKERS', str(min(4, os.cpu_count() or 1))))
+SIMULATION_SYNC_MAX = int(os.environ.get('SIMULATION_SYNC_MAX', '32'))
+SIMULATION_MAX_GRID = int(os.environ.get('SIMULATION_MAX_GRID', '5000'))
+actor_trades = TradeLog(capacity=int(os.environ.get('SIMULATION_TRADE_CAPACITY', '1000000')))
+# Background jobs are stored in MongoDB so any worker can answer a poll
+simulation_job_store = SimulationJobStore(ttl_s=int(os.environ.get('SIMULATION_JOB_TTL_SECONDS', '86400')))
+simulations = SimulationEngine(
+    actor_trades,
+    token_price_series,
+    workers=SIMULATION_WORKERS,
+    cache_size=int(os.environ.get('SIMULATION_CACHE_SIZE', '4096')),
+    job_store=simulation_job_store,
+)
+
+# User alert rules checked against every ingested transfer; rules persist in MongoDB
+alert_rule_store = AlertRuleStore()
+alert_engine = AlertEngine(
+    labels.labels_of,
+    label_entity,
+    max_entities=int(os.environ.get('ALERT_MAX_ENTITIES', '10000')),
+    max_notifications=int(os.environ.get('ALERT_MAX_NOTIFICATIONS', '10000')),
+)
+# Seconds between reloads of rules other workers created or deleted (0 disables)
+ALERT_RULES_RELOAD_SECONDS = float(os.environ.get('ALERT_RULES_RELOAD_SECONDS', '10'))
+
+# Per-token holder balances with ranked address and entity views
+holder_ledger = HolderLedger(TOKEN_SUPPLIES, labels.labels_of)
+
+# Open interest (billions USD) and per-minute spot/perp volume baselines per exchange
+MARKET_EXCHANGES = {
+    "binance": {"oi": 2.5, "spot": 7.5, "perp": 18.0},
+    "bybit": {"oi": 1.0, "spot": 2.0, "perp": 6.5},
+}
+MARKET_BACKFILL_DAYS = int(os.environ.get('MARKET_BACKFILL_DAYS', '90'))
+
+# Minute OI/volume samples with hour and day rollups, per (token, exchange, metric)
+market_series = TimeSeriesStore(MARKET_EXCHANGES)
+market_oi_level = {}
+
+# Periodic checkpoints of analytics state: startup restores the newest one and
+# replays only transfers written after it
+CHECKPOINT_DIR = os.environ.get('CHECKPOINT_DIR', str(ROOT_DIR / 'data' / 'checkpoints'))
+CHECKPOINT_SECONDS = float(os.environ.get('CHECKPOINT_SECONDS', '300'))
+checkpoints = CheckpointStore(CHECKPOINT_DIR, keep=int(os.environ.get('CHECKPOINT_KEEP', '2')))
+replay_watermark = ReplayWatermark(lateness_ms=int(os.environ.get('CHECKPOINT_LATENESS_MS', '60000')))
+
 # ============ HELPER FUNCTIONS ============
 
 def format_number(num):
     """Format large numbers with K, M, B suffixes"""
+    if num < 0:
+        return "-" + format_number(-num)
     if num >= 1_000_000_000:
         return f"${num/1_000_000_000:.2f}B"
     elif num >= 1_000_000:
@@ -219,104 +430,497 @@ def format_number(num):
     else:
         return f"${num:.2f}"
 
+def format_amount(amount):
+    """Format a token amount, keeping precision for fractional amounts"""
+    if amount >= 1_000:
+        return f"{amount:,.0f}"
+    if amount >= 1:
+        return f"{amount:,.2f}"
+    return f"{amount:.4g}"
+
 def generate_address():
     """Generate a random Ethereum-style address"""
-    return "0x" + "".join(random.choices("0123456789abcdef", k=40))
+    return f"0x{random.getrandbits(160):040x}"
 
-def generate_transfer(token_filter=None):
-    """Generate a mock transfer transaction"""
-    chain = random.choice(list(CHAINS.keys()))
-    
+def shorten_address(address):
+    """Truncate an address for table display"""
+    return address[:25] + "..." if address and len(address) > 25 else address
+
+def format_age(ts_ms, now_ms=None):
+    """Human-readable age of an epoch-millisecond timestamp"""
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    seconds = max(0, (now_ms - ts_ms) // 1000)
+    if seconds < 60:
+        return "just now"
+    minutes = seconds // 60
+    if minutes < 60:
+        return f"{minutes} min ago" if minutes == 1 else f"{minutes} mins ago"
+    hours = minutes // 60
+    if hours < 24:
+        return f"{hours} hour ago" if hours == 1 else f"{hours} hours ago"
+    days = hours // 24
+    return f"{days} day ago" if days == 1 else f"{days} days ago"
+
+def label_logo(label):
+    """Logo for an exchange label such as 'Binance: Hot Wallet'"""
+    if not label:
+        return None
+    return LOGOS.get(label.split(":")[0].split(" ")[0].lower())
+
+TOKEN_COLORS = {
+    "BTC": "#F7931A", "ETH": "#627EEA", "SOL": "#14F195",
+    "USDT": "#26A17B", "USDC": "#2775CA", "BNB": "#F3BA2F",
+    "XRP": "#23292F", "TRX": "#FF0013", "ADA": "#0033AD"
+}
+
+# (deposit label, hot wallet label) per exchange
+EXCHANGE_LABELS = [
+    ("Binance Deposit", "Binance: Hot Wallet"),
+    ("Bybit Deposit", "Bybit: Hot Wallet"),
+    ("Kraken Deposit", "Kraken: Hot Wallet"),
+    ("Coinbase Deposit", "Coinbase: Hot Wallet"),
+]
+
+def wallet_address(label, n):
+    """Deterministic address for the n-th wallet carrying a label"""
+    return "0x" + hashlib.sha256(f"{label}#{n}".encode()).hexdigest()[:40]
+
+# Labeled exchange wallets used by synthetic transfers
+WALLETS_PER_DEPOSIT_LABEL = 32
+WALLETS_PER_HOT_LABEL = 2
+EXCHANGE_WALLETS = {}
+for _deposit, _hot in EXCHANGE_LABELS:
+    EXCHANGE_WALLETS[_deposit] = [wallet_address(_deposit, n) for n in range(WALLETS_PER_DEPOSIT_LABEL)]
+    EXCHANGE_WALLETS[_hot] = [wallet_address(_hot, n) for n in range(WALLETS_PER_HOT_LABEL)]
+
+def default_label_records():
+    """(address, label) pairs for the built-in label file"""
+    for holder in TOP_HOLDERS_BASE:
+        if holder["is_entity"]:
+            yield holder["address"].lower(), holder["name"]
+    for label, addresses in EXCHANGE_WALLETS.items():
+        for address in addresses:
+            yield address, label
+
+# Transfer kinds: deposit to an exchange, withdrawal, exchange-internal sweep, wallet-to-wallet
+TRANSFER_DIRECTIONS = ["inflow", "outflow", "internal", None]
+
+FLOW_TOKENS = [asset["asset"] for asset in EXCHANGE_ASSETS]
+CHAIN_NAMES = list(CHAINS)
+
+def synthetic_token_params():
+    """Reference price and relative trading volume per flow token, for bulk generation"""
+    return {
+        symbol: (
+            FEATURED_TOKENS.get(symbol.lower(), {}).get("price", TOKEN_PRICES[symbol]),
+            FEATURED_TOKENS.get(symbol.lower(), {}).get("volume_24h", 1e9),
+        )
+        for symbol in FLOW_TOKENS
+    }
+
+SYNTHETIC_TOKENS = synthetic_token_params()
+
+def synthetic_transfers(seed):
+    """Seeded bulk transfer generator over the live feed's tokens, chains and wallets"""
+    return TransferGenerator(seed, SYNTHETIC_TOKENS, CHAIN_NAMES, EXCHANGE_LABELS, EXCHANGE_WALLETS)
+
+def generate_transfer_doc(token_filter=None, ts_ms=None):
+    """Generate a mock transfer in its stored (raw) form"""
     if token_filter:
-        token = token_filter
-        token_logo = LOGOS.get(token.lower(), LOGOS["eth"])
+        token = token_filter.upper()
     else:
-        tokens = list(FEATURED_TOKENS.keys())
-        token = random.choice(tokens).upper()
-        token_logo = FEATURED_TOKENS[token.lower()]["logo"]
-    
-    token_colors = {
-        "BTC": "#F7931A", "ETH": "#627EEA", "SOL": "#14F195",
-        "USDT": "#26A17B", "USDC": "#2775CA", "BNB": "#F3BA2F",
-        "XRP": "#23292F", "TRX": "#FF0013", "ADA": "#0033AD"
-    }
-    
-    times = ["just now", "1 min ago", "2 mins ago", "5 mins ago", "10 mins ago", "30 mins ago", "1 hour ago"]
-    
-    exchanges = [
-        ("Binance Deposit", "Binance: Hot Wallet", LOGOS["binance"]),
-        ("Bybit Deposit", "Bybit: Hot Wallet", LOGOS["bybit"]),
-        ("Kraken Deposit", "Kraken: Hot Wallet", LOGOS["kraken"]),
-        ("Coinbase Deposit", "Coinbase: Hot Wallet", LOGOS["coinbase"]),
-        (None, None, None),
-    ]
-    label_data = random.choice(exchanges)
-    
+        token = random.choice(FLOW_TOKENS)
+    if ts_ms is None:
+        ts_ms = int(time.time() * 1000)
+
+    deposit, hot_wallet = random.choice(EXCHANGE_LABELS)
+    direction = random.choice(TRANSFER_DIRECTIONS)
+    from_label = hot_wallet if direction == "outflow" else deposit if direction == "internal" else None
+    to_label = deposit if direction == "inflow" else hot_wallet if direction == "internal" else None
     value = random.randint(1, 100000)
-    usd_value = value * random.uniform(0.5, 10000)
-    
+
     return {
-        "id": str(uuid.uuid4()),
-        "chain": chain,
-        "chain_color": CHAINS[chain]["color"],
-        "chain_icon": CHAINS[chain]["icon"],
-        "time": random.choice(times),
-        "from_address": generate_address()[:25] + "...",
-        "from_label": label_data[0],
-        "from_logo": label_data[2],
-        "to_address": generate_address()[:25] + "...",
-        "to_label": label_data[1],
-        "to_logo": label_data[2],
-        "value": f"{value:,}",
+        "_id": uuid.uuid4().hex,
+        "ts": ts_ms,
+        "chain": random.choice(CHAIN_NAMES),
         "token": token,
-        "token_logo": token_logo,
-        "token_color": token_colors.get(token, "#627EEA"),
-        "usd": format_number(usd_value),
-        "usd_raw": usd_value
+        "from_address": random.choice(EXCHANGE_WALLETS[from_label]) if from_label else generate_address(),
+        "from_label": from_label,
+        "to_address": random.choice(EXCHANGE_WALLETS[to_label]) if to_label else generate_address(),
+        "to_label": to_label,
+        "value": value,
+        "usd_raw": value * random.uniform(0.5, 10000),
     }
 
-def generate_price_history(token_id, period="ALL"):
-    """Generate realistic price history data"""
-    token = FEATURED_TOKENS.get(token_id.lower(), FEATURED_TOKENS["btc"])
-    base_price = token["price"]
-    
-    # Different data points based on period
-    periods = {
-        "1W": 7,
-        "1M": 30,
-        "3M": 90,
-        "1Y": 365,
-        "ALL": 365 * 3  # 3 years
+def format_transfer(doc, now_ms=None, from_label=None, to_label=None):
+    """Format a stored transfer for the frontend tables"""
+    chain = CHAINS.get(doc["chain"]) or CHAINS["ethereum"]
+    token = doc["token"]
+    from_label = from_label or doc.get("from_label")
+    to_label = to_label or doc.get("to_label")
+    return {
+        "id": doc["_id"],
+        "chain": doc["chain"],
+        "chain_color": chain["color"],
+        "chain_icon": chain["icon"],
+        "time": format_age(doc["ts"], now_ms),
+        "from_address": shorten_address(doc["from_address"]),
+        "from_label": from_label,
+        "from_logo": label_logo(from_label),
+        "to_address": shorten_address(doc["to_address"]),
+        "to_label": to_label,
+        "to_logo": label_logo(to_label),
+        "value": format_amount(doc["value"]),
+        "token": token,
+        "token_logo": LOGOS.get(token.lower()) or LOGOS["eth"],
+        "token_color": TOKEN_COLORS.get(token, "#627EEA"),
+        "usd": format_number(doc["usd_raw"]),
+        "usd_raw": doc["usd_raw"]
     }
-    
-    days = periods.get(period, 365 * 3)
-    data = []
-    
-    for i in range(days):
-        # Create realistic price movement
-        variation = random.uniform(-0.05, 0.05)  # ±5% daily variation
-        price = base_price * (1 + variation * (days - i) / days)
-        
-        # Add some trend
-        if period == "1W":
-            date_str = f"Day {i+1}"
-        elif period == "1M":
-            date_str = f"Day {i+1}"
-        elif period == "3M":
-            date_str = f"Week {i//7 + 1}"
-        elif period == "1Y":
-            date_str = f"Month {i//30 + 1}"
-        else:
-            year = 2023 + i // 365
-            month = (i % 365) // 30 + 1
-            date_str = f"{year}-{month:02d}"
-        
-        data.append({
-            "date": date_str,
-            "price": round(price, 2)
-        })
-    
-    return data
+
+def format_transfers(docs):
+    """Format a page of transfers, resolving all wallet labels in one index lookup"""
+    now_ms = int(time.time() * 1000)
+    found = labels.labels_of([d["from_address"] for d in docs] + [d["to_address"] for d in docs])
+    n = len(docs)
+    return [format_transfer(doc, now_ms, found[i], found[n + i]) for i, doc in enumerate(docs)]
+
+def format_address_holders(top, found, price):
+    """Format ranked ``(address, balance, pct)`` rows with their resolved labels"""
+    return [
+        {
+            "name": label or address,
+            "address": address,
+            "is_entity": label is not None,
+            "logo": label_logo(label),
+            "value": f"{balance:,.2f}",
+            "pct": f"{pct:.2f}%",
+            "usd": format_number(balance * price)
+        }
+        for (address, balance, pct), label in zip(top, found)
+    ]
+
+def transfer_columns(docs):
+    """Stored transfers as typed columns, labels resolved in one index lookup"""
+    found = labels.labels_of([d["from_address"] for d in docs] + [d["to_address"] for d in docs])
+    n = len(docs)
+    return {
+        "id": [d["_id"] for d in docs],
+        "ts": np.array([d["ts"] for d in docs], dtype=np.int64),
+        "chain": [d["chain"] for d in docs],
+        "token": [d["token"] for d in docs],
+        "from_address": [d["from_address"] for d in docs],
+        "from_label": [found[i] or d.get("from_label") for i, d in enumerate(docs)],
+        "to_address": [d["to_address"] for d in docs],
+        "to_label": [found[n + i] or d.get("to_label") for i, d in enumerate(docs)],
+        "value": np.array([d["value"] for d in docs], dtype=np.int64),
+        "usd": np.array([d["usd_raw"] for d in docs], dtype=np.float64),
+    }
+
+async def run_transfer_feeder(pipeline, rate):
+    """Push synthetic transfers into the ingest pipeline at ``rate`` per second"""
+    interval = 0.1
+    carry = 0.0
+    while True:
+        carry += rate * interval
+        count, carry = int(carry), carry - int(carry)
+        if count:
+            await pipeline.submit_many(generate_transfer_doc() for _ in range(count))
+        await asyncio.sleep(interval)
+
+def remember_labels(docs):
+    """Record wallet labels carried by stored transfers that the index lacks"""
+    labeled = []
+    for doc in docs:
+        for side in ("from", "to"):
+            label = doc.get(f"{side}_label")
+            if label:
+                labels.learn(doc[f"{side}_address"], label)
+                labeled.append(doc[f"{side}_address"])
+                if not search_index.has(LABEL, label):
+                    search_index.add(LABEL, label, label)
+    search_index.pin_addresses(labeled)
+
+async def run_label_reloader(interval):
+    """Pick up a replaced label file without a restart"""
+    while True:
+        await asyncio.sleep(interval)
+        if labels.reload_if_changed():
+            index_labels()
+            holder_ledger.relabel()
+            logger.info("Reloaded label index (%d addresses)", len(labels.index))
+
+async def reload_alert_rules(interval):
+    """Pick up alert rules other workers created or deleted"""
+    # a rule this worker created within the last interval may not be visible in the store yet
+    settled_ms = int(time.time() * 1000) - int(interval * 1000)
+    return alert_engine.sync_rules(await alert_rule_store.load(), settled_ms)
+
+async def run_alert_rule_reloader(interval):
+    """Keep this worker's alert rules in step with the rule store"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            added, removed = await reload_alert_rules(interval)
+        except Exception:
+            logger.exception("Alert rule reload failed")
+            continue
+        if added or removed:
+            logger.info("Alert rules changed: %d added, %d removed", added, removed)
+
+async def sync_hot_tier():
+    """Heartbeat, then add transfers other workers wrote since the hot tier last caught up"""
+    others = await writers.beat()
+    if not others and not hot_tier.shared:
+        return
+    started_ms = int(time.time() * 1000)
+    since = hot_tier.settled if hot_tier.shared else started_ms - HOT_TIER_SYNC_LAG_MS
+    async for batch in transfer_store.iter_since(since):
+        hot_tier.add(batch)
+    # anything written before this pass started is in the ring, if it landed within the lag
+    hot_tier.settle(others > 0, started_ms - HOT_TIER_SYNC_LAG_MS)
+
+async def run_hot_tier_sync(interval):
+    """Keep the hot tier caught up with other workers' writes"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await sync_hot_tier()
+        except Exception:
+            logger.exception("Hot tier sync failed")
+
+def reference_swap_allowed(snapshot):
+    """Whether a new generation has every table and keeps the exchange assets flow state is laid out by"""
+    missing = set(reference_data.snapshot.directory) - set(snapshot.directory)
+    if missing:
+        logger.error("Reference data generation %s lacks tables %s; keeping %s",
+                     snapshot.generation, sorted(missing), reference_data.snapshot.generation)
+        return False
+    if [asset["asset"] for asset in snapshot.decoded("exchange_assets")] != FLOW_TOKENS:
+        logger.error("Reference data generation %s changes the exchange assets; restart workers to use it",
+                     snapshot.generation)
+        return False
+    return True
+
+def refresh_reference_views():
+    """Rebuild the state derived from reference tables after a generation swap"""
+    exchange_flows.set_assets(EXCHANGE_ASSETS.copy())
+    for table, build in ((TOKEN_SUPPLIES, token_supplies), (TOKEN_PRICES, token_prices),
+                         (SYNTHETIC_TOKENS, synthetic_token_params)):
+        fresh = build()
+        table.clear()
+        table.update(fresh)
+    CHAIN_NAMES[:] = list(CHAINS)
+    holder_ledger.set_supplies(TOKEN_SUPPLIES)
+    price_history.refresh()
+    reference_prices.refresh(reference_price_tokens())
+
+async def run_refdata_reloader(interval):
+    """Swap to a newly published reference data generation"""
+    while True:
+        await asyncio.sleep(interval)
+        if reference_data.reload_if_changed(reference_swap_allowed):
+            refresh_reference_views()
+            response_cache.clear()
+            index_reference_data()
+            logger.info("Attached reference data generation %s", reference_data.snapshot.generation)
+
+def parse_usd(text):
+    """Dollar amount of a display string such as ``$84.21B``"""
+    units = {"K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}
+    text = text.strip().lstrip("$")
+    scale = units.get(text[-1:].upper(), 1)
+    try:
+        return float(text.rstrip("KMBTkmbt").replace(",", "")) * scale
+    except ValueError:
+        return 0.0
+
+def index_reference_data():
+    """Add tokens (by market cap), entities (by holdings) and reference holders to search"""
+    for token in FEATURED_TOKENS.values():
+        search_index.add(
+            TOKEN, token["id"], token["name"], token["market_cap"], keys=[token["symbol"]],
+            extra={"symbol": token["symbol"], "logo": token["logo"]},
+        )
+    for asset in EXCHANGE_ASSETS:
+        token_id = asset["asset"].lower()
+        if not search_index.has(TOKEN, token_id):
+            search_index.add(TOKEN, token_id, asset["asset"], extra={"symbol": asset["asset"], "logo": asset["logo"]})
+    for entity in TOP_ENTITIES:
+        search_index.add(ENTITY, entity["name"].lower(), entity["name"], parse_usd(entity["price"]), extra={"logo": entity["logo"]})
+    for entity in ENTITY_BALANCE_CHANGES_BASE:
+        search_index.add(
+            ENTITY, entity["name"].lower(), entity["name"], entity["usd"],
+            extra={"logo": entity["logo"], "entity_type": entity["type"]},
+        )
+    search_index.pin_addresses([holder["address"] for holder in TOP_HOLDERS_BASE])
+
+def index_labels():
+    """Add label strings (by tagged addresses) and learned labels' addresses to search"""
+    index = labels.index
+    if index is not None and len(index):
+        counts = np.bincount(index.ids, minlength=len(index.labels))
+        for label, count in zip(index.labels, counts.tolist()):
+            search_index.add(LABEL, label, label, count)
+    for label in set(labels.overlay.values()):
+        search_index.add(LABEL, label, label)
+    search_index.pin_addresses(list(labels.overlay))
+
+async def run_actor_refresher(interval):
+    """Keep requested actor correlation windows current with recent transfers"""
+    while True:
+        await asyncio.sleep(interval)
+        now_ms = int(time.time() * 1000)
+        changed = False
+        for window in actor_correlations.warm():
+            version = actor_correlations.correlations[window].version
+            await actor_correlations.refresh(window, now_ms)
+            changed |= actor_correlations.correlations[window].version != version
+        if changed:
+            response_cache.invalidate("actor-correlation")
+
+def seed_holder_ledger():
+    """Give every tracked token the reference holder distribution"""
+    for token in FLOW_TOKENS:
+        supply = TOKEN_SUPPLIES.get(token)
+        for holder in TOP_HOLDERS_BASE:
+            amount = holder["pct"] / 100 * supply if supply else holder["value"]
+            holder_ledger.credit(token, holder["address"].lower(), amount)
+
+def market_symbol(token_id):
+    """Token symbol for market series; unknown tokens fall back to BTC"""
+    symbol = token_id.upper()
+    return symbol if symbol in TOKEN_PRICES else "BTC"
+
+def ensure_market_series(symbol):
+    """Backfill synthetic minute history for a token the first time it is charted"""
+    if (symbol, next(iter(MARKET_EXCHANGES))) in market_oi_level:
+        return
+    seed = int.from_bytes(hashlib.sha256(symbol.encode()).digest()[:4], "big")
+    rng = np.random.default_rng(seed)
+    # up to the minute before the current one, which the sampler fills
+    end = int(time.time() * 1000) // MINUTE_MS * MINUTE_MS
+    ts = np.arange(end - MARKET_BACKFILL_DAYS * DAY_MS, end, MINUTE_MS, dtype=np.int64)
+    daily = 1 + 0.35 * np.sin(2 * np.pi * (ts % DAY_MS) / DAY_MS)
+    for exchange, base in MARKET_EXCHANGES.items():
+        walk = np.cumsum(rng.normal(0, 0.0008, len(ts)))
+        oi = base["oi"] * np.exp(walk - walk[-1] * np.linspace(0, 1, len(ts)))
+        market_series.get(symbol, exchange, "oi").load(ts, oi)
+        for volume_type in ("spot", "perp"):
+            volume = base[volume_type] * daily * rng.gamma(2.0, 0.5, len(ts))
+            market_series.get(symbol, exchange, volume_type).load(ts, volume)
+        market_oi_level[(symbol, exchange)] = float(oi[-1])
+
+async def run_market_sampler(interval):
+    """Record one OI and volume sample per charted token and exchange each minute"""
+    while True:
+        await asyncio.sleep(interval)
+        now_ms = int(time.time() * 1000)
+        for symbol in market_series.tokens():
+            for exchange, base in MARKET_EXCHANGES.items():
+                level = market_oi_level[(symbol, exchange)]
+                level *= np.exp(random.gauss(0, 0.0008) + 0.001 * np.log(base["oi"] / level))
+                market_oi_level[(symbol, exchange)] = level
+                market_series.record(symbol, exchange, "oi", now_ms, level)
+                for volume_type in ("spot", "perp"):
+                    volume = base[volume_type] * random.gammavariate(2.0, 0.5)
+                    market_series.record(symbol, exchange, volume_type, now_ms, volume)
+
+def market_query(token_id, metric, period, max_points, exchange):
+    """Bucketed series for one market metric, filtered server-side"""
+    period_ms = SERIES_PERIODS.get(period.upper())
+    if period_ms is None:
+        raise HTTPException(status_code=400, detail=f"Unknown period: {period}")
+    exchanges = list(MARKET_EXCHANGES)
+    if exchange:
+        if exchange.lower() not in MARKET_EXCHANGES:
+            raise HTTPException(status_code=400, detail=f"Unknown exchange: {exchange}")
+        exchanges = [exchange.lower()]
+
+    symbol = market_symbol(token_id)
+    ensure_market_series(symbol)
+    with span("rollup"):
+        resolution, ts, columns = market_series.query(
+            symbol, metric, period_ms, max_points, int(time.time() * 1000), exchanges
+        )
+    return resolution, ts, columns, period_ms
+
+def market_rows(ts, columns, resolution, period_ms, label_key, digits):
+    """One row per bucket with a time label and a value per exchange"""
+    fmt = "%Y-%m-%d" if resolution == "day" else "%H:%M" if period_ms <= DAY_MS else "%m-%d %H:%M"
+    rows = [
+        {label_key: datetime.fromtimestamp(t / 1000, tz=timezone.utc).strftime(fmt)}
+        for t in ts.tolist()
+    ]
+    for name, values in columns.items():
+        for row, value in zip(rows, np.round(values, digits).tolist()):
+            row[name] = value
+    return rows
+
+def apply_transfer_batch(docs):
+    """Fold stored transfers into in-memory analytics state"""
+    remember_labels(docs)
+    search_index.touch_addresses([d["from_address"] for d in docs] + [d["to_address"] for d in docs])
+    holder_ledger.apply_batch(docs)
+    exchange_flows.add_batch(docs)
+    legs = actor_correlations.add_batch(docs)
+    actor_trades.add(legs.rows, [docs[i]["token"] for i in legs.docs.tolist()], legs.ts, legs.usd)
+    replay_watermark.observe(docs)
+
+def checkpoint_schema():
+    """Configuration that checkpointed state layouts depend on"""
+    return {
+        "flow_assets": FLOW_TOKENS,
+        "flow_windows": FLOW_WINDOWS,
+        "market_exchanges": list(MARKET_EXCHANGES),
+        "actor_windows": ACTOR_WINDOWS,
+        "actor_trades": ["actor", "token", "ts", "usd"],
+        "series_resolutions": SERIES_RESOLUTIONS,
+        "alert_windows": NETFLOW_WINDOWS,
+    }
+
+def export_analytics_state():
+    """Copies of all checkpointed state, safe to write from another thread"""
+    market_arrays, market_meta = market_series.export_state()
+    market_meta["oi_level"] = [[symbol, exchange, level] for (symbol, exchange), level in market_oi_level.items()]
+    return {
+        "actors": actor_correlations.export_state(),
+        "alerts": alert_engine.export_state(),
+        "flows": exchange_flows.export_state(),
+        "holders": holder_ledger.export_state(),
+        "labels": labels.export_state(),
+        "market": (market_arrays, market_meta),
+        "trades": actor_trades.export_state(),
+        "watermark": replay_watermark.export_state(),
+    }
+
+def restore_analytics_state(components):
+    """Replace in-memory analytics state with checkpointed components"""
+    actor_correlations.import_state(*components["actors"])
+    alert_engine.import_state(*components["alerts"])
+    exchange_flows.import_state(*components["flows"])
+    labels.import_state(*components["labels"])
+    holder_ledger.import_state(*components["holders"])
+    market_arrays, market_meta = components["market"]
+    market_series.import_state(market_arrays, market_meta)
+    market_oi_level.update(((symbol, exchange), level) for symbol, exchange, level in market_meta["oi_level"])
+    actor_trades.import_state(*components["trades"])
+    replay_watermark.import_state(*components["watermark"])
+
+async def save_checkpoint():
+    """Write the current analytics state off the event loop"""
+    path = await asyncio.to_thread(checkpoints.save, export_analytics_state(), checkpoint_schema())
+    logger.info("Wrote checkpoint %s in %.0f ms", path, checkpoints.last_save_ms)
+
+async def run_checkpointer(interval):
+    """Checkpoint analytics state every ``interval`` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await save_checkpoint()
+        except OSError:
+            logger.exception("Failed to write checkpoint to %s", CHECKPOINT_DIR)
 
 # ============ API ENDPOINTS ============
 
@@ -331,18 +935,23 @@ async def root():
     }
 
 @api_router.get("/entities")
+@response_cache.cached(tags=["entities"])
 async def get_entities():
     """Get top entities for carousel"""
-    return {"entities": TOP_ENTITIES}
+    return {"entities": list(TOP_ENTITIES)}
 
 @api_router.get("/exchange-flows")
+@response_cache.cached(ttl=5, tags=["exchange-flows"])
 async def get_exchange_flows(
     sort_by: Optional[str] = Query(None, description="Field to sort by: volume, price, netflow"),
     filter_type: Optional[str] = Query(None, description="Filter by type: CEX+DEX, MARKET CAP, VOLUME"),
+    window: str = Query("24h", description="Rolling window: 1h, 24h, 7d"),
     limit: int = Query(default=10, le=50)
 ):
     """Get exchange flow data with filtering and sorting"""
-    flows = EXCHANGE_FLOWS_BASE.copy()
+    if window not in FLOW_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Unknown window: {window}")
+    flows = exchange_flows.snapshot(window, int(time.time() * 1000))
     
     # Apply sorting
     if sort_by == "volume":
@@ -367,48 +976,147 @@ async def get_exchange_flows(
             "netflow_change": flow["netflow_change"]
         })
     
-    return {"flows": formatted_flows}
+    return {"flows": formatted_flows, "window": window}
+
+async def list_transfers(query, sort_by, limit, page=1, cursor=None, fmt="json"):
+    """Run a transfer listing against the store and shape the response"""
+    try:
+        with span("query"):
+            found = hot_tier.page(query, sort_by, limit, cursor, (page - 1) * limit) if hot_tier is not None else None
+            if found is None:
+                found = await transfer_store.find_page(
+                    query, sort_by=sort_by, limit=limit, cursor=cursor, skip=(page - 1) * limit
+                )
+            docs, next_cursor = found
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    with span("count"):
+        total = hot_tier.count(query) if hot_tier is not None else None
+        if total is None:
+            total = await transfer_store.count(query)
+    # filtered counts stop at COUNT_LIMIT; the real total may be larger
+    total_capped = bool(query) and total >= COUNT_LIMIT
+    total_pages = max(1, (total + limit - 1) // limit)
+    if fmt != "json":
+        with span("format"):
+            columns = transfer_columns(docs)
+        return columnar(
+            fmt, columns, total=total, total_capped=total_capped, page=page, total_pages=total_pages,
+            next_cursor=next_cursor,
+        )
+    with span("format"):
+        transfers = format_transfers(docs)
+
+    return {
+        "transfers": transfers,
+        "total": total,
+        "total_capped": total_capped,
+        "page": page,
+        "total_pages": total_pages,
+        "next_cursor": next_cursor
+    }
 
 @api_router.get("/transfers")
+@single_flight.coalesce()
 async def get_transfers(
     limit: int = Query(default=15, le=50),
     min_usd: Optional[float] = Query(None, description="Minimum USD value"),
     token: Optional[str] = Query(None, description="Filter by token"),
+    chain: Optional[str] = Query(None, description="Filter by chain"),
     sort_by: Optional[str] = Query("time", description="Sort by: time, value, usd"),
-    page: int = Query(default=1, ge=1)
+    page: int = Query(default=1, ge=1),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    fmt: str = Query("json", alias="format", description=FORMAT_DESCRIPTION)
 ):
     """Get recent transfers with filtering and sorting"""
-    # Generate transfers
-    transfers = [generate_transfer(token) for _ in range(limit * 3)]
-    
-    # Apply USD filter
-    if min_usd:
-        transfers = [t for t in transfers if t["usd_raw"] >= min_usd]
-    
-    # Apply sorting
-    if sort_by == "value":
-        transfers.sort(key=lambda x: float(x["value"].replace(",", "")), reverse=True)
-    elif sort_by == "usd":
-        transfers.sort(key=lambda x: x["usd_raw"], reverse=True)
-    
-    # Pagination
-    start_idx = (page - 1) * limit
-    end_idx = start_idx + limit
-    paginated = transfers[start_idx:end_idx]
-    
-    return {
-        "transfers": paginated,
-        "total": len(transfers),
-        "page": page,
-        "total_pages": (len(transfers) + limit - 1) // limit
-    }
+    query = build_filter(token=token, chain=chain, min_usd=min_usd)
+    return await list_transfers(query, sort_by, limit, page, cursor, check_format(fmt))
+
+@api_router.websocket("/transfers/ws")
+async def transfers_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    chain: Optional[str] = None,
+    min_usd: Optional[float] = None
+):
+    """Push new transfers matching the filters as JSON messages"""
+    await websocket.accept()
+    sub = transfer_stream.subscribe(token, chain, min_usd)
+
+    async def pump():
+        while (event := await sub.next()) is not None:
+            await websocket.send_json(event)
+
+    async def drain_client():
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    sender = asyncio.create_task(pump())
+    receiver = asyncio.create_task(drain_client())
+    try:
+        await asyncio.wait([sender, receiver], return_when=asyncio.FIRST_COMPLETED)
+        client_left = receiver.done()
+    finally:
+        transfer_stream.unsubscribe(sub)
+        sender.cancel()
+        receiver.cancel()
+    if not client_left:
+        # Dropped as a slow consumer rather than by the client
+        await websocket.close(code=1013)
+
+@api_router.get("/transfers/stream")
+async def transfers_sse(
+    request: Request,
+    token: Optional[str] = Query(None, description="Filter by token"),
+    chain: Optional[str] = Query(None, description="Filter by chain"),
+    min_usd: Optional[float] = Query(None, description="Minimum USD value")
+):
+    """Server-Sent Events fallback for the live transfer stream"""
+    sub = transfer_stream.subscribe(token, chain, min_usd)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(sub.next(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            transfer_stream.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/transfers/hot/stats")
+async def get_hot_tier_stats():
+    """In-memory transfer ring size, coverage and pages served from it"""
+    if hot_tier is None:
+        raise HTTPException(status_code=404, detail="Hot tier is disabled")
+    return hot_tier.stats()
+
+@api_router.get("/transfers/stream/stats")
+async def get_transfer_stream_stats():
+    """Live stream subscriber and delivery counters"""
+    return transfer_stream.stats()
 
 @api_router.get("/tokens")
+@response_cache.cached(tags=["tokens"])
 async def get_tokens():
     """Get all featured tokens"""
     return {"tokens": list(FEATURED_TOKENS.values())}
 
 @api_router.get("/tokens/{token_id}")
+@response_cache.cached(tags=["tokens"])
 async def get_token(token_id: str):
     """Get token details by ID"""
     token = FEATURED_TOKENS.get(token_id.lower())
@@ -417,6 +1125,7 @@ async def get_token(token_id: str):
     return token
 
 @api_router.get("/tokens/{token_id}/balance-changes")
+@response_cache.cached(tags=["balance-changes"])
 async def get_token_balance_changes(
     token_id: str,
     filter_type: Optional[str] = Query(None, description="Filter by type: CEX, DEX, ALL"),
@@ -453,52 +1162,68 @@ async def get_token_balance_changes(
     return {"changes": formatted_changes}
 
 @api_router.get("/tokens/{token_id}/holders")
-async def get_token_holders(token_id: str, view_type: str = Query("addresses", description="View type: addresses or entities")):
+async def get_token_holders(
+    token_id: str,
+    view_type: str = Query("addresses", description="View type: addresses or entities"),
+    limit: int = Query(default=10, ge=1, le=100)
+):
     """Get top holders for a token"""
-    holders = TOP_HOLDERS_BASE.copy()
-    
-    # Filter by view type
-    if view_type == "entities":
-        holders = [h for h in holders if h["is_entity"]]
+    symbol = token_id.upper()
+    price = TOKEN_PRICES.get(symbol, 0.0)
     
     # Format for frontend
     formatted_holders = []
-    for holder in holders:
-        formatted_holders.append({
-            "name": holder["name"] if holder["is_entity"] else holder["address"],
-            "is_entity": holder["is_entity"],
-            "logo": holder["logo"],
-            "value": f"{holder['value']:,.2f}",
-            "pct": f"{holder['pct']:.2f}%",
-            "usd": format_number(holder["usd"])
-        })
+    if view_type == "entities":
+        for entity, balance, pct in holder_ledger.top_entities(symbol, limit):
+            formatted_holders.append({
+                "name": entity,
+                "is_entity": True,
+                "logo": label_logo(entity),
+                "value": f"{balance:,.2f}",
+                "pct": f"{pct:.2f}%",
+                "usd": format_number(balance * price)
+            })
+    else:
+        top = holder_ledger.top_addresses(symbol, limit)
+        found = labels.labels_of([address for address, _, _ in top])
+        formatted_holders = format_address_holders(top, found, price)
     
     return {"holders": formatted_holders}
 
 @api_router.get("/tokens/{token_id}/transfers")
+@single_flight.coalesce()
 async def get_token_transfers(
     token_id: str,
     limit: int = Query(default=10, le=50),
-    page: int = Query(default=1, ge=1)
+    page: int = Query(default=1, ge=1),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    fmt: str = Query("json", alias="format", description=FORMAT_DESCRIPTION)
 ):
     """Get transfers for a specific token"""
-    token = FEATURED_TOKENS.get(token_id.lower(), FEATURED_TOKENS["btc"])
-    transfers = [generate_transfer(token["symbol"]) for _ in range(limit)]
-    
-    return {
-        "transfers": transfers,
-        "total": 625,
-        "page": page,
-        "total_pages": 63
-    }
+    token = FEATURED_TOKENS.get(token_id.lower()) or FEATURED_TOKENS["btc"]
+    query = build_filter(token=token["symbol"])
+    return await list_transfers(query, "time", limit, page, cursor, check_format(fmt))
 
 @api_router.get("/tokens/{token_id}/price-history")
+@single_flight.coalesce()
 async def get_price_history_endpoint(
     token_id: str,
-    period: str = Query("ALL", description="Time period: 1W, 1M, 3M, 1Y, ALL")
+    period: str = Query("ALL", description="Time period: 1W, 1M, 3M, 1Y, ALL"),
+    max_points: int = Query(default=DEFAULT_MAX_POINTS, ge=3, le=5000, description="Maximum points returned"),
+    fmt: str = Query("json", alias="format", description=FORMAT_DESCRIPTION)
 ):
     """Get price history for charting"""
-    data = generate_price_history(token_id, period)
+    fmt = check_format(fmt)
+    period = period.upper()
+    if period not in PERIOD_HOURS:
+        raise HTTPException(status_code=400, detail=f"Unknown period: {period}")
+    series_id = token_id.lower() if token_id.lower() in FEATURED_TOKENS else "btc"
+    if fmt != "json":
+        with span("view"):
+            ts, close = price_history.view_columns(series_id, period, max_points)
+        return columnar(fmt, {"ts": ts, "price": close}, token_id=token_id, period=period)
+    with span("view"):
+        data = price_history.view(series_id, period, max_points)
     
     return {
         "token_id": token_id,
@@ -507,48 +1232,363 @@ async def get_price_history_endpoint(
     }
 
 @api_router.get("/tokens/{token_id}/open-interest")
+@response_cache.cached(ttl=30)
 async def get_open_interest(
     token_id: str,
-    period: str = Query("1M", description="Time period"),
-    exchange: Optional[str] = Query(None, description="Filter by exchange: binance, bybit")
+    period: str = Query("1M", description="Time period: 24H, 7D, 1M, 3M"),
+    exchange: Optional[str] = Query(None, description="Filter by exchange: binance, bybit"),
+    max_points: int = Query(default=SERIES_MAX_POINTS, ge=2, le=5000, description="Maximum points returned"),
+    fmt: str = Query("json", alias="format", description=FORMAT_DESCRIPTION)
 ):
     """Get open interest data for charting"""
-    data = []
-    points = 30 if period == "1M" else 90
-    
-    for i in range(points):
-        point = {
-            "date": str(i),
-            "binance": round(random.uniform(1.5, 3.5), 2),
-            "bybit": round(random.uniform(0.5, 1.5), 2)
-        }
-        data.append(point)
-    
-    return {"data": data, "period": period}
+    fmt = check_format(fmt)
+    resolution, ts, columns, period_ms = market_query(token_id, "oi", period, max_points, exchange)
+    if fmt != "json":
+        return columnar(fmt, {"ts": ts, **columns}, period=period, resolution=resolution)
+    with span("format"):
+        data = market_rows(ts, columns, resolution, period_ms, "date", 2)
+    return {"data": data, "period": period, "resolution": resolution}
 
 @api_router.get("/tokens/{token_id}/cex-volume")
+@response_cache.cached(ttl=30)
 async def get_cex_volume(
     token_id: str,
     period: str = Query("24H", description="Time period: 24H, 7D, 30D"),
     volume_type: str = Query("spot", description="Volume type: spot or perp"),
-    exchange: Optional[str] = Query(None, description="Filter by exchange")
+    exchange: Optional[str] = Query(None, description="Filter by exchange"),
+    max_points: int = Query(default=SERIES_MAX_POINTS, ge=2, le=5000, description="Maximum points returned"),
+    fmt: str = Query("json", alias="format", description=FORMAT_DESCRIPTION)
 ):
     """Get CEX volume data for charting"""
-    data = []
-    hours = 24 if period == "24H" else (168 if period == "7D" else 720)
-    
-    for i in range(min(hours, 24)):  # Max 24 data points for chart
-        hour = f"{i:02d}:00"
-        point = {
-            "time": hour,
-            "binance": random.randint(100, 800),
-            "bybit": random.randint(50, 200)
-        }
-        data.append(point)
-    
-    return {"data": data, "period": period, "type": volume_type}
+    fmt = check_format(fmt)
+    if volume_type not in ("spot", "perp"):
+        raise HTTPException(status_code=400, detail=f"Unknown volume type: {volume_type}")
+    resolution, ts, columns, period_ms = market_query(token_id, volume_type, period, max_points, exchange)
+    if fmt != "json":
+        return columnar(fmt, {"ts": ts, **columns}, period=period, type=volume_type, resolution=resolution)
+    with span("format"):
+        data = market_rows(ts, columns, resolution, period_ms, "time", 2)
+    return {"data": data, "period": period, "type": volume_type, "resolution": resolution}
+
+@api_router.get("/ingest/stats")
+async def get_ingest_stats():
+    """Ingestion queue depth, batch sizes and flush latency"""
+    return ingest.stats()
+
+@api_router.get("/coalesce/stats")
+async def get_coalesce_stats():
+    """Computations run vs. requests served from a shared one"""
+    return single_flight.stats()
+
+@api_router.get("/admission/stats")
+async def get_admission_stats():
+    """Per-client rate limits and per-route-class queue counters"""
+    return admission.stats()
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Response cache hit/miss counters"""
+    return response_cache.stats()
+
+def featured_id(token_id):
+    """Featured token id for a path id; unknown ids fall back to BTC"""
+    token_id = token_id.lower()
+    return token_id if token_id in FEATURED_TOKENS else "btc"
+
+# Section loaders for the batch dashboard; each mirrors its single-token endpoint's defaults
+async def dashboard_holders(symbols):
+    """Top holders for many tokens with a single label-index search"""
+    tops = {symbol: holder_ledger.top_addresses(symbol, DASHBOARD_HOLDERS) for symbol in symbols}
+    addresses = [address for top in tops.values() for address, _, _ in top]
+    found = iter(labels.labels_of(addresses))
+    return {
+        symbol: {"holders": format_address_holders(top, [next(found) for _ in top], TOKEN_PRICES.get(symbol, 0.0))}
+        for symbol, top in tops.items()
+    }
+
+async def dashboard_transfers(symbol):
+    """Latest transfers of a token, as the transfers table shows them"""
+    return await list_transfers(build_filter(token=symbol), "time", DASHBOARD_TRANSFERS)
+
+async def dashboard_price_history(series_id):
+    """Full-history price chart of a featured token"""
+    return await get_price_history_endpoint.__wrapped__(series_id, period="ALL", max_points=DEFAULT_MAX_POINTS, fmt="json")
+
+async def dashboard_open_interest(symbol):
+    """One month of open interest across exchanges"""
+    return await get_open_interest.__wrapped__(
+        symbol.lower(), period="1M", exchange=None, max_points=SERIES_MAX_POINTS, fmt="json"
+    )
+
+async def dashboard_cex_volume(symbol):
+    """Last day of spot volume across exchanges"""
+    return await get_cex_volume.__wrapped__(
+        symbol.lower(), period="24H", volume_type="spot", exchange=None, max_points=SERIES_MAX_POINTS, fmt="json"
+    )
+
+async def dashboard_balance_changes(_):
+    """Entity balance changes, the same for every token"""
+    return await get_token_balance_changes.__wrapped__("", filter_type=None, sort_by="usd")
+
+async def dashboard_token(series_id):
+    """Reference metadata of a featured token"""
+    return FEATURED_TOKENS[series_id]
+
+# Token page sections, keyed so that tokens sharing data share one load
+DASHBOARD_HOLDERS = 10
+DASHBOARD_TRANSFERS = 10
+dashboard = DashboardBatch(
+    {
+        "token": Section(key=featured_id, load=dashboard_token),
+        "balance_changes": Section(key=lambda _: None, load=dashboard_balance_changes),
+        "holders": Section(key=str.upper, load_many=dashboard_holders),
+        "transfers": Section(key=lambda t: FEATURED_TOKENS[featured_id(t)]["symbol"], load=dashboard_transfers),
+        "price_history": Section(key=featured_id, load=dashboard_price_history),
+        "open_interest": Section(key=market_symbol, load=dashboard_open_interest),
+        "cex_volume": Section(key=market_symbol, load=dashboard_cex_volume),
+    },
+    concurrency=int(os.environ.get('DASHBOARD_CONCURRENCY', '8')),
+)
+
+class DashboardRequest(BaseModel):
+    tokens: List[str] = Field(..., min_length=1, max_length=100)
+    sections: Optional[List[str]] = None
+
+@api_router.post("/tokens/dashboard")
+async def get_token_dashboard(body: DashboardRequest):
+    """Token page sections for many tokens, streamed as NDJSON as each token completes"""
+    names = body.sections or list(dashboard.sections)
+    unknown = [name for name in names if name not in dashboard.sections]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+
+    async def lines():
+        async for result in dashboard.stream(body.tokens, list(dict.fromkeys(names))):
+            yield encode_json(result) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+class LabelLookupRequest(BaseModel):
+    addresses: List[str] = Field(..., max_length=1000)
+
+@api_router.post("/labels/lookup")
+async def lookup_labels(body: LabelLookupRequest):
+    """Resolve wallet labels for a batch of addresses"""
+    found = labels.labels_of(body.addresses)
+    return {"labels": dict(zip(body.addresses, found))}
+
+@api_router.get("/search")
+async def get_search(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    types: Optional[str] = Query(None, description="Comma-separated subset of token,entity,label,address"),
+):
+    """Autocomplete tokens, entities, wallet labels and address prefixes"""
+    kinds = None
+    if types:
+        kinds = {t.strip().lower() for t in types.split(",") if t.strip()}
+        unknown = kinds - set(SEARCH_KINDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(sorted(unknown))}")
+    results = search_index.search(q, limit, kinds)
+    addresses = [hit for hit in results if hit["type"] == ADDRESS]
+    for hit, label in zip(addresses, labels.labels_of([hit["id"] for hit in addresses])):
+        hit["title"] = label
+    return {"query": q, "results": results}
+
+def actor_window(window):
+    """Validate an actor correlation window name"""
+    if window not in ACTOR_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Unknown window: {window}")
+    return window
+
+@api_router.get("/actors/correlation")
+@response_cache.cached(tags=["actor-correlation"])
+async def get_actor_correlation_matrix(
+    window: str = Query("30d", description="Correlation window: 7d, 30d, 90d"),
+    limit: int = Query(50, ge=2, le=500, description="Most active actors to include"),
+    ids: Optional[str] = Query(None, description="Comma-separated actor ids instead of the most active"),
+    threshold: float = Query(ACTOR_CLUSTER_THRESHOLD, ge=0, le=1, description="Minimum correlation linking a cluster"),
+):
+    """Correlation matrix and clusters of actors' net flows"""
+    state = await actor_correlations.ensure(actor_window(window))
+    if ids:
+        wanted = [i.strip() for i in ids.split(",") if i.strip()][:500]
+        unknown = [i for i in wanted if i not in actor_correlations.index]
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Unknown actors: {', '.join(unknown[:10])}")
+        rows = np.array([actor_correlations.index[i] for i in wanted], dtype=np.int64)
+    else:
+        activity = actor_correlations.activity(window)
+        rows = np.argsort(-activity, kind="stable")[:limit]
+    matrix = actor_correlations.submatrix(window, rows)
+    return {
+        "window": window,
+        "actors": [actor_correlations.actor(row) for row in rows.tolist()],
+        "matrix": np.round(matrix.astype(np.float64), 4).tolist(),
+        "clusters": await actor_correlations.clusters(window, threshold),
+        "version": state.version,
+        "computed_at": state.computed_ms,
+    }
+
+@api_router.get("/actors/correlation/stats")
+async def get_actor_correlation_stats():
+    """Tracked actors and correlation recomputation counters"""
+    return actor_correlations.stats()
+
+@api_router.get("/actors/{actor_id}/correlation")
+@response_cache.cached(tags=["actor-correlation"])
+async def get_actor_correlation(
+    actor_id: str,
+    window: str = Query("30d", description="Correlation window: 7d, 30d, 90d"),
+    limit: int = Query(20, ge=1, le=200),
+    threshold: float = Query(ACTOR_CLUSTER_THRESHOLD, ge=0, le=1, description="Minimum correlation linking a cluster"),
+):
+    """Actors whose net flows correlate most with one actor, and its cluster"""
+    row = actor_correlations.index.get(actor_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Actor not found")
+    state = await actor_correlations.ensure(actor_window(window))
+    cluster = []
+    if row < state.n:
+        roots = await actor_correlations.cluster_roots(window, threshold)
+        members = np.flatnonzero(roots == roots[row]).tolist()
+        cluster = [actor_correlations.ids[m] for m in members] if len(members) > 1 else []
+    return {
+        "actor": actor_correlations.actor(row),
+        "window": window,
+        "correlations": actor_correlations.partners(window, row, limit),
+        "cluster": cluster,
+        "version": state.version,
+        "computed_at": state.computed_ms,
+    }
+
+class SimulationRequest(BaseModel):
+    capital: float = Field(100_000, gt=0, description="Follower's starting cash in USD")
+    delay_hours: List[Annotated[int, Field(ge=0, le=2160)]] = Field([0], min_length=1, max_length=100, description="Entry delays to sweep")
+    slippage_bps: List[Annotated[float, Field(ge=0, le=10_000)]] = Field([10], min_length=1, max_length=100, description="Slippages to sweep")
+    sizing: Literal["fixed", "proportional"] = Field("fixed", description="fixed: size USD per trade; proportional: size times the actor's trade")
+    size: List[Annotated[float, Field(gt=0)]] = Field([1000], min_length=1, max_length=100, description="Position sizes to sweep")
+    background: bool = Field(False, description="Run as a job to poll even if the sweep is small")
+
+@api_router.post("/actors/{actor_id}/simulate")
+async def simulate_copy_trading(actor_id: str, body: SimulationRequest):
+    """Backtest copying an actor's trades over a parameter sweep; large sweeps become jobs"""
+    row = actor_correlations.index.get(actor_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Actor not found")
+    grid = parameter_grid(body.delay_hours, body.slippage_bps, body.sizing, body.size)
+    if len(grid) > SIMULATION_MAX_GRID:
+        raise HTTPException(status_code=400, detail=f"Sweep of {len(grid)} combinations exceeds {SIMULATION_MAX_GRID}")
+    actor = actor_correlations.actor(row)
+    if body.background or len(grid) > SIMULATION_SYNC_MAX:
+        job = await simulations.submit(row, actor, grid, body.capital)
+        return JSONResponse({"job": job.summary(), "poll": f"/api/simulations/{job.id}"}, status_code=202)
+    results = await simulations.run(row, actor["id"], grid, body.capital)
+    return {"actor": actor, "capital": body.capital, "results": results, "best": best_result(results)}
+
+@api_router.get("/simulations/stats")
+async def get_simulation_stats():
+    """Trade log size, worker pool, memo and job counters"""
+    return simulations.stats()
+
+@api_router.get("/simulations/{job_id}")
+async def get_simulation_job(job_id: str):
+    """Status of a simulation job, with its results once done"""
+    job = simulations.job(job_id)
+    if job is not None:
+        return job.summary()
+    # submitted to another worker
+    summary = await simulation_job_store.load(job_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Simulation job not found")
+    return summary
+
+class AlertRuleRequest(BaseModel):
+    kind: Literal["transfer", "netflow"] = "transfer"
+    token: Optional[str] = Field(None, max_length=20)
+    chain: Optional[str] = Field(None, max_length=30)
+    entity: Optional[str] = Field(None, max_length=100)
+    threshold: float = Field(..., description="transfer: minimum USD value; netflow: net flow level, negative for outflows")
+    window: Optional[str] = Field(None, description="netflow window: 1h, 24h")
+    cooldown_s: float = Field(60, ge=0, le=86_400, description="Quiet period after the rule fires")
+    owner: Optional[str] = Field(None, max_length=100)
+
+@api_router.post("/alerts/rules", status_code=201)
+async def create_alert_rule(body: AlertRuleRequest):
+    """Create an alert rule on transfers or an entity's net flow"""
+    try:
+        rule = alert_engine.add_rule({**body.model_dump(), "created_at": int(time.time() * 1000)})
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    try:
+        await alert_rule_store.insert(rule)
+    except Exception:
+        alert_engine.remove_rule(rule["id"])
+        raise
+    return rule
+
+@api_router.get("/alerts/rules")
+async def list_alert_rules(
+    owner: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Alert rules, oldest first, with their firing counters"""
+    return {"rules": alert_engine.list_rules(owner, limit)}
+
+@api_router.get("/alerts/rules/{rule_id}")
+async def get_alert_rule(rule_id: str):
+    """One alert rule with its firing counters"""
+    rule = alert_engine.rules.get(rule_id)
+    if rule is None:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    return alert_engine.describe(rule)
+
+@api_router.delete("/alerts/rules/{rule_id}")
+async def delete_alert_rule(rule_id: str):
+    """Delete an alert rule"""
+    if not alert_engine.remove_rule(rule_id):
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    await alert_rule_store.delete(rule_id)
+    return {"deleted": rule_id}
+
+@api_router.get("/alerts/notifications")
+async def get_alert_notifications(
+    after: int = Query(0, ge=0, description="Only notifications with a higher seq"),
+    owner: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Recent alert notifications, oldest first; poll with the last seq seen"""
+    found = alert_engine.recent(after, owner, limit)
+    return {"notifications": found, "last_seq": found[-1]["seq"] if found else after}
+
+@api_router.get("/alerts/stats")
+async def get_alert_stats():
+    """Rule index sizes and evaluation counters"""
+    return alert_engine.stats()
+
+@api_router.get("/search/stats")
+async def get_search_stats():
+    """Search index sizes and query count"""
+    return search_index.stats()
+
+@api_router.get("/checkpoints/stats")
+async def get_checkpoint_stats():
+    """Checkpoint writes and the last warm start"""
+    return checkpoints.stats()
+
+@api_router.get("/labels/stats")
+async def get_label_stats():
+    """Label index size and reload count"""
+    return labels.stats()
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Route, MongoDB and handler-span latency in Prometheus text format"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 @api_router.get("/market-stats")
+@response_cache.cached(tags=["market-stats"])
 async def get_market_stats():
     """Get market statistics"""
     return {
@@ -565,17 +1605,82 @@ async def get_market_stats():
 
 # ============ APP CONFIGURATION ============
 
-# Include the router in the main app
-app.include_router(api_router)
+def query_int(query, name, default):
+    """Integer query parameter for cost estimates; invalid values are left to validation"""
+    try:
+        return int(query.get(name, default))
+    except ValueError:
+        return default
+
+def transfers_cost(query):
+    """Listing cost grows with page size and with deep offset pages"""
+    cost = 2 + query_int(query, "limit", 15) / 10
+    return cost * 2 if query_int(query, "page", 1) > 1 and "cursor" not in query else cost
+
+def price_history_cost(query):
+    """Long periods and large point budgets cost more"""
+    cost = 5 if query.get("period", "ALL").upper() in ("ALL", "1Y") else 2
+    return cost + query_int(query, "max_points", DEFAULT_MAX_POINTS) / 1000
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
+def actor_matrix_cost(query):
+    """Matrix responses grow with the square of the actor count"""
+    return 2 + (query_int(query, "limit", 50) / 50) ** 2
+
+# Route class and token cost per route; cached and in-memory reads are cheap, None is exempt
+ADMISSION_POLICIES = {
+    "/api/": RoutePolicy("cheap"),
+    "/api/entities": RoutePolicy("cheap"),
+    "/api/market-stats": RoutePolicy("cheap"),
+    "/api/tokens": RoutePolicy("cheap"),
+    "/api/tokens/{token_id}": RoutePolicy("cheap"),
+    "/api/tokens/{token_id}/balance-changes": RoutePolicy("cheap"),
+    "/api/exchange-flows": RoutePolicy("cheap"),
+    "/api/tokens/{token_id}/open-interest": RoutePolicy("cheap", 2),
+    "/api/tokens/{token_id}/cex-volume": RoutePolicy("cheap", 2),
+    "/api/metrics": RoutePolicy("cheap"),
+    "/api/ingest/stats": RoutePolicy("cheap"),
+    "/api/coalesce/stats": RoutePolicy("cheap"),
+    "/api/cache/stats": RoutePolicy("cheap"),
+    "/api/checkpoints/stats": RoutePolicy("cheap"),
+    "/api/labels/stats": RoutePolicy("cheap"),
+    "/api/admission/stats": RoutePolicy("cheap"),
+    "/api/search": RoutePolicy("cheap"),
+    "/api/search/stats": RoutePolicy("cheap"),
+    "/api/actors/correlation/stats": RoutePolicy("cheap"),
+    "/api/actors/{actor_id}/correlation": RoutePolicy("standard", 2),
+    "/api/actors/correlation": RoutePolicy("standard", actor_matrix_cost),
+    "/api/actors/{actor_id}/simulate": RoutePolicy("heavy", 10),
+    "/api/simulations/{job_id}": RoutePolicy("cheap"),
+    "/api/simulations/stats": RoutePolicy("cheap"),
+    "/api/transfers/stream/stats": RoutePolicy("cheap"),
+    "/api/transfers/hot/stats": RoutePolicy("cheap"),
+    "/api/alerts/rules": RoutePolicy("standard", 2),
+    "/api/alerts/rules/{rule_id}": RoutePolicy("cheap"),
+    "/api/alerts/notifications": RoutePolicy("cheap"),
+    "/api/alerts/stats": RoutePolicy("cheap"),
+    "/api/tokens/{token_id}/holders": RoutePolicy("standard", 2),
+    "/api/labels/lookup": RoutePolicy("standard", 2),
+    "/api/transfers": RoutePolicy("heavy", transfers_cost),
+    "/api/tokens/{token_id}/transfers": RoutePolicy("heavy", transfers_cost),
+    "/api/tokens/{token_id}/price-history": RoutePolicy("heavy", price_history_cost),
+    "/api/tokens/dashboard": RoutePolicy("heavy", 20),
+    "/api/transfers/stream": None,  # long-lived SSE
+}
+ADMISSION_QUEUE_TARGET_MS = float(os.environ.get('ADMISSION_QUEUE_TARGET_MS', '50'))
+admission = AdmissionControl(
+    ADMISSION_POLICIES,
+    classes={
+        "cheap": (int(os.environ.get('ADMISSION_CHEAP_CONCURRENCY', '256')), ADMISSION_QUEUE_TARGET_MS),
+        "standard": (int(os.environ.get('ADMISSION_STANDARD_CONCURRENCY', '64')), ADMISSION_QUEUE_TARGET_MS),
+        "heavy": (int(os.environ.get('ADMISSION_HEAVY_CONCURRENCY', '16')), ADMISSION_QUEUE_TARGET_MS),
+    },
+    default=RoutePolicy("standard", 2),
+    rate=float(os.environ.get('ADMISSION_CLIENT_RATE', '50')),
+    burst=float(os.environ.get('ADMISSION_CLIENT_BURST', '200')),
+    # behind a proxy the peer is the proxy: key clients by the address it forwards
+    client_header=os.environ.get('ADMISSION_CLIENT_HEADER', 'x-forwarded-for'),
 )
+ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1') != '0'
 
 # Configure logging
 logging.basicConfig(
@@ -584,7 +1689,190 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    """Close MongoDB connection on shutdown"""
-    client.close()
+async def init_transfer_store():
+    """Create transfer indexes and seed an empty collection"""
+    await transfer_store.ensure_indexes()
+    if SEED_TRANSFERS and await transfer_store.estimated_count() == 0:
+        now_ms = int(time.time() * 1000)
+        for chunk in synthetic_transfers(SEED_RANDOM).chunks(SEED_TRANSFERS, now_ms - 86_400_000, now_ms):
+            await transfer_store.insert_many(to_documents(chunk))
+        logger.info("Seeded %d transfers", SEED_TRANSFERS)
+
+async def warm_hot_tier(app):
+    """Load the newest stored transfers into the hot tier, oldest first"""
+    if hot_tier is None:
+        return
+    started = time.perf_counter()
+    loaded_ms = int(time.time() * 1000)
+    since = -1
+    oldest = await transfer_store.nth_newest(hot_tier.capacity)
+    if oldest:
+        hot_tier.exclude_before(
+            oldest["ts"],
+            await transfer_store.max_before("usd_raw", oldest["ts"]),
+            await transfer_store.max_before("value", oldest["ts"]),
+        )
+        since = oldest["ts"] - 1
+    async for batch in transfer_store.iter_since(since):
+        hot_tier.add(batch)
+    logger.info("Loaded %d transfers into the hot tier in %.0f ms", len(hot_tier), (time.perf_counter() - started) * 1000)
+    if HOT_TIER_SYNC_SECONDS <= 0:
+        # no heartbeat: other workers may be writing, so only pages older than the load are trusted
+        hot_tier.settle(True, loaded_ms - HOT_TIER_SYNC_LAG_MS)
+        return
+    others = await writers.beat()
+    hot_tier.settle(others > 0, loaded_ms - HOT_TIER_SYNC_LAG_MS)
+    app.state.hot_tier_sync = asyncio.create_task(run_hot_tier_sync(HOT_TIER_SYNC_SECONDS))
+    if others:
+        # workers that still believe they write alone notice this one within a sync interval
+        await asyncio.sleep(2 * HOT_TIER_SYNC_SECONDS)
+
+async def load_labels(app):
+    """Map the label index, writing the built-in label file on first run"""
+    if not os.path.exists(LABELS_PATH):
+        write_label_file(LABELS_PATH, default_label_records())
+    labels.load()
+    logger.info("Loaded label index (%d addresses)", len(labels.index))
+    if LABELS_RELOAD_SECONDS > 0:
+        app.state.label_reloader = asyncio.create_task(run_label_reloader(LABELS_RELOAD_SECONDS))
+
+async def load_alert_rules(app):
+    """Index every stored alert rule"""
+    await alert_rule_store.ensure_indexes()
+    for rule in await alert_rule_store.load():
+        try:
+            alert_engine.add_rule(rule)
+        except ValueError:
+            logger.warning("Skipping invalid alert rule %s", rule["id"])
+    logger.info("Loaded %d alert rules", len(alert_engine.rules))
+    if ALERT_RULES_RELOAD_SECONDS > 0:
+        app.state.alert_rule_reloader = asyncio.create_task(run_alert_rule_reloader(ALERT_RULES_RELOAD_SECONDS))
+
+async def load_analytics_state():
+    """Restore the newest checkpoint (or seed holders), then replay newer stored transfers"""
+    started = time.perf_counter()
+    checkpoint = checkpoints.latest(checkpoint_schema()) if CHECKPOINT_SECONDS > 0 else None
+    components = None
+    if checkpoint:
+        try:
+            components = {name: checkpoint.component(name) for name in checkpoint.manifest["components"]}
+        except (OSError, ValueError, KeyError):
+            logger.exception("Ignoring unreadable checkpoint %s", checkpoint.path)
+    if components:
+        restore_analytics_state(components)
+        checkpoints.restored_from = checkpoint.path
+        logger.info("Restored checkpoint %s (%.0fs old)", checkpoint.path, checkpoint.age_s)
+    else:
+        seed_holder_ledger()
+    replayed = 0
+    async for batch in transfer_store.iter_since(replay_watermark.replay_since()):
+        batch = replay_watermark.fresh(batch)
+        apply_transfer_batch(batch)
+        alert_engine.evaluate(batch, notify=False)
+        replayed += len(batch)
+    replay_watermark.skip.clear()
+    checkpoints.replayed = replayed
+    checkpoints.warm_start_ms = (time.perf_counter() - started) * 1000
+    logger.info("Replayed %d transfers into analytics state in %.0f ms", replayed, checkpoints.warm_start_ms)
+
+async def start_ingestion(app):
+    """Start the batch writer and, if enabled, the synthetic feeder"""
+    ingest.add_listener(lambda batch: transfer_stream.publish_batch(batch, format_transfer))
+    ingest.add_listener(apply_transfer_batch)
+    if hot_tier is not None:
+        ingest.add_listener(hot_tier.add)
+    ingest.add_listener(alert_engine.evaluate)
+    # cached flows live for their TTL, or until a window moves to a new bucket
+    exchange_flows.on_rotate = lambda: response_cache.invalidate("exchange-flows")
+    ingest.start()
+    if FEED_RATE > 0:
+        app.state.feeder = asyncio.create_task(run_transfer_feeder(ingest, FEED_RATE))
+    app.state.market_sampler = asyncio.create_task(run_market_sampler(MINUTE_MS / 1000))
+
+async def stop_ingestion(app):
+    """Stop feeding and flush queued transfers"""
+    for name in (
+        "feeder", "label_reloader", "refdata_reloader", "market_sampler", "checkpointer", "actor_refresher", "hot_tier_sync",
+        "alert_rule_reloader",
+    ):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    simulations.close()
+    await ingest.stop()
+    if hot_tier is not None and HOT_TIER_SYNC_SECONDS > 0:
+        await writers.leave()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open this worker's MongoDB pool and background tasks; flush and close on shutdown"""
+    app.state.mongo = AsyncIOMotorClient(
+        mongo_url,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        event_listeners=[MongoCommandMetrics(metrics_registry)],
+    )
+    transfer_store.bind(app.state.mongo[os.environ['DB_NAME']].transfers)
+    alert_rule_store.bind(app.state.mongo[os.environ['DB_NAME']].alert_rules)
+    writers.bind(app.state.mongo[os.environ['DB_NAME']].writers)
+    simulation_job_store.bind(app.state.mongo[os.environ['DB_NAME']].simulation_jobs)
+    ready = False
+    try:
+        await init_transfer_store()
+        await warm_hot_tier(app)
+        await load_labels(app)
+        await load_alert_rules(app)
+        await simulation_job_store.ensure_indexes()
+        index_reference_data()
+        index_labels()
+        await load_analytics_state()
+        await start_ingestion(app)
+        if REFDATA_RELOAD_SECONDS > 0:
+            app.state.refdata_reloader = asyncio.create_task(run_refdata_reloader(REFDATA_RELOAD_SECONDS))
+        if CHECKPOINT_SECONDS > 0:
+            app.state.checkpointer = asyncio.create_task(run_checkpointer(CHECKPOINT_SECONDS))
+        if ACTOR_REFRESH_SECONDS > 0:
+            app.state.actor_refresher = asyncio.create_task(run_actor_refresher(ACTOR_REFRESH_SECONDS))
+        ready = True
+        yield
+    finally:
+        await stop_ingestion(app)
+        if ready and CHECKPOINT_SECONDS > 0:
+            # everything queued has been written and applied: a clean restart replays nothing
+            await save_checkpoint()
+        app.state.mongo.close()
+
+def create_app() -> FastAPI:
+    """Build the API app (``uvicorn --factory server:create_app``); one per process"""
+    app = FastAPI(
+        title="Flow Intel Analytics API",
+        description="On-chain analytics platform for tracking liquidity movements",
+        version="2.0.0",
+        lifespan=lifespan,
+    )
+
+    # Include the router in the main app
+    app.include_router(api_router)
+
+    # Per-client token buckets and per-route-class concurrency with load shedding
+    if ADMISSION_ENABLED:
+        app.add_middleware(AdmissionMiddleware, control=admission, routes=app.routes)
+
+    # Per-route latency histograms and slow-request log
+    app.add_middleware(
+        MetricsMiddleware,
+        routes=app.routes,
+        slow_request_ms=float(os.environ.get('SLOW_REQUEST_MS', '500')),
+    )
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+app = create_app()
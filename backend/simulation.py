@@ -0,0 +1,497 @@
+"""
+Copy-Trading Simulation
+=======================
+What-if backtests of following an actor's trades: given the actor's
+trade history, what would a follower have made copying it with an entry
+delay, slippage and a position-sizing rule?
+
+An actor's trades are the legs of its labeled transfers (see
+``ActorCorrelationEngine.add_batch``): receiving a token is a buy,
+sending it a sell, both worth the transfer's USD value. They are kept in
+a columnar ring (``TradeLog``) as interned token codes and numeric
+arrays.
+
+One backtest is vectorized over the whole history:
+
+1. Each trade is copied ``delay_hours`` later at the close of the hourly
+   bar then current, filled ``slippage_bps`` worse (buys higher, sells
+   lower). Trades whose copy time is still in the future are pending;
+   trades without a price are unpriced.
+2. The follower trades a fixed USD amount per trade (``fixed``) or a
+   fraction of the actor's trade (``proportional``), and never sells more
+   than it holds: per token, holdings are the running sum of desired
+   quantities floored at zero, ``S - min(0, cummin(S))``.
+3. Cash and holdings are accumulated per hour and marked to the hourly
+   closes, giving the equity curve, P&L, ROI and maximum drawdown.
+
+Sweeps over many parameter combinations are split into chunks that run in
+a process pool, never on the event loop. Results are memoized per
+(actor, capital, parameters, data version), where the data version covers
+the actor's trade count, the price series it touches and the current
+hour. Large sweeps run as background jobs that clients poll. Job status
+and results are also written to MongoDB (``SimulationJobStore``), so any
+worker can answer the poll.
+"""
+
+import asyncio
+import datetime
+import itertools
+import math
+import multiprocessing
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+HOUR_MS = 3_600_000
+
+SIZING = ("fixed", "proportional")
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class SimParams(NamedTuple):
+    """One parameter combination of a copy-trading backtest."""
+
+    delay_hours: int
+    slippage_bps: float
+    sizing: str  # "fixed": ``size`` USD per trade; "proportional": ``size`` times the actor's trade
+    size: float
+
+
+class ActorTrades(NamedTuple):
+    """An actor's trades in time order, with the hourly closes of the tokens they touch."""
+
+    token: np.ndarray  # index into ``prices``
+    ts: np.ndarray
+    usd: np.ndarray  # signed: positive is a buy
+    prices: List[Optional[Tuple[np.ndarray, np.ndarray]]]  # (bar ts, close) per token, None if unpriced
+
+
+def parameter_grid(delays: Sequence[int], slippages: Sequence[float], sizing: str,
+                   sizes: Sequence[float]) -> List[SimParams]:
+    """Every combination of the given delays, slippages and sizes, duplicates removed."""
+    combos = itertools.product(dict.fromkeys(delays), dict.fromkeys(slippages), dict.fromkeys(sizes))
+    return [SimParams(int(delay), float(slippage), sizing, float(size)) for delay, slippage, size in combos]
+
+
+def backtest(trades: ActorTrades, params: SimParams, capital: float, now_ms: int) -> Dict[str, Any]:
+    """Follower equity and trade counts for one parameter combination."""
+    exec_ts = trades.ts + params.delay_hours * HOUR_MS
+    due = exec_ts <= now_ms
+    price = np.full(len(exec_ts), np.nan)
+    for code, series in enumerate(trades.prices):
+        if series is None:
+            continue
+        at = np.flatnonzero((trades.token == code) & due)
+        bar = np.searchsorted(series[0], exec_ts[at], side="right") - 1
+        known = bar >= 0
+        price[at[known]] = series[1][bar[known]]
+    priced = ~np.isnan(price)
+
+    if params.sizing == "fixed":
+        target = np.sign(trades.usd) * params.size
+    else:
+        target = trades.usd * params.size
+    wanted = np.divide(target, price, out=np.zeros_like(price), where=priced)
+
+    # trades are in time order, so per token the running sum of desired
+    # quantities floored at zero is what the follower holds after each trade
+    executed = np.zeros_like(wanted)
+    for code in range(len(trades.prices)):
+        at = np.flatnonzero((trades.token == code) & priced)
+        if len(at):
+            running = np.cumsum(wanted[at])
+            held = running - np.minimum(np.minimum.accumulate(running), 0.0)
+            executed[at] = np.diff(held, prepend=0.0)
+    filled = executed != 0
+    slip = params.slippage_bps / 10_000
+    fill = np.where(filled, price, 0.0) * (1 + slip * np.sign(executed))
+    cash_flow = -executed * fill
+
+    result = {
+        **params._asdict(),
+        "trades": int(np.count_nonzero(filled)),
+        "skipped": int(np.count_nonzero(priced & ~filled)),
+        "pending": int(np.count_nonzero(~due)),
+        "unpriced": int(np.count_nonzero(due & ~priced)),
+    }
+    if not filled.any():
+        return {**result, "final_equity": capital, "pnl": 0.0, "roi": 0.0, "max_drawdown": 0.0,
+                "peak_deployed": 0.0, "slippage_cost": 0.0}
+
+    # hourly equity from the first filled bar to now
+    start = int(exec_ts[filled].min()) // HOUR_MS
+    hours = now_ms // HOUR_MS - start + 1
+    bar_of = exec_ts // HOUR_MS - start
+    grid = (start + np.arange(hours, dtype=np.int64)) * HOUR_MS
+    cash = capital + np.cumsum(np.bincount(bar_of[filled], weights=cash_flow[filled], minlength=hours))
+    equity = cash.copy()
+    for code, series in enumerate(trades.prices):
+        at = np.flatnonzero((trades.token == code) & filled)
+        if len(at):
+            held = np.cumsum(np.bincount(bar_of[at], weights=executed[at], minlength=hours))
+            bar = np.maximum(np.searchsorted(series[0], grid, side="right") - 1, 0)
+            equity += held * series[1][bar]
+
+    peak = np.maximum.accumulate(equity)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        drawdown = np.where(peak > 0, (peak - equity) / peak, 0.0)
+    final = float(equity[-1])
+    return {
+        **result,
+        "final_equity": round(final, 2),
+        "pnl": round(final - capital, 2),
+        "roi": round((final - capital) / capital, 6),
+        "max_drawdown": round(float(drawdown.max()), 6),
+        "peak_deployed": round(float(max(0.0, (capital - cash).max())), 2),
+        "slippage_cost": round(float(np.abs(executed * price)[filled].sum() * slip), 2),
+    }
+
+
+def run_sweep(trades: ActorTrades, grid: Sequence[SimParams], capital: float, now_ms: int) -> List[Dict[str, Any]]:
+    """Backtest every combination in ``grid``; the unit of work sent to pool processes."""
+    return [backtest(trades, params, capital, now_ms) for params in grid]
+
+
+class TradeLog:
+    """Ring of the most recent ``capacity`` actor trades as parallel arrays."""
+
+    def __init__(self, capacity: int = 1_000_000):
+        self.capacity = capacity
+        self.actor = np.full(capacity, -1, dtype=np.int32)
+        self.token = np.zeros(capacity, dtype=np.int16)
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.usd = np.zeros(capacity)
+        self.written = 0  # trades ever appended; the next slot is ``written % capacity``
+        self.tokens: List[str] = []
+        self.token_index: Dict[str, int] = {}
+        self.counts = np.zeros(0, dtype=np.int64)  # trades ever appended per actor
+
+    def _code(self, token: str) -> int:
+        code = self.token_index.get(token)
+        if code is None:
+            code = self.token_index[token] = len(self.tokens)
+            self.tokens.append(token)
+        return code
+
+    def add(self, rows: np.ndarray, tokens: Sequence[str], ts: np.ndarray, usd: np.ndarray):
+        """Append trades: actor rows, token symbols, times and signed USD amounts."""
+        n = len(rows)
+        if not n:
+            return
+        if n > self.capacity:
+            rows, tokens, ts, usd = rows[-self.capacity:], tokens[-self.capacity:], ts[-self.capacity:], usd[-self.capacity:]
+            self.written += n - self.capacity
+            n = self.capacity
+        slots = (self.written + np.arange(n)) % self.capacity
+        self.actor[slots] = rows
+        self.token[slots] = [self._code(token) for token in tokens]
+        self.ts[slots] = ts
+        self.usd[slots] = usd
+        self.written += n
+        top = int(rows.max()) + 1
+        if top > len(self.counts):
+            self.counts = np.concatenate([self.counts, np.zeros(top - len(self.counts), dtype=np.int64)])
+        np.add.at(self.counts, rows, 1)
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def version(self, row: int) -> int:
+        """Trades ever appended for ``row``; changes whenever its history does."""
+        return int(self.counts[row]) if row < len(self.counts) else 0
+
+    def of(self, row: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Token codes, times and USD amounts of one actor's retained trades, oldest first."""
+        at = np.flatnonzero(self.actor[:len(self)] == row)
+        at = at[np.argsort(self.ts[at], kind="stable")]
+        return self.token[at], self.ts[at], self.usd[at]
+
+    def _ordered(self) -> np.ndarray:
+        """Slots of retained trades, oldest appended first."""
+        n = len(self)
+        return (self.written - n + np.arange(n)) % self.capacity
+
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """Retained trades in append order, for a checkpoint."""
+        at = self._ordered()
+        arrays = {"actor": self.actor[at], "token": self.token[at], "ts": self.ts[at], "usd": self.usd[at]}
+        return arrays, {"tokens": list(self.tokens)}
+
+    def import_state(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        """Replace the log with trades saved by ``export_state``."""
+        self.actor[:] = -1
+        self.written = 0
+        self.tokens, self.token_index = [], {}
+        self.counts = np.zeros(0, dtype=np.int64)
+        tokens = np.array(meta["tokens"], dtype=object)
+        self.add(arrays["actor"], tokens[arrays["token"]].tolist(), arrays["ts"], arrays["usd"])
+
+    def stats(self) -> Dict[str, Any]:
+        """Retained and total trades."""
+        return {"trades": len(self), "capacity": self.capacity, "written": self.written, "tokens": len(self.tokens)}
+
+
+class SimulationJob:
+    """A sweep running in the background and its results once finished."""
+
+    def __init__(self, actor: Dict[str, Any], capital: float, total: int):
+        self.id = uuid.uuid4().hex
+        self.actor = actor
+        self.capital = capital
+        self.total = total
+        self.completed = 0
+        self.status = JOB_QUEUED
+        self.created_ms = int(time.time() * 1000)
+        self.finished_ms: Optional[int] = None
+        self.results: Optional[List[Dict[str, Any]]] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def summary(self) -> Dict[str, Any]:
+        """Status and progress; results once done."""
+        out = {
+            "id": self.id,
+            "status": self.status,
+            "actor": self.actor,
+            "capital": self.capital,
+            "total": self.total,
+            "completed": self.completed,
+            "created_at": self.created_ms,
+            "finished_at": self.finished_ms,
+        }
+        if self.results is not None:
+            out["results"] = self.results
+            out["best"] = best_result(self.results)
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class SimulationJobStore:
+    """Job summaries in a MongoDB collection, for polls answered by another worker."""
+
+    def __init__(self, collection=None, ttl_s: int = 86_400):
+        self.collection = collection
+        self.ttl_s = ttl_s
+
+    def bind(self, collection):
+        """Use ``collection``, e.g. once the app has opened its Mongo client."""
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        """Expire jobs ``ttl_s`` after they were last written."""
+        await self.collection.create_index("stored_at", expireAfterSeconds=self.ttl_s)
+
+    async def save(self, job: SimulationJob):
+        """Store a job's summary under its id."""
+        doc = {k: v for k, v in job.summary().items() if k != "id"}
+        doc["stored_at"] = datetime.datetime.now(datetime.timezone.utc)
+        await self.collection.replace_one({"_id": job.id}, doc, upsert=True)
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """A stored job summary, or None."""
+        doc = await self.collection.find_one({"_id": job_id}, {"stored_at": 0})
+        if doc is None:
+            return None
+        return {"id": doc.pop("_id"), **doc}
+
+
+def best_result(results: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The combination with the highest ROI."""
+    return max(results, key=lambda r: r["roi"]) if results else None
+
+
+class SimulationEngine:
+    """Memoized copy-trading backtests run in a process pool, inline or as polled jobs."""
+
+    def __init__(
+        self,
+        trades: TradeLog,
+        prices: Callable[[str], Optional[Any]],
+        workers: int = 4,
+        cache_size: int = 4096,
+        max_jobs: int = 256,
+        job_store: Optional[SimulationJobStore] = None,
+    ):
+        """
+        ``prices`` maps a token symbol to its hourly price series (an object
+        with ``ts``, ``close`` and ``version``) or None. With ``workers`` 0
+        backtests run in a thread instead of worker processes. Jobs are
+        written to ``job_store`` when they start and finish.
+        """
+        self.trades = trades
+        self.prices = prices
+        self.workers = workers
+        self.cache_size = cache_size
+        self.max_jobs = max_jobs
+        self.job_store = job_store
+        self._pool: Optional[Executor] = None
+        self._cache: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self.jobs: "OrderedDict[str, SimulationJob]" = OrderedDict()
+
+        self.runs = 0
+        self.backtests = 0
+        self.cache_hits = 0
+        self.chunks = 0
+        self.store_errors = 0
+
+    def _executor(self) -> Optional[Executor]:
+        """Worker processes, started on first use (None: the default thread pool)."""
+        if self.workers <= 0:
+            return None
+        if self._pool is None:
+            # spawned, not forked: the server process runs threads and an event loop
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def inputs(self, row: int, now_ms: int) -> Tuple[ActorTrades, Hashable]:
+        """An actor's trades with the price series they need, and the data version they reflect."""
+        codes, ts, usd = self.trades.of(row)
+        used, local = np.unique(codes, return_inverse=True)
+        start = int(ts[0]) - HOUR_MS if len(ts) else now_ms
+        prices, versions = [], []
+        for code in used.tolist():
+            series = self.prices(self.trades.tokens[code])
+            if series is None:
+                prices.append(None)
+                versions.append(None)
+                continue
+            first = max(int(np.searchsorted(series.ts, start, side="right")) - 1, 0)
+            prices.append((series.ts[first:], series.close[first:]))
+            versions.append(series.version)
+        version = (self.trades.version(row), tuple(versions), now_ms // HOUR_MS)
+        return ActorTrades(local.astype(np.int16), ts, usd, prices), version
+
+    def _remember(self, key: Hashable, result: Dict[str, Any]):
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def run(
+        self,
+        row: int,
+        actor_key: str,
+        grid: Sequence[SimParams],
+        capital: float,
+        job: Optional[SimulationJob] = None,
+    ) -> List[Dict[str, Any]]:
+        """Results for every combination in ``grid``, in order, computing only those not memoized."""
+        self.runs += 1
+        now_ms = int(time.time() * 1000)
+        trades, version = self.inputs(row, now_ms)
+        keys = [(actor_key, capital, params, version) for params in grid]
+        results: List[Optional[Dict[str, Any]]] = []
+        for key in keys:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+            results.append(cached)
+        missing = [i for i, result in enumerate(results) if result is None]
+        if job:
+            job.completed = len(grid) - len(missing)
+
+        if missing:
+            loop = asyncio.get_running_loop()
+            executor = self._executor()
+            parts = max(1, self.workers) * 4
+            size = max(1, min(64, math.ceil(len(missing) / parts)))
+            chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+
+            async def compute(chunk):
+                found = await loop.run_in_executor(
+                    executor, run_sweep, trades, [grid[i] for i in chunk], capital, now_ms
+                )
+                for i, result in zip(chunk, found):
+                    results[i] = result
+                    self._remember(keys[i], result)
+                self.chunks += 1
+                self.backtests += len(chunk)
+                if job:
+                    job.completed += len(chunk)
+
+            await asyncio.gather(*(compute(chunk) for chunk in chunks))
+        return results
+
+    # ---- background jobs ----
+
+    async def submit(self, row: int, actor: Dict[str, Any], grid: Sequence[SimParams],
+                     capital: float) -> SimulationJob:
+        """Start a sweep in the background; poll it with ``job``, or ``job_store`` from any worker."""
+        self._prune()
+        job = SimulationJob(actor, capital, len(grid))
+        if self.job_store is not None:
+            await self.job_store.save(job)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run_job(job, row, grid))
+        return job
+
+    async def _store(self, job: SimulationJob):
+        """Write a job's progress; a failed write only leaves other workers' view behind."""
+        if self.job_store is None:
+            return
+        try:
+            await self.job_store.save(job)
+        except Exception:
+            self.store_errors += 1
+
+    async def _run_job(self, job: SimulationJob, row: int, grid: Sequence[SimParams]):
+        job.status = JOB_RUNNING
+        await self._store(job)
+        try:
+            job.results = await self.run(row, job.actor["id"], grid, job.capital, job)
+            job.status = JOB_DONE
+        except asyncio.CancelledError:
+            job.status, job.error = JOB_FAILED, "cancelled"
+            raise
+        except Exception as exc:  # reported to the client that polls the job
+            job.status, job.error = JOB_FAILED, f"{type(exc).__name__}: {exc}"
+        finally:
+            job.finished_ms = int(time.time() * 1000)
+            job.task = None
+        await self._store(job)
+
+    def job(self, job_id: str) -> Optional[SimulationJob]:
+        """A job submitted to this worker, until it is pruned."""
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond ``max_jobs``."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_ms is not None]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_jobs + 1)]:
+            del self.jobs[job_id]
+
+    def close(self):
+        """Cancel running jobs and stop the worker processes."""
+        for job in self.jobs.values():
+            if job.task:
+                job.task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Trade log size, pool, memo and job counters."""
+        status = {}
+        for job in self.jobs.values():
+            status[job.status] = status.get(job.status, 0) + 1
+        return {
+            "trade_log": self.trades.stats(),
+            "workers": self.workers,
+            "pool_started": self._pool is not None,
+            "runs": self.runs,
+            "backtests": self.backtests,
+            "chunks": self.chunks,
+            "cache_hits": self.cache_hits,
+            "cached": len(self._cache),
+            "jobs": status,
+            "store_errors": self.store_errors,
+        }
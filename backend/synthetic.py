@@ -0,0 +1,229 @@
+"""
+Synthetic Transfers
+===================
+Seeded, vectorized generator of realistic transfers for seeding and load tests.
+
+Every column is drawn as one NumPy array per chunk, so generating a
+million transfers takes a fraction of a second. Chunks are seeded from
+``(seed, chunk index)``, which makes any chunk reproducible on its own and
+lets large datasets be produced in pieces.
+
+- USD sizes are Pareto-distributed (many small transfers, a few huge ones)
+  and converted to token amounts with each token's reference price.
+- Tokens are drawn in proportion to their trading volume.
+- Exchange-tagged sides use the same labeled wallets as the live feed; the
+  other side comes from a fixed pool of addresses with skewed
+  popularity, so balances and rankings look like real holder sets.
+
+Output is either stored-transfer documents (for ``insert_many``) or
+columnar files (Parquet/Arrow when pyarrow is installed, else ``.npz``).
+"""
+
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+# Direction probabilities: inflow to an exchange, outflow, internal move, unlabeled
+DIRECTION_WEIGHTS = (0.3, 0.3, 0.1, 0.3)
+INFLOW, OUTFLOW, INTERNAL, UNLABELED = range(4)
+
+PARETO_ALPHA = 1.16  # the "80/20" tail
+MIN_USD = 50.0
+MAX_USD = 2e9
+ADDRESS_POOL = 250_000
+
+_HEX = np.array([f"{i:02x}".encode() for i in range(256)], dtype="S2")
+
+
+def hex_strings(raw: np.ndarray, prefix: bytes = b"") -> np.ndarray:
+    """ASCII hex (``S`` dtype) for a ``(n, k)`` uint8 array, in one vectorized pass."""
+    n, k = raw.shape
+    digits = _HEX[raw]
+    if prefix:
+        digits = np.concatenate([np.full((n, 1), prefix, dtype="S2"), digits], axis=1)
+    width = digits.shape[1] * 2
+    return np.ascontiguousarray(digits).view(f"S{width}").reshape(n)
+
+
+class TransferGenerator:
+    """Reproducible bulk transfers for a fixed token, chain and wallet universe."""
+
+    def __init__(
+        self,
+        seed: int,
+        tokens: Dict[str, Tuple[float, float]],
+        chains: Sequence[str],
+        exchange_labels: Sequence[Tuple[str, str]],
+        wallets: Dict[str, Sequence[str]],
+        address_pool: int = ADDRESS_POOL,
+    ):
+        """
+        ``tokens`` maps symbol -> (USD price, relative volume weight);
+        ``exchange_labels`` are (deposit label, hot-wallet label) pairs and
+        ``wallets`` the addresses carrying each label.
+        """
+        self.seed = seed
+        self.symbols = np.array(list(tokens), dtype="S")
+        self.prices = np.array([price for price, _ in tokens.values()])
+        weights = np.array([weight for _, weight in tokens.values()], dtype=np.float64)
+        self.token_p = weights / weights.sum()
+        self.chains = np.array(list(chains), dtype="S")
+
+        self.labels = np.array([label for pair in exchange_labels for label in pair] + [None], dtype=object)
+        self.deposit_idx = np.arange(0, 2 * len(exchange_labels), 2)
+        self.hot_idx = self.deposit_idx + 1
+        # wallets of every label in one table, addressed by (offset, count) per label
+        table, offsets, counts = [], [], []
+        for label in self.labels[:-1]:
+            offsets.append(len(table))
+            counts.append(len(wallets[label]))
+            table.extend(wallets[label])
+        self.wallet_table = np.array(table, dtype="S42")
+        self.wallet_offset = np.array(offsets + [0])
+        self.wallet_count = np.array(counts + [1])
+
+        pool_rng = np.random.default_rng([seed, 2**32 - 1])
+        self.pool = hex_strings(pool_rng.integers(0, 256, (address_pool, 20), dtype=np.uint8), b"0x")
+
+    def _side_addresses(self, rng, label_idx: np.ndarray) -> np.ndarray:
+        """Labeled wallets where ``label_idx`` names a label, pool addresses elsewhere."""
+        n = len(label_idx)
+        # skewed towards low pool indexes: a few very active addresses, a long tail
+        out = self.pool[(rng.random(n) ** 3 * len(self.pool)).astype(np.int64)]
+        labeled = label_idx < len(self.labels) - 1
+        if labeled.any():
+            idx = label_idx[labeled]
+            pick = self.wallet_offset[idx] + (rng.random(len(idx)) * self.wallet_count[idx]).astype(np.int64)
+            out[labeled] = self.wallet_table[pick]
+        return out
+
+    def columns(self, n: int, start_ms: int, end_ms: int, chunk: int = 0) -> Dict[str, np.ndarray]:
+        """One chunk of ``n`` transfers between ``start_ms`` and ``end_ms`` as columns."""
+        rng = np.random.default_rng([self.seed, chunk])
+        ts = np.sort(rng.integers(start_ms, end_ms, n, dtype=np.int64))
+        token = rng.choice(len(self.symbols), n, p=self.token_p)
+        usd = np.minimum(MIN_USD * (1 + rng.pareto(PARETO_ALPHA, n)), MAX_USD)
+        value = np.round(usd / self.prices[token], 6)
+
+        none = len(self.labels) - 1
+        direction = rng.choice(4, n, p=DIRECTION_WEIGHTS)
+        exchange = rng.integers(0, len(self.deposit_idx), n)
+        deposit, hot = self.deposit_idx[exchange], self.hot_idx[exchange]
+        from_label = np.select([direction == OUTFLOW, direction == INTERNAL], [hot, deposit], none)
+        to_label = np.select([direction == INFLOW, direction == INTERNAL], [deposit, hot], none)
+
+        return {
+            "_id": hex_strings(rng.integers(0, 256, (n, 16), dtype=np.uint8)),
+            "ts": ts,
+            "chain": self.chains[rng.integers(0, len(self.chains), n)],
+            "token": self.symbols[token],
+            "from_address": self._side_addresses(rng, from_label),
+            "from_label": self.labels[from_label],
+            "to_address": self._side_addresses(rng, to_label),
+            "to_label": self.labels[to_label],
+            "value": value,
+            "usd_raw": usd,
+        }
+
+    def chunks(self, total: int, start_ms: int, end_ms: int, chunk_size: int = 100_000) -> Iterator[Dict[str, np.ndarray]]:
+        """``total`` transfers in chunks, each covering its own slice of the time range."""
+        chunks = max(1, -(-total // chunk_size))
+        span = (end_ms - start_ms) / chunks
+        for i in range(chunks):
+            n = min(chunk_size, total - i * chunk_size)
+            lo = start_ms + int(i * span)
+            yield self.columns(n, lo, max(lo + 1, start_ms + int((i + 1) * span)), chunk=i)
+
+    def documents(self, n: int, start_ms: int, end_ms: int, chunk: int = 0) -> List[Dict]:
+        """One chunk as stored-transfer documents."""
+        return to_documents(self.columns(n, start_ms, end_ms, chunk))
+
+
+def _as_text(col: np.ndarray) -> np.ndarray:
+    """ASCII byte-string columns as ``str``; other columns unchanged."""
+    return col.astype(f"U{col.dtype.itemsize}") if col.dtype.kind == "S" else col
+
+
+def to_documents(columns: Dict[str, np.ndarray]) -> List[Dict]:
+    """Stored-transfer documents from a column chunk."""
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(_as_text(columns[name]).tolist() for name in names))]
+
+
+def write_columns(path: str, chunks: Iterator[Dict[str, np.ndarray]]) -> int:
+    """
+    Write chunks to ``path``: Parquet for ``.parquet``, Arrow IPC for
+    ``.arrow``, otherwise one ``.npz`` per chunk. Returns the row count.
+    """
+    if path.endswith((".parquet", ".arrow")):
+        import pyarrow as pa
+
+        writer, rows = None, 0
+        try:
+            for chunk in chunks:
+                table = pa.table({
+                    name: pa.array(col.tolist(), type=pa.string()) if col.dtype == object
+                    else pa.array(col).cast(pa.string()) if col.dtype.kind == "S" else col
+                    for name, col in chunk.items()
+                })
+                if writer is None:
+                    if path.endswith(".parquet"):
+                        import pyarrow.parquet as pq
+                        writer = pq.ParquetWriter(path, table.schema)
+                    else:
+                        writer = pa.ipc.new_file(path, table.schema)
+                writer.write_table(table)
+                rows += table.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+
+    rows = 0
+    base = path[:-4] if path.endswith(".npz") else path
+    for i, chunk in enumerate(chunks):
+        # npz has no nulls: missing labels are stored as empty strings
+        arrays = {
+            name: np.where(col == None, "", col).astype("S") if col.dtype == object else col  # noqa: E711
+            for name, col in chunk.items()
+        }
+        np.savez(f"{base}-{i:05d}.npz", **arrays)
+        rows += len(chunk["ts"])
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate synthetic transfers into MongoDB or columnar files")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=float, default=30, help="spread transfers over the last N days")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--out", help="write .parquet/.arrow/.npz instead of inserting into MongoDB")
+    args = parser.parse_args()
+
+    from server import synthetic_transfers
+
+    generator = synthetic_transfers(args.seed)
+    end_ms = int(time.time() * 1000)
+    chunks = generator.chunks(args.count, end_ms - int(args.days * 86_400_000), end_ms, args.chunk_size)
+    started = time.perf_counter()
+    if args.out:
+        rows = write_columns(args.out, chunks)
+    else:
+        from pymongo import MongoClient
+
+        from transfer_store import TRANSFER_INDEXES
+
+        collection = MongoClient(os.environ["MONGO_URL"])[os.environ["DB_NAME"]].transfers
+        rows = 0
+        for chunk in chunks:
+            docs = to_documents(chunk)
+            collection.insert_many(docs, ordered=False)
+            rows += len(docs)
+        collection.create_indexes(TRANSFER_INDEXES)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {rows} transfers in {elapsed:.1f}s ({rows / elapsed:,.0f}/s)")
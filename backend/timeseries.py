@@ -0,0 +1,210 @@
+"""
+Time-Series Rollups
+===================
+Minute-resolution samples with incrementally maintained hour and day rollups.
+
+Every series (token, exchange, metric) keeps one fixed-size ring per
+resolution. Recording a sample updates the matching bucket in all three
+rings, so rollups are always current without re-aggregating raw data.
+A query picks the finest resolution whose point count for the requested
+period fits the ``max_points`` budget (and whose ring still covers the
+period), then merges adjacent buckets only if even that is too many.
+
+Flow metrics (volume) are summed into buckets; level metrics (open
+interest) keep the last sample of each bucket.
+"""
+
+from typing import Dict, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+MINUTE_MS = 60_000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+# (name, bucket width, ring length): 2 days of minutes, 90 days of hours, 3 years of days
+RESOLUTIONS = [
+    ("minute", MINUTE_MS, 2 * 24 * 60),
+    ("hour", HOUR_MS, 90 * 24),
+    ("day", DAY_MS, 3 * 365),
+]
+
+PERIODS = {
+    "24H": DAY_MS,
+    "7D": 7 * DAY_MS,
+    "1M": 30 * DAY_MS,
+    "30D": 30 * DAY_MS,
+    "3M": 90 * DAY_MS,
+    "90D": 90 * DAY_MS,
+}
+
+DEFAULT_MAX_POINTS = 1000
+
+SUM, LAST = "sum", "last"
+METRIC_AGG = {"oi": LAST, "spot": SUM, "perp": SUM}
+
+
+class Ring:
+    """Buckets of one resolution, addressed by absolute bucket number."""
+
+    __slots__ = ("width", "size", "bucket", "value")
+
+    def __init__(self, width: int, size: int):
+        self.width = width
+        self.size = size
+        self.bucket = np.full(size, -1, dtype=np.int64)
+        self.value = np.zeros(size)
+
+    def record(self, ts_ms: int, value: float, agg: str):
+        b = ts_ms // self.width
+        slot = b % self.size
+        if self.bucket[slot] != b:
+            if self.bucket[slot] > b:
+                return  # older than the ring
+            self.bucket[slot] = b
+            self.value[slot] = 0.0
+        if agg == SUM:
+            self.value[slot] += value
+        else:
+            self.value[slot] = value
+
+    def load(self, ts_ms: np.ndarray, values: np.ndarray, agg: str):
+        """Bulk-replace the ring from sorted samples."""
+        buckets = ts_ms // self.width
+        uniq, first = np.unique(buckets, return_index=True)
+        if agg == SUM:
+            sums = np.add.reduceat(values, first)
+        else:
+            last = np.append(first[1:], len(buckets)) - 1
+            sums = values[last]
+        uniq, sums = uniq[-self.size:], sums[-self.size:]
+        self.bucket[:] = -1
+        self.value[:] = 0.0
+        slots = uniq % self.size
+        self.bucket[slots] = uniq
+        self.value[slots] = sums
+
+    def read(self, start_bucket: int, end_bucket: int, agg: str) -> np.ndarray:
+        """
+        Values for buckets ``start..end`` inclusive.
+
+        Missing buckets are 0 for summed metrics; for last-value metrics they
+        carry the previous bucket forward (0 before the first sample).
+        """
+        wanted = np.arange(start_bucket, end_bucket + 1, dtype=np.int64)
+        slots = wanted % self.size
+        present = self.bucket[slots] == wanted
+        out = np.where(present, self.value[slots], 0.0)
+        if agg == LAST and not present.all():
+            src = np.where(present, np.arange(len(wanted)), -1)
+            np.maximum.accumulate(src, out=src)
+            out = np.where(src >= 0, out[np.maximum(src, 0)], 0.0)
+        return out
+
+
+class RollupSeries:
+    """One metric for one (token, exchange) at minute/hour/day resolution."""
+
+    def __init__(self, agg: str):
+        self.agg = agg
+        self.rings = [Ring(width, size) for _, width, size in RESOLUTIONS]
+
+    def record(self, ts_ms: int, value: float):
+        """Add one minute sample to every resolution."""
+        for ring in self.rings:
+            ring.record(ts_ms, value, self.agg)
+
+    def load(self, ts_ms: np.ndarray, values: np.ndarray):
+        """Replace contents from sorted minute samples."""
+        for ring in self.rings:
+            ring.load(ts_ms, values, self.agg)
+
+
+def choose_resolution(period_ms: int, max_points: int) -> int:
+    """Index into RESOLUTIONS of the finest ring that fits the period and budget."""
+    for i, (_, width, size) in enumerate(RESOLUTIONS):
+        points = period_ms // width
+        if points <= max_points and points <= size:
+            return i
+    return len(RESOLUTIONS) - 1
+
+
+def merge_buckets(values: np.ndarray, factor: int, agg: str) -> np.ndarray:
+    """Combine runs of ``factor`` adjacent buckets; ``len(values)`` must be a multiple."""
+    if factor <= 1:
+        return values
+    grouped = values.reshape(-1, factor)
+    return grouped.sum(axis=1) if agg == SUM else grouped[:, -1]
+
+
+class TimeSeriesStore:
+    """Rollup series keyed by (token, exchange, metric)."""
+
+    def __init__(self, exchanges: Sequence[str]):
+        self.exchanges = list(exchanges)
+        self.series: Dict[Tuple[str, str, str], RollupSeries] = {}
+
+    def get(self, token: str, exchange: str, metric: str) -> RollupSeries:
+        """Series for a key, created empty on first use."""
+        key = (token, exchange, metric)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = RollupSeries(METRIC_AGG[metric])
+        return series
+
+    def tokens(self) -> Set[str]:
+        """Tokens with at least one series."""
+        return {key[0] for key in self.series}
+
+    def record(self, token: str, exchange: str, metric: str, ts_ms: int, value: float):
+        """Ingest one minute sample."""
+        self.get(token, exchange, metric).record(ts_ms, value)
+
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict]:
+        """Every series' rings stacked per resolution, for a checkpoint."""
+        keys = list(self.series)
+        arrays = {}
+        for level, (name, _, size) in enumerate(RESOLUTIONS):
+            rings = [self.series[key].rings[level] for key in keys]
+            arrays[f"{name}_bucket"] = np.array([r.bucket for r in rings], dtype=np.int64).reshape(len(keys), size)
+            arrays[f"{name}_value"] = np.array([r.value for r in rings]).reshape(len(keys), size)
+        return arrays, {"keys": [list(key) for key in keys]}
+
+    def import_state(self, arrays: Dict[str, np.ndarray], meta: Dict):
+        """Restore series saved by ``export_state`` with the same resolutions."""
+        for i, key in enumerate(meta["keys"]):
+            series = self.get(*key)
+            for level, (name, _, _) in enumerate(RESOLUTIONS):
+                series.rings[level].bucket[:] = arrays[f"{name}_bucket"][i]
+                series.rings[level].value[:] = arrays[f"{name}_value"][i]
+
+    def query(
+        self,
+        token: str,
+        metric: str,
+        period_ms: int,
+        max_points: int,
+        now_ms: int,
+        exchanges: Optional[Sequence[str]] = None,
+    ) -> Tuple[str, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Bucketed values for the most recent ``period_ms``.
+
+        Returns the resolution name, bucket start timestamps and one value
+        array per requested exchange.
+        """
+        level = choose_resolution(period_ms, max_points)
+        name, width, _ = RESOLUTIONS[level]
+        end = now_ms // width
+        count = max(1, period_ms // width)
+        factor = -(-count // max_points)
+        count = -(-count // factor) * factor
+        start = end - count + 1
+
+        agg = METRIC_AGG[metric]
+        columns = {}
+        for exchange in exchanges or self.exchanges:
+            ring = self.get(token, exchange, metric).rings[level]
+            columns[exchange] = merge_buckets(ring.read(start, end, agg), factor, agg)
+        ts = np.arange(start, end + 1, factor, dtype=np.int64) * width
+        return name, ts, columns
@@ -0,0 +1,190 @@
+"""
+Transfer Store
+==============
+MongoDB-backed storage for transfer events.
+
+Transfers are stored with raw numeric fields (``ts`` in epoch milliseconds,
+``value``, ``usd_raw``) and formatted for display by the API layer. Listing
+uses keyset pagination: every sort order ends in the unique ``(ts, _id)``
+pair, so the next page is an indexed range scan starting right after the
+last row of the previous one instead of a ``skip`` over everything before it.
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# API sort_by value -> leading document field
+SORT_FIELDS = {
+    "time": "ts",
+    "usd": "usd_raw",
+    "value": "value",
+}
+
+# Every index ends in (ts, _id) so keyset comparisons stay on the index.
+TRANSFER_INDEXES = [
+    IndexModel([("ts", DESCENDING), ("_id", DESCENDING)], name="ts_id"),
+    IndexModel([("token", ASCENDING), ("ts", DESCENDING), ("_id", DESCENDING)], name="token_ts"),
+    IndexModel([("usd_raw", DESCENDING), ("ts", DESCENDING), ("_id", DESCENDING)], name="usd_ts"),
+    IndexModel([("chain", ASCENDING), ("ts", DESCENDING), ("_id", DESCENDING)], name="chain_ts"),
+    IndexModel([("value", DESCENDING), ("ts", DESCENDING), ("_id", DESCENDING)], name="value_ts"),
+    IndexModel(
+        [("token", ASCENDING), ("usd_raw", DESCENDING), ("ts", DESCENDING), ("_id", DESCENDING)],
+        name="token_usd_ts",
+    ),
+]
+
+# Counting a filtered range is a scan; stop once the pager has enough to show.
+COUNT_LIMIT = 100_000
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded or does not match the query."""
+
+
+def sort_keys(sort_by: str) -> List[str]:
+    """Document fields a listing is ordered by (all descending)."""
+    field = SORT_FIELDS.get(sort_by, "ts")
+    return ["ts", "_id"] if field == "ts" else [field, "ts", "_id"]
+
+
+def encode_cursor(sort_by: str, doc: Dict[str, Any]) -> str:
+    """Build the opaque cursor that resumes a listing after ``doc``."""
+    payload = [sort_by] + [doc[key] for key in sort_keys(sort_by)]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str) -> List[Any]:
+    """Return the sort-key values stored in ``cursor``."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+    keys = sort_keys(sort_by)
+    if not isinstance(payload, list) or len(payload) != len(keys) + 1 or payload[0] != sort_by:
+        raise InvalidCursor("Cursor does not match sort order")
+    return payload[1:]
+
+
+def keyset_filter(keys: List[str], values: List[Any]) -> Dict[str, Any]:
+    """Filter selecting rows strictly after ``values`` in descending ``keys`` order."""
+    clauses = []
+    for i, key in enumerate(keys):
+        clause = {k: v for k, v in zip(keys[:i], values[:i])}
+        clause[key] = {"$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+def build_filter(
+    token: Optional[str] = None,
+    chain: Optional[str] = None,
+    min_usd: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Translate API filter parameters into a Mongo query."""
+    query: Dict[str, Any] = {}
+    if token:
+        query["token"] = token.upper()
+    if chain:
+        query["chain"] = chain.lower()
+    if min_usd:
+        query["usd_raw"] = {"$gte": min_usd}
+    return query
+
+
+class TransferStore:
+    """Indexed transfer collection with keyset-paginated listing."""
+
+    def __init__(self, collection=None):
+        self.collection = collection
+
+    def bind(self, collection):
+        """Use ``collection``, e.g. once the app has opened its Mongo client."""
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        """Create the compound indexes used by list queries."""
+        await self.collection.create_indexes(TRANSFER_INDEXES)
+
+    async def insert_many(self, docs: List[Dict[str, Any]]):
+        """Insert transfer documents, continuing past individual failures."""
+        if docs:
+            await self.collection.insert_many(docs, ordered=False)
+
+    async def estimated_count(self) -> int:
+        """Collection size from metadata, without scanning."""
+        return await self.collection.estimated_document_count()
+
+    async def count(self, query: Dict[str, Any]) -> int:
+        """Number of rows matching ``query``, capped at ``COUNT_LIMIT``."""
+        if not query:
+            return await self.estimated_count()
+        return await self.collection.count_documents(query, limit=COUNT_LIMIT)
+
+    async def nth_newest(self, n: int) -> Optional[Dict[str, Any]]:
+        """The ``n``-th newest transfer, or None when fewer are stored."""
+        docs = await self.collection.find({}, {"ts": 1}).sort(
+            [("ts", DESCENDING), ("_id", DESCENDING)]
+        ).skip(n - 1).limit(1).to_list(length=1)
+        return docs[0] if docs else None
+
+    async def max_before(self, field: str, before_ms: int) -> Optional[float]:
+        """Largest ``field`` among transfers older than ``before_ms``, or None if there are none."""
+        docs = await self.collection.find({"ts": {"$lt": before_ms}}, {field: 1}).sort(
+            [(field, DESCENDING)]
+        ).limit(1).to_list(length=1)
+        return docs[0][field] if docs else None
+
+    async def iter_since(self, since_ms: int, batch_size: int = 5_000):
+        """Yield batches of transfers newer than ``since_ms``, oldest first."""
+        find = self.collection.find({"ts": {"$gt": since_ms}}).sort(
+            [("ts", ASCENDING), ("_id", ASCENDING)]
+        ).batch_size(batch_size)
+        batch = []
+        async for doc in find:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def find_page(
+        self,
+        query: Dict[str, Any],
+        sort_by: str = "time",
+        limit: int = 15,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Fetch one page of transfers.
+
+        With ``cursor`` the page starts right after the row it encodes;
+        ``skip`` is only honoured for legacy page-number requests.
+        Returns the rows and the cursor for the following page (None when
+        this is the last page).
+        """
+        if sort_by not in SORT_FIELDS:
+            sort_by = "time"
+        keys = sort_keys(sort_by)
+        if cursor:
+            after = keyset_filter(keys, decode_cursor(cursor, sort_by))
+            query = {"$and": [query, after]} if query else after
+            skip = 0
+
+        find = self.collection.find(query).sort([(key, DESCENDING) for key in keys])
+        if skip:
+            find = find.skip(skip)
+        docs = await find.limit(limit + 1).to_list(length=limit + 1)
+
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_cursor(sort_by, docs[-1])
+        return docs, next_cursor
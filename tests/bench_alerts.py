@@ -0,0 +1,165 @@
+"""
+Alert Rule Benchmarks
+=====================
+Measures how many transfers per second ``AlertEngine.evaluate`` checks
+against a large rule set, next to a scan that tests every rule against
+every transfer (vectorized with NumPy, so the comparison is with the best
+O(rules) evaluation rather than a Python loop).
+
+Rules and transfers are synthetic and seeded: transfer rules on a token,
+chain and entity (each usually a wildcard) with log-normal USD thresholds,
+plus net flow rules on the entities. No server or database is involved.
+
+Usage (from the repository root)::
+
+    python -m tests.bench_alerts                        # 200k rules
+    python -m tests.bench_alerts --rules 1000000 --batch 1000
+    python -m tests.bench_alerts --min-eps 20000         # fail below 20k events/s
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+BACKEND = Path(__file__).resolve().parent.parent / "backend"
+
+TOKENS = ["BTC", "ETH", "SOL", "USDT", "BNB", "XRP", "ADA", "AVAX", "DOGE", "MATIC", "LINK", "UNI"]
+CHAINS = ["ethereum", "bitcoin", "solana", "tron", "bsc", "arbitrum"]
+ENTITIES = ["Binance", "Bybit", "Kraken", "Coinbase", "OKX", "Gate", "Bitfinex", "KuCoin"]
+
+
+def make_rules(n: int, rng: np.random.Generator, median_usd: float) -> List[Dict[str, Any]]:
+    """``n`` rules around ``median_usd``: mostly transfer rules with wildcards, 5% net flow rules."""
+    mu = np.log(median_usd)
+    rules = []
+    for i in range(n):
+        if rng.random() < 0.05:
+            sign = 1 if rng.random() < 0.5 else -1
+            rules.append({
+                "id": f"r{i}", "kind": "netflow", "entity": ENTITIES[rng.integers(len(ENTITIES))],
+                "window": "1h" if rng.random() < 0.5 else "24h", "threshold": sign * float(rng.lognormal(mu + 1, 1.5)),
+            })
+            continue
+        rules.append({
+            "id": f"r{i}",
+            "kind": "transfer",
+            "token": TOKENS[rng.integers(len(TOKENS))] if rng.random() < 0.8 else None,
+            "chain": CHAINS[rng.integers(len(CHAINS))] if rng.random() < 0.4 else None,
+            "entity": ENTITIES[rng.integers(len(ENTITIES))] if rng.random() < 0.2 else None,
+            "threshold": float(rng.lognormal(mu, 1.5)),
+        })
+    return rules
+
+
+def make_transfers(n: int, rng: np.random.Generator, start_ms: int, rate: float) -> List[Dict[str, Any]]:
+    """``n`` transfers arriving at ``rate`` per second, a third of each side labeled."""
+    labels = [f"{e}: Hot Wallet" for e in ENTITIES] + [None] * (2 * len(ENTITIES))
+    docs = []
+    for i in range(n):
+        docs.append({
+            "_id": f"t{i}",
+            "ts": start_ms + int(i * 1000 / rate),
+            "token": TOKENS[rng.integers(len(TOKENS))],
+            "chain": CHAINS[rng.integers(len(CHAINS))],
+            "from_address": f"0x{i:040x}",
+            "from_label": labels[rng.integers(len(labels))],
+            "to_address": f"0x{i + n:040x}",
+            "to_label": labels[rng.integers(len(labels))],
+            "usd_raw": float(rng.lognormal(11, 2.5)),
+        })
+    return docs
+
+
+class RuleScan:
+    """Every transfer rule tested against each transfer: the O(rules) reference."""
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        transfer = [r for r in rules if r["kind"] == "transfer"]
+        self.codes = {name: code for code, name in enumerate(TOKENS + CHAINS + [e.lower() for e in ENTITIES])}
+        self.token = self._encode([r["token"] for r in transfer])
+        self.chain = self._encode([r["chain"] for r in transfer])
+        self.entity = self._encode([r["entity"] and r["entity"].lower() for r in transfer])
+        self.threshold = np.array([r["threshold"] for r in transfer])
+
+    def _encode(self, names: List[str]) -> np.ndarray:
+        return np.array([self.codes[name] if name else -1 for name in names], dtype=np.int32)
+
+    def matches(self, doc: Dict[str, Any], sender: str, receiver: str) -> int:
+        """Number of transfer rules ``doc`` triggers."""
+        sender, receiver = self.codes.get(sender, -2), self.codes.get(receiver, -2)
+        mask = self.threshold <= doc["usd_raw"]
+        mask &= (self.token == -1) | (self.token == self.codes[doc["token"]])
+        mask &= (self.chain == -1) | (self.chain == self.codes[doc["chain"]])
+        mask &= (self.entity == -1) | (self.entity == sender) | (self.entity == receiver)
+        return int(np.count_nonzero(mask))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Alert rule evaluation throughput")
+    parser.add_argument("--rules", type=int, default=200_000)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=500, help="transfers per evaluate() call, like an ingest batch")
+    parser.add_argument("--rate", type=float, default=5_000, help="simulated transfers per second (event time)")
+    parser.add_argument("--median-usd", type=float, default=50e6, help="median transfer rule threshold")
+    parser.add_argument("--scan-events", type=int, default=200, help="transfers for the full-scan reference")
+    parser.add_argument("--min-eps", type=float, default=0, help="fail if fewer events per second")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BACKEND))
+    from alerts import AlertEngine
+    from holders import label_entity
+
+    rng = np.random.default_rng(args.seed)
+    rules = make_rules(args.rules, rng, args.median_usd)
+    start_ms = int(time.time() * 1000) - int(args.events * 1000 / args.rate)
+    docs = make_transfers(args.events, rng, start_ms, args.rate)
+
+    engine = AlertEngine(lambda addresses: [None] * len(addresses), label_entity)
+    started = time.perf_counter()
+    for rule in rules:
+        engine.add_rule(rule)
+    load_s = time.perf_counter() - started
+    print(f"indexed {len(rules):,} rules in {load_s:.2f} s ({len(engine._transfer)} transfer keys)")
+
+    batch_ms = []
+    notified = 0
+    for i in range(0, len(docs), args.batch):
+        batch = docs[i:i + args.batch]
+        started = time.perf_counter()
+        notified += len(engine.evaluate(batch, now_ms=batch[-1]["ts"]))
+        batch_ms.append((time.perf_counter() - started) * 1000)
+    total_s = sum(batch_ms) / 1000
+    eps = len(docs) / total_s
+    stats = engine.stats()
+    print(
+        f"indexed   {eps:>12,.0f} events/s  batch p50 {percentile(batch_ms, 50):.2f} ms  "
+        f"p95 {percentile(batch_ms, 95):.2f} ms  triggered {stats['triggered']:,}  notified {notified:,}"
+    )
+
+    scan = RuleScan(rules)
+    sample = docs[:args.scan_events]
+    senders, receivers = engine._entities_of(sample)
+    started = time.perf_counter()
+    for doc, sender, receiver in zip(sample, senders, receivers):
+        scan.matches(doc, sender or "", receiver or "")
+    scan_eps = len(sample) / (time.perf_counter() - started)
+    print(f"full scan {scan_eps:>12,.0f} events/s  ({eps / scan_eps:.0f}x slower than indexed)")
+
+    if args.min_eps and eps < args.min_eps:
+        print(f"FAIL {eps:,.0f} events/s < {args.min_eps:,.0f}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
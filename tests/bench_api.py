@@ -0,0 +1,312 @@
+"""
+API Benchmarks
+==============
+Drives the FastAPI app in-process through an ASGI client and reports
+throughput and p50/p95/p99 latency for every ``/api`` route.
+
+MongoDB is replaced by mongomock-motor, so the run needs no server and
+measures the API layer itself (routing, handlers, caches, encoding). Each
+scenario runs at several concurrency levels; results are written as JSON
+and compared against ``tests/bench_baselines.json``. A scenario whose p95
+exceeds its baseline by more than the tolerance fails the run.
+
+Usage (from the repository root)::
+
+    python -m tests.bench_api                     # run and compare
+    python -m tests.bench_api --update-baselines  # record new baselines
+
+Record baselines from one full run at the tip of the branch, with at least
+``BASELINE_MIN_REQUESTS`` requests per scenario so p95 is not just the
+slowest of a handful of samples. A full run replaces the whole file.
+    python -m tests.bench_api --only /api/transfers --requests 500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND = ROOT / "backend"
+BASELINES_PATH = Path(__file__).resolve().parent / "bench_baselines.json"
+RESULTS_PATH = Path(__file__).resolve().parent / "bench_results.json"
+
+CONCURRENCY = (1, 8, 32)
+
+# fewer samples than this make p95 too noisy to record
+BASELINE_MIN_REQUESTS = 100
+
+# Routes that never complete a request/response cycle
+EXCLUDED_ROUTES = {"/api/transfers/stream", "/api/transfers/ws"}
+
+# route path -> [(label, method, path, params, json body)]
+SCENARIOS = {
+    "/api/": [("root", "GET", "/api/", {}, None)],
+    "/api/entities": [("entities", "GET", "/api/entities", {}, None)],
+    "/api/exchange-flows": [
+        ("exchange-flows", "GET", "/api/exchange-flows", {}, None),
+        ("exchange-flows 7d", "GET", "/api/exchange-flows", {"window": "7d"}, None),
+    ],
+    "/api/transfers": [
+        ("transfers", "GET", "/api/transfers", {}, None),
+        ("transfers sort=usd", "GET", "/api/transfers", {"sort_by": "usd", "limit": 50}, None),
+        ("transfers min_usd", "GET", "/api/transfers", {"min_usd": 100000, "sort_by": "value"}, None),
+        ("transfers token+chain", "GET", "/api/transfers", {"token": "ETH", "chain": "ethereum"}, None),
+        ("transfers page=20", "GET", "/api/transfers", {"page": 20}, None),
+        ("transfers raw", "GET", "/api/transfers", {"format": "raw", "limit": 50}, None),
+        ("transfers arrow", "GET", "/api/transfers", {"format": "arrow", "limit": 50}, None),
+    ],
+    "/api/transfers/stream/stats": [("stream stats", "GET", "/api/transfers/stream/stats", {}, None)],
+    "/api/transfers/hot/stats": [("hot tier stats", "GET", "/api/transfers/hot/stats", {}, None)],
+    "/api/tokens": [("tokens", "GET", "/api/tokens", {}, None)],
+    "/api/tokens/{token_id}": [("token", "GET", "/api/tokens/eth", {}, None)],
+    "/api/tokens/dashboard": [("dashboard 5 tokens", "POST", "/api/tokens/dashboard", {}, "dashboard")],
+    "/api/tokens/{token_id}/balance-changes": [
+        ("balance-changes", "GET", "/api/tokens/eth/balance-changes", {"filter_type": "CEX", "sort_by": "change"}, None),
+    ],
+    "/api/tokens/{token_id}/holders": [
+        ("holders", "GET", "/api/tokens/eth/holders", {"limit": 50}, None),
+        ("holders entities", "GET", "/api/tokens/eth/holders", {"view_type": "entities"}, None),
+    ],
+    "/api/tokens/{token_id}/transfers": [
+        ("token transfers", "GET", "/api/tokens/btc/transfers", {"limit": 50}, None),
+    ],
+    "/api/tokens/{token_id}/price-history": [
+        ("price-history ALL", "GET", "/api/tokens/btc/price-history", {"period": "ALL"}, None),
+        ("price-history 1W", "GET", "/api/tokens/eth/price-history", {"period": "1W"}, None),
+        ("price-history ALL 5000", "GET", "/api/tokens/btc/price-history", {"period": "ALL", "max_points": 5000}, None),
+        ("price-history ALL msgpack", "GET", "/api/tokens/btc/price-history", {"period": "ALL", "format": "msgpack"}, None),
+    ],
+    "/api/tokens/{token_id}/open-interest": [
+        ("open-interest 1M", "GET", "/api/tokens/btc/open-interest", {"period": "1M"}, None),
+        ("open-interest 3M binance", "GET", "/api/tokens/btc/open-interest", {"period": "3M", "exchange": "binance"}, None),
+    ],
+    "/api/tokens/{token_id}/cex-volume": [
+        ("cex-volume 24H", "GET", "/api/tokens/btc/cex-volume", {}, None),
+        ("cex-volume 30D perp", "GET", "/api/tokens/btc/cex-volume", {"period": "30D", "volume_type": "perp"}, None),
+    ],
+    "/api/ingest/stats": [("ingest stats", "GET", "/api/ingest/stats", {}, None)],
+    "/api/cache/stats": [("cache stats", "GET", "/api/cache/stats", {}, None)],
+    "/api/admission/stats": [("admission stats", "GET", "/api/admission/stats", {}, None)],
+    "/api/coalesce/stats": [("coalesce stats", "GET", "/api/coalesce/stats", {}, None)],
+    "/api/checkpoints/stats": [("checkpoint stats", "GET", "/api/checkpoints/stats", {}, None)],
+    "/api/labels/lookup": [("labels lookup", "POST", "/api/labels/lookup", {}, "labels")],
+    "/api/labels/stats": [("labels stats", "GET", "/api/labels/stats", {}, None)],
+    "/api/search": [
+        ("search name prefix", "GET", "/api/search", {"q": "bi", "limit": 10}, None),
+        ("search address prefix", "GET", "/api/search", {"q": "0xf9", "limit": 10}, None),
+        ("search fuzzy", "GET", "/api/search", {"q": "binanse", "limit": 10}, None),
+    ],
+    "/api/search/stats": [("search stats", "GET", "/api/search/stats", {}, None)],
+    "/api/actors/correlation": [
+        ("actor matrix 30d", "GET", "/api/actors/correlation", {"window": "30d", "limit": 50}, None),
+    ],
+    "/api/actors/correlation/stats": [("actor correlation stats", "GET", "/api/actors/correlation/stats", {}, None)],
+    "/api/actors/{actor_id}/correlation": [
+        ("actor correlation", "GET", "/api/actors/binance-hot-wallet/correlation", {"window": "7d"}, None),
+    ],
+    "/api/actors/{actor_id}/simulate": [
+        ("simulate copy trading", "POST", "/api/actors/binance-hot-wallet/simulate", {}, "simulate"),
+    ],
+    "/api/simulations/stats": [("simulation stats", "GET", "/api/simulations/stats", {}, None)],
+    "/api/simulations/{job_id}": [("simulation job", "GET", "/api/simulations/{job_id}", {}, None)],
+    "/api/alerts/rules": [
+        ("alert rules list", "GET", "/api/alerts/rules", {"limit": 100}, None),
+        ("alert rule create", "POST", "/api/alerts/rules", {}, "alert_rule"),
+    ],
+    "/api/alerts/rules/{rule_id}": [("alert rule", "GET", "/api/alerts/rules/{rule_id}", {}, None)],
+    "/api/alerts/notifications": [("alert notifications", "GET", "/api/alerts/notifications", {"limit": 100}, None)],
+    "/api/alerts/stats": [("alert stats", "GET", "/api/alerts/stats", {}, None)],
+    "/api/metrics": [("metrics", "GET", "/api/metrics", {}, None)],
+    "/api/market-stats": [("market-stats", "GET", "/api/market-stats", {}, None)],
+}
+
+
+def load_app(seed_transfers: int):
+    """Import the server with an in-memory Mongo stand-in and quiet background tasks."""
+    data_dir = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "bench")
+    os.environ["FEED_RATE"] = "0"
+    os.environ["SEED_TRANSFERS"] = str(seed_transfers)
+    os.environ["LABELS_PATH"] = os.path.join(data_dir, "labels.bin")
+    os.environ["REFDATA_DIR"] = os.path.join(data_dir, "refdata")
+    os.environ["CHECKPOINT_DIR"] = os.path.join(data_dir, "checkpoints")
+    # one client at full speed: keep admission control in the path but never throttling
+    os.environ.setdefault("ADMISSION_CLIENT_RATE", "1e9")
+    os.environ.setdefault("ADMISSION_CLIENT_BURST", "1e9")
+    os.environ.setdefault("ADMISSION_QUEUE_TARGET_MS", "60000")
+    os.environ["LABELS_RELOAD_SECONDS"] = "0"
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    import motor.motor_asyncio
+    from mongomock_motor import AsyncMongoMockClient
+
+    class MockClient(AsyncMongoMockClient):
+        def __init__(self, *args, **kwargs):
+            # pool and monitoring options have no meaning in memory
+            kwargs = {k: v for k, v in kwargs.items() if k in ("tz_aware", "document_class")}
+            super().__init__(*args, **kwargs)
+
+    motor.motor_asyncio.AsyncIOMotorClient = MockClient
+    sys.path.insert(0, str(BACKEND))
+    import server
+
+    return server
+
+
+def api_routes(app) -> List[str]:
+    """Paths of every HTTP and WebSocket route under /api."""
+    return sorted({route.path for route in app.routes if route.path.startswith("/api")})
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_scenario(client, method, path, params, body, concurrency, total):
+    """Send ``total`` requests with ``concurrency`` workers; latencies in ms."""
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await client.request(method, path, params=params, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+    }
+
+
+async def run_benchmarks(server, total: int, warmup: int, only: Optional[str]) -> Dict[str, Dict]:
+    """Run every scenario at every concurrency level."""
+    import httpx
+
+    app = server.app
+    uncovered = [r for r in api_routes(app) if r not in SCENARIOS and r not in EXCLUDED_ROUTES]
+    if uncovered:
+        raise SystemExit(f"No benchmark scenario for: {', '.join(uncovered)}")
+
+    results: Dict[str, Dict] = {}
+    async with app.router.lifespan_context(app):
+        sample = [server.wallet_address(label, 0) for label, _ in server.EXCHANGE_LABELS]
+        bodies = {
+            "labels": {"addresses": sample * 10 + [server.generate_address() for _ in range(40)]},
+            "dashboard": {"tokens": ["btc", "eth", "sol", "usdt", "bnb"]},
+            "alert_rule": {"token": "ETH", "threshold": 1_000_000, "owner": "bench"},
+            "simulate": {"delay_hours": [0, 1, 6], "slippage_bps": [10, 50], "size": [1000]},
+        }
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            # ids of resources that scenarios poll, created once up front
+            job = await client.post(
+                "/api/actors/binance-hot-wallet/simulate", json={**bodies["simulate"], "background": True}
+            )
+            rule = await client.post("/api/alerts/rules", json=bodies["alert_rule"])
+            refs = {"job_id": job.json()["job"]["id"], "rule_id": rule.json()["id"]}
+            while (await client.get(f"/api/simulations/{refs['job_id']}")).json()["status"] in ("queued", "running"):
+                await asyncio.sleep(0.05)  # let the worker processes start before anything is timed
+            for route, scenarios in SCENARIOS.items():
+                if only and not route.startswith(only):
+                    continue
+                for label, method, path, params, body in scenarios:
+                    body = bodies.get(body) if body else None
+                    path = path.format(**refs)
+                    await run_scenario(client, method, path, params, body, 1, warmup)
+                    for concurrency in CONCURRENCY:
+                        key = f"{label} c={concurrency}"
+                        stats = await run_scenario(client, method, path, params, body, concurrency, total)
+                        stats.update(route=route, concurrency=concurrency)
+                        results[key] = stats
+                        print(
+                            f"{key:<36} {stats['rps']:>9.1f} req/s  p50 {stats['p50_ms']:>8.2f}  "
+                            f"p95 {stats['p95_ms']:>8.2f}  p99 {stats['p99_ms']:>8.2f} ms"
+                            + (f"  errors {stats['errors']}" if stats["errors"] else "")
+                        )
+    return results
+
+
+def compare(results: Dict[str, Dict], baselines: Dict[str, Dict], tolerance: float, slack_ms: float) -> List[str]:
+    """Scenarios whose p95 regressed past ``baseline * (1 + tolerance) + slack_ms``, or that errored."""
+    failures = []
+    for key, stats in results.items():
+        if stats["errors"]:
+            failures.append(f"{key}: {stats['errors']} error responses")
+        base = baselines.get(key)
+        if base is None:
+            continue
+        limit = base["p95_ms"] * (1 + tolerance) + slack_ms
+        if stats["p95_ms"] > limit:
+            failures.append(f"{key}: p95 {stats['p95_ms']:.2f} ms > {limit:.2f} ms (baseline {base['p95_ms']:.2f})")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every /api route in-process")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed-transfers", type=int, default=2000)
+    parser.add_argument("--only", help="only routes starting with this path")
+    parser.add_argument("--output", default=str(RESULTS_PATH))
+    parser.add_argument("--baselines", default=str(BASELINES_PATH))
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative p95 regression")
+    parser.add_argument("--slack-ms", type=float, default=2.0, help="allowed absolute p95 regression")
+    parser.add_argument("--update-baselines", action="store_true")
+    args = parser.parse_args(argv)
+    if args.update_baselines and args.requests < BASELINE_MIN_REQUESTS:
+        parser.error(f"--update-baselines needs --requests >= {BASELINE_MIN_REQUESTS}")
+
+    server = load_app(args.seed_transfers)
+    results = asyncio.run(run_benchmarks(server, args.requests, args.warmup, args.only))
+
+    with open(args.output, "w") as fh:
+        json.dump({"created": int(time.time()), "requests": args.requests, "results": results}, fh, indent=2)
+    print(f"Wrote {args.output}")
+
+    baselines_path = Path(args.baselines)
+    baselines = json.loads(baselines_path.read_text()) if baselines_path.exists() else {}
+    if args.update_baselines:
+        if not args.only:
+            baselines = {}  # drop scenarios that no longer exist
+        baselines.update({
+            key: {"p50_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"], "p99_ms": stats["p99_ms"]}
+            for key, stats in results.items()
+        })
+        baselines_path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Updated {baselines_path}")
+        return 0
+
+    failures = compare(results, baselines, args.tolerance, args.slack_ms)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
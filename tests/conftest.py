@@ -0,0 +1,35 @@
+"""
+Shared fixtures: the backend on ``sys.path`` and, for API tests, the app
+booted once per session against mongomock-motor (see ``bench_api.load_app``).
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def server():
+    from tests.bench_api import load_app
+
+    return load_app(seed_transfers=500)
+
+
+@pytest.fixture(scope="session")
+async def client(server, anyio_backend):
+    """ASGI client for the app, inside its lifespan."""
+    import httpx
+
+    app = server.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
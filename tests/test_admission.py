@@ -0,0 +1,39 @@
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from admission import AdmissionControl, AdmissionMiddleware, RoutePolicy
+
+
+def make_client(**kwargs):
+    async def ping(request):
+        return PlainTextResponse("pong")
+
+    app = Starlette(routes=[Route("/ping", ping)])
+    control = AdmissionControl({}, {"standard": (4, 1000)}, RoutePolicy("standard", 1), rate=0.001, burst=1, **kwargs)
+    app.add_middleware(AdmissionMiddleware, control=control, routes=app.routes)
+    # every request arrives from the same peer, as it does behind a proxy
+    transport = httpx.ASGITransport(app=app, client=("10.0.0.1", 1234))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.mark.anyio
+async def test_clients_behind_one_proxy_get_their_own_buckets():
+    async with make_client() as client:
+        first = {"X-Forwarded-For": "203.0.113.7"}
+        second = {"X-Forwarded-For": "198.51.100.2, 203.0.113.9"}
+        assert (await client.get("/ping", headers=first)).status_code == 200
+        assert (await client.get("/ping", headers=first)).status_code == 429
+        assert (await client.get("/ping", headers=second)).status_code == 200
+        # a spoofed leading hop does not buy a fresh bucket
+        spoofed = {"X-Forwarded-For": "192.0.2.1, 203.0.113.9"}
+        assert (await client.get("/ping", headers=spoofed)).status_code == 429
+
+
+@pytest.mark.anyio
+async def test_peer_address_without_a_client_header():
+    async with make_client(client_header="") as client:
+        assert (await client.get("/ping", headers={"X-Forwarded-For": "203.0.113.7"})).status_code == 200
+        assert (await client.get("/ping", headers={"X-Forwarded-For": "198.51.100.2"})).status_code == 429
@@ -0,0 +1,87 @@
+import numpy as np
+
+from alerts import AlertEngine
+
+T0 = 1_700_000_000_000
+LABELS = {"0xbinance": "Binance: Hot Wallet", "0xkraken": "Kraken Deposit"}
+
+
+def entity_of(label):
+    return label.split(":")[0].split(" ")[0] if label else None
+
+
+def make_engine(**kwargs):
+    return AlertEngine(lambda addresses: [LABELS.get(a) for a in addresses], entity_of, **kwargs)
+
+
+def transfer(i, usd, token="ETH", chain="ethereum", sender="0xa", receiver="0xb", ts=None):
+    return {
+        "_id": f"t{i}", "ts": T0 + i * 1000 if ts is None else ts, "token": token, "chain": chain,
+        "from_address": sender, "to_address": receiver, "usd_raw": usd,
+    }
+
+
+def fired(notes):
+    return sorted(note["rule_id"] for note in notes)
+
+
+def test_transfer_thresholds_fire_at_or_above():
+    engine = make_engine()
+    for threshold in (100, 1000, 5000):
+        engine.add_rule({"id": f"any-{threshold}", "kind": "transfer", "threshold": threshold, "cooldown_s": 0})
+    engine.add_rule({"id": "btc", "kind": "transfer", "token": "btc", "threshold": 10, "cooldown_s": 0})
+    engine.add_rule({"id": "kraken", "kind": "transfer", "entity": "Kraken", "threshold": 10, "cooldown_s": 0})
+
+    assert fired(engine.evaluate([transfer(1, 99)], now_ms=T0)) == []
+    assert fired(engine.evaluate([transfer(2, 1000)], now_ms=T0)) == ["any-100", "any-1000"]
+    assert fired(engine.evaluate([transfer(3, 50, token="BTC")], now_ms=T0)) == ["btc"]
+    assert fired(engine.evaluate([transfer(4, 20, receiver="0xkraken")], now_ms=T0)) == ["kraken"]
+    # an already evaluated transfer never fires again
+    assert engine.evaluate([transfer(2, 1000)], now_ms=T0) == []
+
+
+def test_cooldown_suppresses_and_reports():
+    engine = make_engine()
+    engine.add_rule({"id": "big", "kind": "transfer", "threshold": 100, "cooldown_s": 60})
+    assert fired(engine.evaluate([transfer(1, 500)], now_ms=T0)) == ["big"]
+    assert engine.evaluate([transfer(2, 500), transfer(3, 700)], now_ms=T0 + 1000) == []
+    later = engine.evaluate([transfer(4, 500)], now_ms=T0 + 61_000)
+    assert fired(later) == ["big"] and later[0]["suppressed"] == 2
+
+
+def test_netflow_fires_when_crossing():
+    engine = make_engine()
+    engine.add_rule({"id": "in", "kind": "netflow", "entity": "binance", "window": "1h", "threshold": 1000, "cooldown_s": 0})
+    engine.add_rule({"id": "out", "kind": "netflow", "entity": "binance", "window": "1h", "threshold": -500, "cooldown_s": 0})
+    assert engine.evaluate([transfer(1, 600, receiver="0xbinance")], now_ms=T0) == []
+    notes = engine.evaluate([transfer(2, 600, receiver="0xbinance")], now_ms=T0)
+    assert fired(notes) == ["in"] and notes[0]["netflow"]["usd"] == 1200
+    # staying above the threshold does not fire again
+    assert engine.evaluate([transfer(3, 10, receiver="0xbinance")], now_ms=T0) == []
+    assert fired(engine.evaluate([transfer(4, 1800, sender="0xbinance")], now_ms=T0)) == ["out"]
+
+
+def test_netflow_windows_survive_a_checkpoint():
+    rule = {"id": "in", "kind": "netflow", "entity": "binance", "window": "24h", "threshold": 1000, "cooldown_s": 0}
+    engine = make_engine()
+    engine.add_rule({"id": "other", "kind": "netflow", "entity": "kraken", "window": "1h", "threshold": 1})
+    engine.add_rule(rule)
+    engine.evaluate([transfer(1, 900, receiver="0xbinance"), transfer(2, 5, receiver="0xkraken")], now_ms=T0)
+    arrays, meta = engine.export_state()
+
+    # rules load before the checkpoint is restored, in a different order
+    restored = make_engine()
+    restored.add_rule(rule)
+    restored.import_state(arrays, meta)
+    assert np.allclose(restored.rings["24h"].values[0], engine.rings["24h"].values[1])
+    notes = restored.evaluate([transfer(3, 200, receiver="0xbinance")], now_ms=T0)
+    assert fired(notes) == ["in"] and notes[0]["netflow"]["usd"] == 1100
+
+
+def test_sync_rules_follows_the_store():
+    engine = make_engine()
+    engine.add_rule({"id": "old", "kind": "transfer", "threshold": 1, "created_at": T0})
+    engine.add_rule({"id": "fresh", "kind": "transfer", "threshold": 1, "created_at": T0 + 60_000})
+    stored = [{"id": "new", "kind": "transfer", "threshold": 5}, {"id": "bad", "kind": "netflow", "threshold": 5}]
+    assert engine.sync_rules(stored, settled_ms=T0 + 30_000) == (1, 1)
+    assert sorted(engine.rules) == ["fresh", "new"]
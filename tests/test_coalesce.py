@@ -0,0 +1,38 @@
+import asyncio
+import json
+
+import pytest
+
+from coalesce import SingleFlight, call_key
+
+
+async def lookup(token_id: str, period: str = "ALL"):
+    return {"token": token_id, "period": period}
+
+
+def test_call_key_binds_positional_arguments():
+    assert call_key(lookup, ("eth",), {}) != call_key(lookup, ("sol",), {})
+    assert call_key(lookup, ("eth",), {}) == call_key(lookup, (), {"token_id": "eth", "period": "ALL"})
+
+
+def test_positional_calls_are_not_shared():
+    flight = SingleFlight(grace=10)
+    wrapped = flight.coalesce()(lookup)
+
+    async def both():
+        return await asyncio.gather(wrapped("eth"), wrapped("sol"))
+
+    eth, sol = asyncio.run(both())
+    assert eth.body != sol.body
+    assert flight.computed == 2
+
+
+@pytest.mark.anyio
+async def test_dashboard_sections_are_per_token(client):
+    response = await client.post("/api/tokens/dashboard", json={"tokens": ["eth", "sol"]})
+    assert response.status_code == 200
+    tokens = {line["token_id"]: line for line in map(json.loads, response.text.splitlines())}
+    eth, sol = (tokens[t]["sections"]["price_history"] for t in ("eth", "sol"))
+    assert not tokens["eth"]["errors"] and not tokens["sol"]["errors"]
+    assert eth["token_id"] == "eth" and sol["token_id"] == "sol"
+    assert eth["data"] != sol["data"]
@@ -0,0 +1,20 @@
+from exchange_flows import MINUTE_MS, ExchangeFlowAggregator
+
+T0 = 1_700_000_000_000 - 1_700_000_000_000 % (120 * MINUTE_MS)
+
+
+def transfer(ts, usd=100.0):
+    return {"token": "BTC", "ts": ts, "usd_raw": usd, "from_label": None, "to_label": "Binance"}
+
+
+def test_on_rotate_fires_only_when_a_bucket_turns():
+    rotations = []
+    flows = ExchangeFlowAggregator([{"asset": "BTC"}], on_rotate=lambda: rotations.append(1))
+    flows.add_batch([transfer(T0)])
+    assert len(rotations) == 1  # first bucket
+    flows.add_batch([transfer(T0 + 1000), transfer(T0 + 2000)])
+    flows.add_batch([transfer(T0 + 30_000)])
+    assert len(rotations) == 1
+    flows.add_batch([transfer(T0 + MINUTE_MS)])
+    assert len(rotations) == 2
+    assert flows.snapshot("1h", T0 + MINUTE_MS)[0]["volume"] == 500
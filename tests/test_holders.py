@@ -0,0 +1,57 @@
+import pytest
+
+from holders import HolderLedger
+
+
+class Labels:
+    def __init__(self, labels):
+        self.labels = labels
+        self.calls = 0
+
+    def labels_of(self, addresses):
+        self.calls += 1
+        return [self.labels.get(a) for a in addresses]
+
+
+def transfer(sender, receiver, value, token="ETH"):
+    return {"token": token, "from_address": sender, "to_address": receiver, "value": value}
+
+
+def entities(ledger, token="ETH"):
+    return {entity: pytest.approx(balance) for entity, balance, _ in ledger.top_entities(token, 10)}
+
+
+def test_entity_totals_follow_label_changes():
+    labels = Labels({"0xa": "Binance: Hot Wallet"})
+    ledger = HolderLedger({}, labels.labels_of)
+    ledger.credit("ETH", "0xa", 100)
+    ledger.credit("ETH", "0xb", 50)
+    ledger.apply_batch([transfer("0xa", "0xc", 10), transfer("0xb", "0xc", 5)])
+    assert labels.calls == 3  # one lookup per batch
+    assert entities(ledger) == {"Binance": 90}
+
+    # a label learned at runtime moves the address's whole balance when it is next touched
+    labels.labels["0xb"] = "Kraken Deposit"
+    ledger.apply_batch([transfer("0xb", "0xc", 5)])
+    assert entities(ledger) == {"Binance": 90, "Kraken": 40}
+
+    # a replaced label file moves balances of untouched addresses too
+    labels.labels = {"0xa": "Coinbase: Prime", "0xc": "Coinbase: Cold"}
+    ledger.relabel()
+    assert entities(ledger) == {"Coinbase": 110}
+    ledger.apply_batch([transfer("0xc", "0xb", 20)])
+    assert entities(ledger) == {"Coinbase": 90}
+
+
+def test_restored_entities_use_current_labels():
+    labels = Labels({"0xa": "Binance: Hot Wallet"})
+    ledger = HolderLedger({}, labels.labels_of)
+    ledger.apply_batch([transfer("0xz", "0xa", 70), transfer("0xz", "0xb", 30)])
+    state = ledger.export_state()
+
+    labels.labels["0xb"] = "Binance: Cold"
+    restored = HolderLedger({}, labels.labels_of)
+    restored.import_state(*state)
+    assert entities(restored) == {"Binance": 100}
+    restored.apply_batch([transfer("0xa", "0xz", 70)])
+    assert entities(restored) == {"Binance": 30}
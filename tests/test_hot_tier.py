@@ -0,0 +1,119 @@
+import random
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from hot_tier import TransferHotTier
+from transfer_store import TransferStore, build_filter
+
+TOKENS = ["BTC", "ETH", "SOL", "USDT"]
+CHAINS = ["ethereum", "tron", "solana"]
+LABELS = [None, None, "Binance: Hot Wallet", "Kraken Deposit"]
+
+
+def make_transfers(n, rng, start_ms=1_700_000_000_000):
+    docs = []
+    for i in range(n):
+        value = rng.randint(1, 100_000) if i % 2 else round(rng.uniform(0.01, 5000), 6)
+        docs.append({
+            "_id": f"{rng.getrandbits(128):032x}",
+            "ts": start_ms + i * 1000 + rng.randint(0, 5),
+            "chain": rng.choice(CHAINS),
+            "token": rng.choice(TOKENS),
+            "from_address": f"0x{rng.getrandbits(160):040x}",
+            "from_label": rng.choice(LABELS),
+            "to_address": f"0x{rng.getrandbits(160):040x}",
+            "to_label": rng.choice(LABELS),
+            "value": value,
+            "usd_raw": value * rng.choice([1.0, 3000.0, 60000.0]),
+        })
+    return docs
+
+
+def rows(docs):
+    return [(d["_id"], d["ts"], d["usd_raw"], d["value"], type(d["value"]), d["token"], d["from_label"]) for d in docs]
+
+
+@pytest.fixture
+async def store(anyio_backend):
+    store = TransferStore(AsyncMongoMockClient()["test"]["transfers"])
+    await store.insert_many(make_transfers(1200, random.Random(3)))
+    return store
+
+
+async def warm(store, capacity):
+    """A ring loaded the way the server warms it."""
+    tier = TransferHotTier(capacity)
+    oldest = await store.nth_newest(capacity)
+    since = -1
+    if oldest:
+        tier.exclude_before(
+            oldest["ts"], await store.max_before("usd_raw", oldest["ts"]), await store.max_before("value", oldest["ts"])
+        )
+        since = oldest["ts"] - 1
+    async for batch in store.iter_since(since):
+        tier.add(batch)
+    return tier
+
+
+async def compare(tier, store, query, sort_by, limit, pages=3):
+    """Follow a cursor chain; every page the ring serves must equal MongoDB's."""
+    served, cursor = 0, None
+    for _ in range(pages):
+        expected = await store.find_page(query, sort_by=sort_by, limit=limit, cursor=cursor)
+        got = tier.page(query, sort_by, limit, cursor)
+        if got is not None:
+            served += 1
+            assert rows(got[0]) == rows(expected[0])
+            assert got[1] == expected[1]
+        cursor = expected[1]
+        if cursor is None:
+            break
+    return served
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("capacity", [500, 5000])
+async def test_pages_match_mongo(store, capacity):
+    tier = await warm(store, capacity)
+    tier.add(make_transfers(300, random.Random(4), start_ms=1_700_002_000_000))
+    await store.insert_many(make_transfers(300, random.Random(4), start_ms=1_700_002_000_000))
+    served = 0
+    for query in [{}, build_filter(token="ETH"), build_filter(chain="tron", min_usd=50_000)]:
+        for sort_by in ("time", "usd", "value"):
+            for limit in (5, 40):
+                served += await compare(tier, store, query, sort_by, limit)
+                count = tier.count(query)
+                if count is not None:
+                    assert count == await store.count(query)
+    assert served > 0
+    assert tier.complete == (capacity == 5000)
+
+
+@pytest.mark.anyio
+async def test_shared_ring_only_serves_settled_cursor_pages(store):
+    tier = await warm(store, 5000)
+    newest = (await store.find_page({}, limit=1))[0][0]["ts"]
+    tier.settle(True, newest - 600_000)
+    assert tier.page({}, "time", 15) is None
+    assert tier.page({}, "usd", 15) is None
+    assert tier.count(build_filter(token="ETH")) is None
+
+    # a cursor deep enough to be below the settled time
+    page, cursor = await store.find_page({}, sort_by="time", limit=700)
+    assert page[-1]["ts"] <= tier.settled
+    assert await compare(tier, store, {}, "time", 20) == 0
+    got = tier.page({}, "time", 20, cursor)
+    assert got is not None and rows(got[0]) == rows((await store.find_page({}, "time", 20, cursor))[0])
+
+    tier.settle(False)
+    assert tier.page({}, "time", 15) is not None
+
+
+def test_integer_values_come_back_as_ints():
+    tier = TransferHotTier(10)
+    docs = make_transfers(4, random.Random(5))
+    tier.add(docs)
+    found, _ = tier.page({}, "time", 4)
+    assert {d["_id"]: d["value"] for d in found} == {d["_id"]: d["value"] for d in docs}
+    assert all(type(d["value"]) is type(o["value"]) for d in found for o in docs if o["_id"] == d["_id"])
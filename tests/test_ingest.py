@@ -0,0 +1,48 @@
+import pytest
+from pymongo.errors import BulkWriteError
+
+from ingest import DUPLICATE_KEY, IngestPipeline
+
+DOCUMENT_FAILED_VALIDATION = 121
+
+
+class PartialStore:
+    """Stores every document except those at ``errors``' indexes, like an unordered insert_many."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.docs = []
+
+    async def insert_many(self, docs):
+        self.docs.extend(doc for i, doc in enumerate(docs) if i not in self.errors)
+        if self.errors:
+            raise BulkWriteError({"writeErrors": [
+                {"index": i, "code": code, "errmsg": "failed"} for i, code in self.errors.items()
+            ]})
+
+
+async def ingest(store, docs):
+    pipeline = IngestPipeline(store, batch_size=len(docs))
+    seen = []
+    pipeline.add_listener(seen.extend)
+    pipeline.start()
+    await pipeline.submit_many(docs)
+    await pipeline.stop()
+    return pipeline, seen
+
+
+@pytest.mark.anyio
+async def test_listeners_only_see_stored_documents():
+    docs = [{"_id": str(i)} for i in range(5)]
+    store = PartialStore({1: DOCUMENT_FAILED_VALIDATION, 3: DUPLICATE_KEY})
+    pipeline, seen = await ingest(store, docs)
+    # a duplicate was stored by an earlier attempt; the invalid document never was
+    assert [doc["_id"] for doc in seen] == ["0", "2", "3", "4"]
+    assert (pipeline.written, pipeline.failed) == (4, 1)
+
+
+@pytest.mark.anyio
+async def test_duplicates_alone_keep_the_whole_batch():
+    docs = [{"_id": str(i)} for i in range(3)]
+    pipeline, seen = await ingest(PartialStore({0: DUPLICATE_KEY}), docs)
+    assert seen == docs and pipeline.failed == 0
@@ -0,0 +1,28 @@
+import pytest
+
+from holders import HolderLedger
+from label_index import LabelService, write_label_file
+
+HOT = "0x" + "ab" * 20
+NEW = "0x" + "cd" * 20
+
+
+def test_learned_labels_follow_the_latest_transfer(tmp_path):
+    path = str(tmp_path / "labels.bin")
+    write_label_file(path, [(HOT, "Binance: Hot Wallet")])
+    labels = LabelService(path)
+    labels.load()
+    ledger = HolderLedger({}, labels.labels_of)
+    ledger.credit("ETH", NEW, 40)
+
+    labels.learn(NEW, "Bybit Deposit")
+    labels.learn(NEW.upper().replace("0X", "0x"), "Kraken Deposit")
+    assert labels.label_of(NEW) == "Kraken Deposit"
+    ledger.credit("ETH", NEW, 0)
+    assert {entity: balance for entity, balance, _ in ledger.top_entities("ETH", 5)} == {"Kraken": pytest.approx(40)}
+
+    # an indexed address relabelled at runtime, then back to the index's label
+    labels.learn(HOT, "Binance: Cold Wallet")
+    assert labels.label_of(HOT) == "Binance: Cold Wallet"
+    labels.learn(HOT, "Binance: Hot Wallet")
+    assert HOT not in labels.overlay and labels.label_of(HOT) == "Binance: Hot Wallet"
@@ -0,0 +1,13 @@
+import time
+
+
+def test_backfill_leaves_the_current_minute_to_the_sampler(server):
+    server.ensure_market_series("UNI")
+    exchange = next(iter(server.MARKET_EXCHANGES))
+    series = server.market_series.get("UNI", exchange, "spot")
+    now_ms = int(time.time() * 1000)
+    series.record(now_ms, 5.0)
+    minute = series.rings[0]
+    bucket = now_ms // minute.width
+    assert minute.read(bucket, bucket, series.agg).tolist() == [5.0]
+    assert minute.read(bucket - 1, bucket - 1, series.agg)[0] > 0
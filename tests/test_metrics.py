@@ -0,0 +1,25 @@
+from types import SimpleNamespace
+
+from bson import Int64
+
+from metrics import MetricsRegistry, MongoCommandMetrics
+
+
+def event(request_id, command_name, command, duration_micros=1500):
+    return SimpleNamespace(
+        connection_id=("localhost", 27017), request_id=request_id, database_name="flowintel",
+        command_name=command_name, command=command, duration_micros=duration_micros,
+    )
+
+
+def test_get_more_is_attributed_to_its_collection():
+    registry = MetricsRegistry()
+    listener = MongoCommandMetrics(registry)
+    listener.started(event(1, "find", {"find": "transfers", "filter": {}}))
+    listener.succeeded(event(1, "find", {}))
+    listener.started(event(2, "getMore", {"getMore": Int64(8123), "collection": "transfers"}))
+    listener.succeeded(event(2, "getMore", {}))
+    listener.started(event(3, "ping", {"ping": 1}))
+    listener.failed(event(3, "ping", {}))
+    assert set(registry.mongo) == {("transfers", "find"), ("transfers", "getMore"), ("flowintel", "ping")}
+    assert registry.mongo_failures == {("flowintel", "ping"): 1}
@@ -0,0 +1,37 @@
+import time
+
+import pytest
+
+from price_history import PERIOD_HOURS, PriceHistoryEngine
+
+TOKENS = {"eth": {"price": 3000.0, "volume_24h": 1e9}}
+
+
+@pytest.mark.parametrize("period", list(PERIOD_HOURS))
+def test_labels_are_unique_per_point(period):
+    engine = PriceHistoryEngine(TOKENS, now_ms=int(time.time() * 1000))
+    dates = [point["date"] for point in engine.view("eth", period, 500)]
+    assert len(set(dates)) == len(dates)
+    # hourly periods short enough to show every bar are labeled by hour
+    if period in ("1W", "1M", "3M"):
+        assert dates[0].endswith(":00")
+
+
+@pytest.mark.anyio
+async def test_unknown_period_is_rejected(client):
+    response = await client.get("/api/tokens/eth/price-history", params={"period": "5Y"})
+    assert response.status_code == 400
+    response = await client.get("/api/tokens/eth/price-history", params={"period": "1m"})
+    assert response.status_code == 200 and response.json()["period"] == "1M"
+
+
+def test_refresh_regenerates_changed_series_under_a_new_version():
+    tokens = {"eth": {"price": 3000.0, "volume_24h": 1e9}, "sol": {"price": 150.0, "volume_24h": 1e8}}
+    engine = PriceHistoryEngine(tokens, now_ms=int(time.time() * 1000))
+    eth, sol = engine.get_series("eth"), engine.get_series("sol")
+    engine.view("eth", "1W", 100)
+    engine.refresh({**tokens, "eth": {"price": 3300.0, "volume_24h": 1e9}})
+    assert engine.get_series("sol") is sol
+    fresh = engine.get_series("eth")
+    assert fresh.close[-1] == 3300.0 and fresh.version != eth.version
+    assert engine.view("eth", "1W", 100)[-1]["price"] == 3300.0
@@ -0,0 +1,68 @@
+from refdata import ReferenceData, current_generation, publish
+
+TABLES = {
+    "logos": {"btc": "btc.png", "eth": "eth.png"},
+    "exchange_assets": [{"asset": "BTC", "price": 90000.0}, {"asset": "ETH", "price": 3000.0}],
+}
+
+
+def with_price(tables, price):
+    assets = [dict(asset) for asset in tables["exchange_assets"]]
+    assets[0]["price"] = price
+    return {**tables, "exchange_assets": assets}
+
+
+def test_startup_attaches_to_the_published_generation(tmp_path):
+    published = publish(str(tmp_path), with_price(TABLES, 95000.0))
+    data = ReferenceData(str(tmp_path))
+    # a restarting worker must not revert what an operator published
+    assert data.load(TABLES) == published
+    assert current_generation(str(tmp_path)) == published
+    assert data.table("exchange_assets")[0]["price"] == 95000.0
+
+    assert ReferenceData(str(tmp_path / "empty")).load(TABLES) is not None
+    assert data.load(TABLES, replace=True) != published
+
+
+def test_vetoed_generation_is_not_attached(tmp_path):
+    data = ReferenceData(str(tmp_path))
+    first = data.load(TABLES)
+    publish(str(tmp_path), with_price(TABLES, 1.0))
+    checked = []
+    assert not data.reload_if_changed(lambda snapshot: checked.append(snapshot.generation) and False)
+    assert not data.reload_if_changed(lambda snapshot: checked.append(snapshot.generation) and False)
+    assert len(checked) == 1 and data.snapshot.generation == first
+    publish(str(tmp_path), with_price(TABLES, 2.0))
+    assert data.reload_if_changed(lambda snapshot: True)
+    assert data.table("exchange_assets")[0]["price"] == 2.0
+
+
+def test_small_tables_decode_once_per_generation(tmp_path):
+    data = ReferenceData(str(tmp_path))
+    data.load(TABLES)
+    logos = data.table("logos")
+    assert logos.get("btc") == "btc.png" and logos.get("sol") is None
+    assert data.table("exchange_assets")[1] is data.table("exchange_assets")[1]
+    assert list(logos) == ["btc", "eth"] and "eth" in logos
+
+
+def test_server_follows_a_compatible_swap_and_refuses_asset_changes(server):
+    before = server.reference_data.snapshot
+    tables = {name: before.decoded(name) for name in before.directory}
+    directory = server.REFDATA_DIR
+    try:
+        publish(directory, with_price(tables, 123.0))
+        assert server.reference_data.reload_if_changed(server.reference_swap_allowed)
+        server.refresh_reference_views()
+        assert server.TOKEN_PRICES["BTC"] == 123.0
+        btc = server.exchange_flows.snapshot("1h", 0)[0]
+        assert btc["asset"] == "BTC" and btc["price"] == 123.0
+
+        swapped = server.reference_data.snapshot.generation
+        publish(directory, {**tables, "exchange_assets": tables["exchange_assets"][1:]})
+        assert not server.reference_data.reload_if_changed(server.reference_swap_allowed)
+        assert server.reference_data.snapshot.generation == swapped
+    finally:
+        publish(directory, tables)
+        server.reference_data.reload_if_changed(server.reference_swap_allowed)
+        server.refresh_reference_views()
@@ -0,0 +1,44 @@
+import numpy as np
+
+from label_index import ADDRESS_DTYPE
+from search import ADDRESS, KEY_WIDTH, LABEL, SearchIndex
+
+
+def test_names_longer_than_the_key_width_are_found():
+    index = SearchIndex()
+    long_name = "binance cold wallet reserve for institutional custody 7"
+    assert len(long_name.encode()) > KEY_WIDTH
+    index.add(LABEL, long_name, long_name, weight=1.0)
+    index.add(LABEL, "binance hot wallet", "binance hot wallet", weight=2.0)
+    other = long_name[:KEY_WIDTH - 1] + "z and more"
+    index.add(LABEL, other, other, weight=3.0)
+
+    found = [hit["id"] for hit in index.search(long_name, limit=5)]
+    assert found[0] == long_name
+    # differs from the query within the key width
+    assert "binance hot wallet" not in found and other not in found
+
+
+def address(n):
+    return "0x" + f"{n:040x}"
+
+
+def test_labeled_addresses_are_searched_in_place():
+    labeled = np.array(sorted(bytes.fromhex(address(n)[2:]) for n in (0xab01, 0xab02, 0xcd01)), dtype=ADDRESS_DTYPE)
+    index = SearchIndex(labeled=lambda: labeled)
+    index.touch_addresses([address(0xab02)] * 3)
+    found = index.search("0x" + "0" * 36 + "ab", limit=5, kinds={ADDRESS})
+    assert [hit["id"] for hit in found] == [address(0xab02), address(0xab01)]
+    assert found[0]["activity"] == 3 and index.address_count == 1
+
+
+def test_activity_only_addresses_are_capped():
+    index = SearchIndex(max_addresses=100)
+    index.pin_addresses([address(1)])
+    index.touch_addresses([address(2)] * 5)
+    for n in range(1000, 1200):
+        index.touch_addresses([address(n)])
+    assert index.address_count - index.pinned_count <= 125
+    # the pinned and the most active address survive pruning
+    for kept in (address(1), address(2)):
+        assert [hit["id"] for hit in index.search(kept, kinds={ADDRESS})] == [kept]
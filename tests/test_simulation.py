@@ -0,0 +1,23 @@
+import asyncio
+
+import pytest
+
+
+@pytest.mark.anyio
+async def test_jobs_can_be_polled_from_another_worker(client, server):
+    body = {"delay_hours": [0, 6], "slippage_bps": [10], "size": [1000], "background": True}
+    response = await client.post("/api/actors/binance-hot-wallet/simulate", json=body)
+    assert response.status_code == 202
+    poll = response.json()["poll"]
+    for _ in range(200):
+        job = (await client.get(poll)).json()
+        if job["status"] not in ("queued", "running"):
+            break
+        await asyncio.sleep(0.05)
+    assert job["status"] == "done" and len(job["results"]) == 2
+
+    # a worker that did not run the job answers from the job store
+    server.simulations.jobs.pop(job["id"])
+    stored = (await client.get(poll)).json()
+    assert stored == job
+    assert (await client.get("/api/simulations/missing")).status_code == 404
@@ -0,0 +1,47 @@
+import pytest
+
+
+@pytest.mark.anyio
+async def test_capped_totals_are_flagged(client, server, monkeypatch):
+    import hot_tier
+    import transfer_store
+
+    for module in (server, hot_tier, transfer_store):
+        monkeypatch.setattr(module, "COUNT_LIMIT", 10)
+    body = (await client.get("/api/transfers", params={"min_usd": 1})).json()
+    assert body["total"] == 10 and body["total_capped"] is True
+    # an unfiltered total comes from collection metadata, not a capped count
+    body = (await client.get("/api/transfers")).json()
+    assert body["total"] > 10 and body["total_capped"] is False
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("sort_by", ["time", "usd", "value"])
+async def test_cursor_pages_cover_the_listing_once(client, server, sort_by):
+    from transfer_store import sort_keys
+
+    store = server.transfer_store
+    keys = sort_keys(sort_by)
+    everything = await store.collection.find({"token": "ETH"}).to_list(length=None)
+    expected = [doc["_id"] for doc in sorted(everything, key=lambda d: [d[k] for k in keys], reverse=True)]
+    assert len(expected) > 3 * 7
+
+    seen, cursor = [], None
+    while True:
+        params = {"token": "eth", "sort_by": sort_by, "limit": 7}
+        if cursor:
+            params["cursor"] = cursor
+        body = (await client.get("/api/transfers", params=params)).json()
+        seen += [row["id"] for row in body["transfers"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+@pytest.mark.anyio
+async def test_cursor_must_match_the_sort_order(client):
+    body = (await client.get("/api/transfers", params={"sort_by": "usd", "limit": 2})).json()
+    response = await client.get("/api/transfers", params={"sort_by": "time", "cursor": body["next_cursor"]})
+    assert response.status_code == 400
+    assert (await client.get("/api/transfers", params={"cursor": "not-a-cursor!"})).status_code == 400